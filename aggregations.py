@@ -0,0 +1,612 @@
+"""
+Módulo responsável pelas agregações financeiras vetorizadas.
+
+As transações são convertidas uma única vez em um DataFrame com colunas
+normalizadas (tipo, pago, grupo, valor); os totais de receitas, despesas,
+investimentos, categorias e regra 50/30/20 saem de um único groupby.
+"""
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Códigos normalizados de tipo de transação
+TIPO_RECEITA = "receita"
+TIPO_DESPESA = "despesa"
+TIPO_INVESTIMENTO = "investimento"
+TIPO_OUTRO = "outro"
+TIPOS = [TIPO_RECEITA, TIPO_DESPESA, TIPO_INVESTIMENTO, TIPO_OUTRO]
+
+# Códigos normalizados de categoria_tipo
+GRUPO_NECESSIDADE = "necessidade"
+GRUPO_DESEJO = "desejo"
+GRUPO_INVESTIMENTO = "investimento"
+GRUPO_POUPANCA = "poupanca"
+GRUPO_OUTROS = "outros"
+GRUPOS = [GRUPO_NECESSIDADE, GRUPO_DESEJO, GRUPO_INVESTIMENTO, GRUPO_POUPANCA, GRUPO_OUTROS]
+
+_TYPE_CODES = {
+    "receita": TIPO_RECEITA, "income": TIPO_RECEITA, "revenue": TIPO_RECEITA,
+    "despesa": TIPO_DESPESA, "expense": TIPO_DESPESA, "expenses": TIPO_DESPESA,
+    "investimento": TIPO_INVESTIMENTO, "investment": TIPO_INVESTIMENTO
+}
+
+_GRUPO_CODES = {
+    "necessidade": GRUPO_NECESSIDADE, "necessidades": GRUPO_NECESSIDADE,
+    "desejo": GRUPO_DESEJO, "desejos": GRUPO_DESEJO,
+    "investimento": GRUPO_INVESTIMENTO,
+    "poupanca": GRUPO_POUPANCA
+}
+
+_PAID_STATUSES = {"pago", "paid"}
+
+# Rótulos usados pelo dashboard na distribuição por categoria
+_POR_CATEGORIA_LABELS = {
+    GRUPO_NECESSIDADE: "Necessidades",
+    GRUPO_DESEJO: "Lazer",
+    GRUPO_INVESTIMENTO: "Investimentos",
+    GRUPO_POUPANCA: "Outros",
+    GRUPO_OUTROS: "Outros"
+}
+
+_EMPTY_SUMMARY = {
+    "receitas": 0,
+    "despesas": 0,
+    "saldo_mes": 0,
+    "investimentos": 0,
+    "por_categoria": {},
+    "regra_50_30_20": {"Necessidades": 0, "Desejos": 0, "Investimentos": 0},
+    "kpis": {"saude_financeira": "Sem dados", "taxa_poupanca": 0, "relacao_despesa_receita": 0}
+}
+
+def _encode(series, mapping, default, categories):
+    """
+    Converte uma coluna de texto livre em códigos categóricos.
+
+    O mapeamento é feito sobre os valores distintos (pd.factorize), então o
+    custo de lower()/lookup é proporcional ao número de grafias diferentes e
+    não ao número de linhas.
+    """
+    codes, uniques = pd.factorize(series.fillna(""), sort=False)
+    mapped = np.array(
+        [mapping.get(str(value).strip().lower(), default) for value in uniques] + [default],
+        dtype=object
+    )
+    # factorize usa -1 para valores ausentes; apontar para o código padrão
+    codes = np.where(codes < 0, len(uniques), codes)
+    return pd.Categorical(mapped[codes], categories=categories)
+
+def normalize_transactions(transactions):
+    """
+    Converte transações em um DataFrame com colunas normalizadas.
+
+    Colunas adicionadas:
+        tipo: receita/despesa/investimento/outro
+        pago: True se o status é pago/paid
+        grupo: necessidade/desejo/investimento/poupanca/outros
+        valor: amount como float
+        mes: período YYYY-MM extraído da data
+
+    Args:
+        transactions (list | DataFrame): Transações a normalizar
+
+    Returns:
+        DataFrame: Transações com as colunas normalizadas
+    """
+    if isinstance(transactions, pd.DataFrame):
+        if "tipo" in transactions.columns and "valor" in transactions.columns:
+            return transactions
+        df = transactions.copy()
+    else:
+        df = pd.DataFrame(list(transactions or []))
+
+    for column in ("type", "status", "categoria_tipo", "amount", "date"):
+        if column not in df.columns:
+            df[column] = None
+
+    df["tipo"] = _encode(df["type"], _TYPE_CODES, TIPO_OUTRO, TIPOS)
+    df["grupo"] = _encode(df["categoria_tipo"], _GRUPO_CODES, GRUPO_OUTROS, GRUPOS)
+    status = _encode(df["status"], {s: True for s in _PAID_STATUSES}, False, [True, False])
+    df["pago"] = np.asarray(status, dtype=bool)
+    df["valor"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0).astype(float)
+    if pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["mes"] = df["date"].dt.strftime("%Y-%m")
+    else:
+        df["mes"] = df["date"].fillna("").astype(str).str[:7]
+    return df
+
+def aggregate_totals(transactions, only_paid=True):
+    """
+    Soma os valores por (tipo, grupo) em um único groupby.
+
+    Args:
+        transactions (list | DataFrame): Transações ou DataFrame normalizado
+        only_paid (bool): Considerar apenas transações pagas
+
+    Returns:
+        Series: Totais indexados por (tipo, grupo)
+    """
+    df = normalize_transactions(transactions)
+    if only_paid:
+        df = df[df["pago"]]
+    return df.groupby(["tipo", "grupo"], observed=False)["valor"].sum()
+
+def _total(totals, tipo, grupo=None):
+    """Lê um total do resultado de aggregate_totals como float"""
+    if grupo is None:
+        return float(totals.loc[tipo].sum())
+    return float(totals.loc[(tipo, grupo)])
+
+def _saude_financeira(saldo, taxa_poupanca):
+    """Classifica a saúde financeira a partir do saldo e da taxa de poupança"""
+    if saldo > 0 and taxa_poupanca >= 10:
+        return "Ótima"
+    if saldo > 0:
+        return "Boa"
+    if saldo == 0:
+        return "Atenção"
+    return "Crítica"
+
+def calculate_summary(transactions):
+    """
+    Calcula o resumo financeiro (receitas, despesas, investimentos, categorias,
+    regra 50/30/20 e KPIs) considerando apenas transações pagas.
+
+    Args:
+        transactions (list | DataFrame): Transações a analisar
+
+    Returns:
+        dict: Resumo no formato usado pelo dashboard
+    """
+    if transactions is None or len(transactions) == 0:
+        return _empty_summary()
+    return _summary_from_totals(aggregate_totals(transactions))
+
+def _empty_summary():
+    """Cópia do resumo vazio"""
+    return {k: (dict(v) if isinstance(v, dict) else v) for k, v in _EMPTY_SUMMARY.items()}
+
+def _summary_from_totals(totals):
+    """Monta o resumo financeiro a partir dos totais por (tipo, grupo)"""
+    receitas = _total(totals, TIPO_RECEITA)
+    despesas = _total(totals, TIPO_DESPESA)
+    investimentos = _total(totals, TIPO_INVESTIMENTO)
+    saldo = receitas - despesas - investimentos
+
+    por_categoria = {}
+    for grupo, valor in totals.loc[TIPO_DESPESA].items():
+        if valor:
+            label = _POR_CATEGORIA_LABELS[grupo]
+            por_categoria[label] = por_categoria.get(label, 0) + float(valor)
+
+    regra_50_30_20 = {
+        "Necessidades": _total(totals, TIPO_DESPESA, GRUPO_NECESSIDADE),
+        "Desejos": _total(totals, TIPO_DESPESA, GRUPO_DESEJO),
+        "Investimentos": investimentos
+    }
+
+    taxa_poupanca = (investimentos / receitas * 100) if receitas > 0 else 0
+    relacao_despesa_receita = ((despesas + investimentos) / receitas * 100) if receitas > 0 else 0
+
+    return {
+        "receitas": receitas,
+        "despesas": despesas,
+        "saldo_mes": saldo,
+        "investimentos": investimentos,
+        "por_categoria": por_categoria,
+        "regra_50_30_20": regra_50_30_20,
+        "kpis": {
+            "saude_financeira": _saude_financeira(saldo, taxa_poupanca),
+            "taxa_poupanca": taxa_poupanca,
+            "relacao_despesa_receita": relacao_despesa_receita
+        }
+    }
+
+def calculate_balance(transactions):
+    """
+    Calcula saldo em conta, total investido e patrimônio a partir das transações pagas.
+
+    Returns:
+        dict: {"saldo_conta": ..., "total_investido": ..., "patrimonio_total": ...}
+    """
+    return _balance_from_totals(aggregate_totals(transactions))
+
+def _balance_from_totals(totals):
+    """Calcula saldo, investimentos e patrimônio a partir dos totais por (tipo, grupo)"""
+    receitas = _total(totals, TIPO_RECEITA)
+    despesas = _total(totals, TIPO_DESPESA)
+    investimentos = _total(totals, TIPO_INVESTIMENTO)
+    saldo_conta = receitas - despesas - investimentos
+    return {
+        "saldo_conta": saldo_conta,
+        "total_investido": investimentos,
+        "patrimonio_total": saldo_conta + investimentos
+    }
+
+def calculate_budget_distribution(transactions):
+    """
+    Calcula a distribuição do orçamento 50/30/20 das transações pagas.
+
+    Despesas sem categoria_tipo de desejo contam como necessidade; todos os
+    investimentos contam como poupança.
+
+    Returns:
+        dict | None: income, expenses, ideal e real (%), ou None sem receitas
+    """
+    totals = aggregate_totals(transactions)
+    income = _total(totals, TIPO_RECEITA)
+    if income == 0:
+        return None
+
+    desejos = _total(totals, TIPO_DESPESA, GRUPO_DESEJO)
+    expenses = {
+        'Necessidades': _total(totals, TIPO_DESPESA) - desejos,
+        'Desejos': desejos,
+        'Poupança': _total(totals, TIPO_INVESTIMENTO)
+    }
+    ideal = {
+        'Necessidades': income * 0.5,
+        'Desejos': income * 0.3,
+        'Poupança': income * 0.2
+    }
+    real = {cat: value / income * 100 for cat, value in expenses.items()}
+    return {
+        'income': income,
+        'expenses': expenses,
+        'ideal': ideal,
+        'real': real
+    }
+
+def totals_by_type(transactions, only_paid=False):
+    """
+    Soma e conta transações por tipo.
+
+    Returns:
+        dict: {tipo: {"total": float, "count": int}} para receita/despesa/investimento
+    """
+    df = normalize_transactions(transactions)
+    if only_paid:
+        df = df[df["pago"]]
+    grouped = df.groupby("tipo", observed=False)["valor"].agg(["sum", "count"])
+    return {
+        tipo: {"total": float(grouped.loc[tipo, "sum"]), "count": int(grouped.loc[tipo, "count"])}
+        for tipo in (TIPO_RECEITA, TIPO_DESPESA, TIPO_INVESTIMENTO)
+    }
+
+def expense_distribution(transactions, category_filter=None):
+    """
+    Soma as despesas (qualquer status) por rótulo de categoria_tipo, em ordem decrescente.
+
+    Args:
+        transactions (list | DataFrame): Transações a analisar
+        category_filter (list, optional): Rótulos (Necessidades/Lazer/...) a manter
+
+    Returns:
+        dict: {categoria: valor}
+    """
+    totals = aggregate_totals(transactions, only_paid=False)
+    despesas = {}
+    for grupo, valor in totals.loc[TIPO_DESPESA].items():
+        label = _POR_CATEGORIA_LABELS[grupo]
+        if not valor or (category_filter and label not in category_filter):
+            continue
+        despesas[label] = despesas.get(label, 0) + float(valor)
+    return dict(sorted(despesas.items(), key=lambda x: x[1], reverse=True))
+
+# ---------------------------------------------------------------------
+# Consolidação mensal
+# ---------------------------------------------------------------------
+
+_SERIES_LABELS = {
+    TIPO_RECEITA: "Receitas",
+    TIPO_DESPESA: "Despesas",
+    TIPO_INVESTIMENTO: "Investimentos"
+}
+
+def month_window(months=12, end=None):
+    """
+    Lista os períodos YYYY-MM dos últimos 'months' meses, terminando no mês de 'end'.
+
+    Args:
+        months (int): Quantidade de meses
+        end (datetime, optional): Data de referência (padrão: hoje)
+
+    Returns:
+        list: Períodos em ordem crescente
+    """
+    end = end or datetime.now()
+    year, month = end.year, end.month
+    periodos = []
+    for _ in range(months):
+        periodos.append(f"{year}-{month:02d}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(periodos))
+
+def monthly_totals(transactions, only_months=None):
+    """
+    Soma as transações pagas por (mês, tipo) em um único groupby.
+
+    Args:
+        transactions (list | DataFrame): Transações a consolidar
+        only_months (set, optional): Restringe a consolidação a esses períodos YYYY-MM
+
+    Returns:
+        dict: {periodo: {"receita": x, "despesa": y, "investimento": z}}
+    """
+    df = normalize_transactions(transactions)
+    df = df[df["pago"] & df["tipo"].isin(list(_SERIES_LABELS))]
+    if only_months is not None:
+        df = df[df["mes"].isin(list(only_months))]
+    grouped = df.groupby(["mes", "tipo"], observed=True)["valor"].sum()
+    totals = {}
+    for (mes, tipo), valor in grouped.items():
+        totals.setdefault(mes, dict.fromkeys(_SERIES_LABELS, 0.0))[tipo] = float(valor)
+    return totals
+
+class MonthlyRollup:
+    """
+    Totais mensais das transações pagas, com atualização incremental.
+
+    rebuild() consolida todo o histórico; refresh_months() recalcula apenas os
+    meses afetados por uma escrita, mantendo os demais intactos.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.totals = {}
+
+    def rebuild(self, transactions, version=None):
+        """Recalcula todos os meses a partir das transações"""
+        self.totals = monthly_totals(transactions)
+        self.version = version
+        return self
+
+    def refresh_months(self, transactions, months, version=None):
+        """Recalcula somente os períodos informados"""
+        months = set(months)
+        for mes in months:
+            self.totals.pop(mes, None)
+        self.totals.update(monthly_totals(transactions, only_months=months))
+        self.version = version
+        return self
+
+    def load_aggregates(self, rows, version=None):
+        """Carrega os totais direto das linhas de monthly_aggregates"""
+        self.totals = monthly_totals_from_aggregates(rows)
+        self.version = version
+        return self
+
+    def series(self, months=12, end=None):
+        """
+        Monta as séries Receitas/Despesas/Investimentos/Saldo para a janela pedida.
+
+        Returns:
+            dict: {série: {periodo: valor}} com todos os meses da janela
+        """
+        dados = {label: {} for label in _SERIES_LABELS.values()}
+        dados["Saldo"] = {}
+        zero = dict.fromkeys(_SERIES_LABELS, 0.0)
+        for periodo in month_window(months, end):
+            mes = self.totals.get(periodo, zero)
+            for tipo, label in _SERIES_LABELS.items():
+                dados[label][periodo] = mes[tipo]
+            dados["Saldo"][periodo] = mes[TIPO_RECEITA] - mes[TIPO_DESPESA] - mes[TIPO_INVESTIMENTO]
+        return dados
+
+# ---------------------------------------------------------------------
+# Agregados mensais materializados
+# ---------------------------------------------------------------------
+# A tabela monthly_aggregates guarda, por (user_id, month, type,
+# categoria_tipo), o total, o total pago e a quantidade de transações.
+# type e categoria_tipo já são gravados normalizados (TIPOS/GRUPOS), então
+# KPIs e séries mensais leem O(meses) linhas em vez de O(transações).
+
+AGGREGATE_KEY_COLUMNS = ["user_id", "month", "type", "categoria_tipo"]
+AGGREGATE_VALUE_COLUMNS = ["total_amount", "paid_amount", "transaction_count"]
+
+def _as_float(value):
+    """Converte um valor monetário para float (0.0 se inválido)"""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def aggregate_key(transaction):
+    """
+    Calcula a chave de monthly_aggregates de uma transação.
+
+    Args:
+        transaction (dict): Transação com user_id, date, type e categoria_tipo
+
+    Returns:
+        tuple | None: (user_id, month, type, categoria_tipo), ou None sem data
+    """
+    month = str(transaction.get("date") or "")[:7]
+    if not month:
+        return None
+    tipo = _TYPE_CODES.get(str(transaction.get("type") or "").strip().lower(), TIPO_OUTRO)
+    grupo = _GRUPO_CODES.get(str(transaction.get("categoria_tipo") or "").strip().lower(), GRUPO_OUTROS)
+    return (transaction.get("user_id") or 1, month, tipo, grupo)
+
+def aggregate_deltas(old=None, new=None):
+    """
+    Calcula os deltas de monthly_aggregates causados por uma escrita.
+
+    Inclusão: old=None; remoção: new=None; alteração: ambos. Deltas que se
+    anulam (ex.: mudança só na descrição) são descartados.
+
+    Args:
+        old (dict, optional): Transação antes da escrita
+        new (dict, optional): Transação depois da escrita
+
+    Returns:
+        list: Dicionários com as colunas de chave e os incrementos de valor
+    """
+    deltas = {}
+    for transaction, sign in ((old, -1), (new, 1)):
+        if not transaction:
+            continue
+        key = aggregate_key(transaction)
+        if key is None:
+            continue
+        amount = _as_float(transaction.get("amount"))
+        paid = str(transaction.get("status") or "").strip().lower() in _PAID_STATUSES
+        delta = deltas.setdefault(key, dict.fromkeys(AGGREGATE_VALUE_COLUMNS, 0))
+        delta["total_amount"] += sign * amount
+        delta["paid_amount"] += sign * amount if paid else 0
+        delta["transaction_count"] += sign
+    return [
+        dict(zip(AGGREGATE_KEY_COLUMNS, key), **values)
+        for key, values in deltas.items()
+        if any(abs(v) > 1e-9 for v in values.values())
+    ]
+
+def build_monthly_aggregates(transactions):
+    """
+    Consolida as transações nas linhas de monthly_aggregates (usado no backfill).
+
+    Returns:
+        list: Uma linha por (user_id, month, type, categoria_tipo)
+    """
+    df = normalize_transactions(transactions)
+    df = df[df["mes"] != ""]
+    if df.empty:
+        return []
+    if "user_id" not in df.columns:
+        df["user_id"] = 1
+    df["user_id"] = pd.to_numeric(df["user_id"], errors="coerce").fillna(1).astype(int)
+    df["pago_valor"] = df["valor"].where(df["pago"], 0.0)
+    grouped = df.groupby(["user_id", "mes", "tipo", "grupo"], observed=True).agg(
+        total_amount=("valor", "sum"),
+        paid_amount=("pago_valor", "sum"),
+        transaction_count=("valor", "size")
+    )
+    return [
+        {
+            "user_id": int(user_id), "month": mes, "type": tipo, "categoria_tipo": grupo,
+            "total_amount": float(row.total_amount), "paid_amount": float(row.paid_amount),
+            "transaction_count": int(row.transaction_count)
+        }
+        for (user_id, mes, tipo, grupo), row in grouped.iterrows()
+    ]
+
+def merge_aggregate_rows(*row_lists):
+    """
+    Soma várias listas de linhas de monthly_aggregates, consolidando por chave.
+
+    Returns:
+        list: Uma linha por (user_id, month, type, categoria_tipo)
+    """
+    merged = {}
+    for rows in row_lists:
+        for row in rows:
+            key = tuple(row[c] for c in AGGREGATE_KEY_COLUMNS)
+            total = merged.setdefault(key, dict.fromkeys(AGGREGATE_VALUE_COLUMNS, 0))
+            for column in AGGREGATE_VALUE_COLUMNS:
+                total[column] += row[column]
+    return [dict(zip(AGGREGATE_KEY_COLUMNS, key), **values) for key, values in merged.items()]
+
+def build_monthly_aggregates_chunked(transactions, chunk_size=5000):
+    """
+    Igual a build_monthly_aggregates, mas consumindo um iterável em blocos.
+
+    A memória usada é proporcional a chunk_size mais o número de linhas
+    agregadas (O(meses)), não ao número de transações.
+
+    Args:
+        transactions (iterable): Transações (ex.: gerador paginado)
+        chunk_size (int): Transações consolidadas por vez
+
+    Returns:
+        list: Uma linha por (user_id, month, type, categoria_tipo)
+    """
+    merged = []
+    chunk = []
+    for transaction in transactions:
+        chunk.append(transaction)
+        if len(chunk) >= chunk_size:
+            merged = merge_aggregate_rows(merged, build_monthly_aggregates(chunk))
+            chunk = []
+    if chunk:
+        merged = merge_aggregate_rows(merged, build_monthly_aggregates(chunk))
+    return merged
+
+def net_aggregate_deltas(old_transactions, new_transactions):
+    """
+    Deltas de monthly_aggregates de uma escrita em lote, consolidados por chave.
+
+    Equivale a somar aggregate_deltas(old, new) de cada linha, mas com dois
+    groupby em vez de um cálculo por transação.
+
+    Args:
+        old_transactions (list): Transações antes da escrita
+        new_transactions (list): As mesmas transações depois da escrita
+
+    Returns:
+        list: Linhas de delta (deltas nulos são descartados)
+    """
+    removed = [dict(row, **{c: -row[c] for c in AGGREGATE_VALUE_COLUMNS})
+               for row in build_monthly_aggregates(old_transactions)]
+    merged = merge_aggregate_rows(removed, build_monthly_aggregates(new_transactions))
+    return [row for row in merged if any(abs(row[c]) > 1e-9 for c in AGGREGATE_VALUE_COLUMNS)]
+
+def totals_from_aggregates(rows, only_paid=True):
+    """
+    Converte linhas de monthly_aggregates no mesmo formato de aggregate_totals.
+
+    Args:
+        rows (list): Linhas de monthly_aggregates
+        only_paid (bool): Usar paid_amount em vez de total_amount
+
+    Returns:
+        Series: Totais indexados por (tipo, grupo)
+    """
+    column = "paid_amount" if only_paid else "total_amount"
+    index = pd.MultiIndex.from_product([TIPOS, GRUPOS], names=["tipo", "grupo"])
+    totals = pd.Series(0.0, index=index)
+    for row in rows or []:
+        tipo = row.get("type") if row.get("type") in TIPOS else TIPO_OUTRO
+        grupo = row.get("categoria_tipo") if row.get("categoria_tipo") in GRUPOS else GRUPO_OUTROS
+        totals.loc[(tipo, grupo)] += _as_float(row.get(column))
+    return totals
+
+def summary_from_aggregates(rows):
+    """
+    Calcula o resumo financeiro (mesmo formato de calculate_summary) a partir
+    de linhas de monthly_aggregates.
+
+    Args:
+        rows (list): Linhas de monthly_aggregates do período desejado
+
+    Returns:
+        dict: Resumo no formato usado pelo dashboard
+    """
+    if not rows or not any(row.get("transaction_count") for row in rows):
+        return _empty_summary()
+    return _summary_from_totals(totals_from_aggregates(rows))
+
+def balance_from_aggregates(rows):
+    """
+    Calcula saldo em conta, total investido e patrimônio a partir de monthly_aggregates.
+
+    Returns:
+        dict: {"saldo_conta": ..., "total_investido": ..., "patrimonio_total": ...}
+    """
+    return _balance_from_totals(totals_from_aggregates(rows))
+
+def monthly_totals_from_aggregates(rows):
+    """
+    Converte linhas de monthly_aggregates no formato de monthly_totals.
+
+    Returns:
+        dict: {periodo: {"receita": x, "despesa": y, "investimento": z}}
+    """
+    totals = {}
+    for row in rows or []:
+        tipo = row.get("type")
+        if tipo not in _SERIES_LABELS:
+            continue
+        mes = totals.setdefault(row.get("month"), dict.fromkeys(_SERIES_LABELS, 0.0))
+        mes[tipo] += _as_float(row.get("paid_amount"))
+    return totals
@@ -0,0 +1,121 @@
+"""
+Módulo responsável pelo logging da aplicação.
+
+Todos os módulos obtêm seus loggers com get_logger(__name__); as mensagens
+usam a formatação preguiçosa do logging ("... %s", valor), então nada é
+formatado quando o nível está desligado. Mensagens de depuração em laços
+quentes podem ainda ser amostradas, emitindo só uma a cada N por ponto do
+código.
+
+Configuração por variáveis de ambiente:
+    FINANCAS_LOG_LEVEL: DEBUG, INFO, WARNING (padrão), ERROR
+    FINANCAS_LOG_SAMPLE_RATE: fração (0-1] das mensagens DEBUG emitidas (padrão 1)
+"""
+import logging
+import os
+import sys
+import threading
+
+ROOT_LOGGER = "financas"
+DEFAULT_LEVEL = "WARNING"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_configured = False
+_configure_lock = threading.Lock()
+
+class DebugSampler(logging.Filter):
+    """
+    Filtro que deixa passar apenas uma a cada N mensagens DEBUG por ponto do código.
+
+    Mensagens INFO ou acima nunca são descartadas.
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Define a fração (0-1] de mensagens DEBUG mantidas"""
+        rate = min(max(float(rate), 0.0), 1.0)
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counters.get(key, 0)
+            self._counters[key] = count + 1
+        return count % self.every == 0
+
+_sampler = DebugSampler()
+
+def _env_sample_rate():
+    """Lê FINANCAS_LOG_SAMPLE_RATE (1.0 se ausente ou inválida)"""
+    try:
+        return float(os.environ.get("FINANCAS_LOG_SAMPLE_RATE", 1.0))
+    except ValueError:
+        return 1.0
+
+def configure_logging(level=None, sample_rate=None):
+    """
+    Configura o logger raiz da aplicação (apenas uma vez por processo).
+
+    Args:
+        level (str | int, optional): Nível mínimo; padrão FINANCAS_LOG_LEVEL ou WARNING
+        sample_rate (float, optional): Fração das mensagens DEBUG emitidas
+    """
+    global _configured
+    with _configure_lock:
+        logger = logging.getLogger(ROOT_LOGGER)
+        if not _configured:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            handler.addFilter(_sampler)
+            logger.addHandler(handler)
+            logger.propagate = False
+            _configured = True
+            level = level or os.environ.get("FINANCAS_LOG_LEVEL", DEFAULT_LEVEL)
+            if sample_rate is None:
+                sample_rate = _env_sample_rate()
+        if level is not None:
+            logger.setLevel(level.upper() if isinstance(level, str) else level)
+        if sample_rate is not None:
+            _sampler.set_rate(sample_rate)
+    return logger
+
+def get_logger(name=None):
+    """
+    Retorna um logger filho do logger da aplicação.
+
+    Args:
+        name (str, optional): Nome do módulo (normalmente __name__)
+
+    Returns:
+        logging.Logger: Logger configurado
+    """
+    configure_logging()
+    if not name or name == ROOT_LOGGER:
+        return logging.getLogger(ROOT_LOGGER)
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def set_log_level(level):
+    """Altera o nível de log em tempo de execução (ex.: 'DEBUG')"""
+    configure_logging(level=level)
+
+def enable_debug(sample_rate=1.0):
+    """
+    Liga o modo de depuração, opcionalmente amostrado.
+
+    Args:
+        sample_rate (float): Fração das mensagens DEBUG emitidas (ex.: 0.01)
+    """
+    configure_logging(level=logging.DEBUG, sample_rate=sample_rate)
+
+def debug_enabled(logger):
+    """Indica se vale a pena montar dados caros só para uma mensagem DEBUG"""
+    return logger.isEnabledFor(logging.DEBUG)
@@ -0,0 +1,421 @@
+"""
+Benchmark das funções de cálculo das telas com históricos sintéticos.
+
+Gera históricos realistas (salários quinzenais, contas recorrentes, compras
+parceladas, investimentos e gastos variáveis com mistura de categoria_tipo e
+de grafias antigas de tipo/status), carrega cada um no backend em memória ou
+em um SQLite temporário (repositories.py) e mede as funções usadas pelo
+dashboard, orçamento, relatórios e assistente. O resultado sai em JSON para
+acompanhar regressões; com --baseline o script compara as medianas com um
+resultado anterior e retorna código de saída 1 se alguma piorou além da tolerância.
+
+Uso:
+    python benchmark.py [--sizes 1000,10000,100000] [--backend memory|sqlite]
+                        [--repeat 5] [--output resultado.json]
+                        [--baseline anterior.json --tolerance 0.25]
+
+Históricos de 1.000.000 de transações precisam de alguns GB de memória.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from dateutil.relativedelta import relativedelta
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 5
+# Tempo máximo gasto repetindo um mesmo caso (sempre roda ao menos uma vez)
+MAX_SECONDS_PER_CASE = 30
+# Diferenças menores que isso são ruído de medição, não regressão
+MIN_REGRESSION_MS = 1.0
+
+# ---------------------------------------------------------------------
+# Gerador de histórico sintético
+# ---------------------------------------------------------------------
+
+# (descrição, categoria, categoria_tipo, valor médio, dia de vencimento)
+RECURRING_BILLS = [
+    ("Aluguel", "Moradia", "necessidade", 1800, 10),
+    ("Condomínio", "Moradia", "necessidade", 450, 10),
+    ("Energia elétrica", "Contas", "necessidade", 220, 15),
+    ("Internet", "Contas", "necessidade", 120, 20),
+    ("Plano de saúde", "Saúde", "necessidade", 380, 5),
+    ("Seguro do carro", "Seguros", "necessidade", 160, 25),
+    ("Streaming", "Assinaturas", "desejo", 55, 12),
+    ("Academia", "Lazer", "desejo", 110, 8)
+]
+
+# (categoria, categoria_tipo, valor médio, peso)
+VARIABLE_EXPENSES = [
+    ("Alimentação", "necessidade", 90, 30),
+    ("Transporte", "necessidade", 45, 15),
+    ("Saúde", "necessidade", 120, 4),
+    ("Educação", "necessidade", 200, 2),
+    ("Restaurantes", "desejo", 70, 18),
+    ("Lazer", "desejo", 80, 8),
+    ("Shopping", "desejo", 150, 8),
+    ("Entretenimento", "desejo", 60, 5),
+    ("Viagens", "desejo", 900, 1),
+    ("Presentes", "desejo", 120, 2),
+    ("Reserva de Emergência", "poupanca", 300, 2),
+    ("Outros", "outros", 50, 5)
+]
+
+# (categoria, categoria_tipo) das compras parceladas
+INSTALLMENT_PURCHASES = [
+    ("Shopping", "desejo"), ("Educação", "necessidade"), ("Viagens", "desejo"),
+    ("Moradia", "necessidade")
+]
+
+# Grafias antigas que ainda aparecem no histórico (sorteadas em ~5% das linhas)
+TYPE_SPELLINGS = {
+    "Income": ["Receita", "receita"],
+    "Expense": ["Despesa", "despesa", "expense"],
+    "Investment": ["Investimento"]
+}
+CATEGORIA_TIPO_SPELLINGS = {
+    "necessidade": ["Necessidade", "necessidades"],
+    "desejo": ["Desejo", "desejos"],
+    "poupanca": ["Poupanca"],
+    "investimento": ["Investimento"],
+    "outros": ["Outros"]
+}
+LEGACY_SPELLING_RATE = 0.05
+
+def _months_for(size):
+    """Quantidade de meses do histórico: 12 para históricos pequenos, até 10 anos"""
+    return max(12, min(120, size // 800))
+
+def _transaction(rng, day, description, amount, category, type_, categoria_tipo,
+                 today, recurring=False, fixed_expense=False, installments=1,
+                 current_installment=1, priority=2, due=False):
+    status = "pendente" if day > today else ("pendente" if rng.random() < 0.03 else "pago")
+    if rng.random() < LEGACY_SPELLING_RATE:
+        type_ = rng.choice(TYPE_SPELLINGS[type_])
+        categoria_tipo = rng.choice(CATEGORIA_TIPO_SPELLINGS[categoria_tipo])
+        status = {"pago": rng.choice(["Pago", "paid"]), "pendente": "Pendente"}[status]
+    return {
+        "user_id": 1,
+        "description": description,
+        "amount": round(amount, 2),
+        "category": category,
+        "date": day.isoformat(),
+        "due_date": day.isoformat() if due else None,
+        "type": type_,
+        "status": status,
+        "recurring": recurring,
+        "priority": priority,
+        "quinzena": 1 if day.day <= 15 else 2,
+        "installments": installments,
+        "current_installment": current_installment,
+        "fixed_expense": fixed_expense,
+        "categoria_tipo": categoria_tipo,
+        "created_at": datetime.combine(day, datetime.min.time()).isoformat()
+    }
+
+def generate_ledger(size, seed=42, end=None):
+    """
+    Gera um histórico sintético com exatamente size transações.
+
+    Cada mês tem as contas recorrentes, um aporte de investimento, parcelas
+    das compras parceladas em andamento e gastos variáveis; os salários
+    (dias 5 e 20) são calculados no fim para que as despesas do mês fiquem
+    entre 75% e 100% da renda.
+
+    Args:
+        size (int): Quantidade de transações
+        seed (int): Semente do gerador (mesmo seed, mesmo histórico)
+        end (date, optional): Último dia do histórico; padrão é hoje
+
+    Returns:
+        list: Transações (dicionários sem id), em ordem cronológica por mês
+    """
+    rng = random.Random(seed)
+    today = end or date.today()
+    months = _months_for(size)
+    first_month = today.replace(day=1) - relativedelta(months=months - 1)
+    month_starts = [first_month + relativedelta(months=i) for i in range(months)]
+
+    structural = {m: [] for m in month_starts}
+    for index, month in enumerate(month_starts):
+        for description, category, tipo, amount, due_day in RECURRING_BILLS:
+            day = month.replace(day=due_day)
+            structural[month].append(_transaction(
+                rng, day, description, amount * rng.uniform(0.9, 1.1), category, "Expense",
+                tipo, today, recurring=True, fixed_expense=True, priority=1, due=True))
+        day = month.replace(day=6)
+        structural[month].append(_transaction(
+            rng, day, "Aporte mensal", rng.uniform(300, 1200), "Investimentos", "Investment",
+            "investimento", today, recurring=True))
+        # Compras parceladas: as parcelas seguintes caem nos meses seguintes
+        if rng.random() < 0.5:
+            category, tipo = rng.choice(INSTALLMENT_PURCHASES)
+            count = rng.choice([3, 6, 10, 12])
+            value = rng.uniform(600, 6000) / count
+            purchase_day = rng.randint(1, 28)
+            for n in range(count):
+                if index + n >= months:
+                    break
+                installment_month = month_starts[index + n]
+                structural[installment_month].append(_transaction(
+                    rng, installment_month.replace(day=purchase_day),
+                    f"Compra parcelada {category} ({n + 1}/{count})", value, category,
+                    "Expense", tipo, today, installments=count, current_installment=n + 1,
+                    due=True))
+
+    salary_slots = 2 * months
+    fixed = sum(len(rows) for rows in structural.values())
+    variable = max(0, size - fixed - salary_slots)
+    weights = [w for _, _, _, w in VARIABLE_EXPENSES]
+    for _ in range(variable):
+        month = rng.choice(month_starts)
+        category, tipo, mean, _ = rng.choices(VARIABLE_EXPENSES, weights=weights)[0]
+        structural[month].append(_transaction(
+            rng, month.replace(day=rng.randint(1, 28)), f"{category} {rng.randint(1, 9999)}",
+            rng.lognormvariate(0, 0.6) * mean, category, "Expense", tipo, today))
+
+    ledger = []
+    for month in month_starts:
+        rows = structural[month]
+        outflow = sum(t["amount"] for t in rows)
+        income = outflow / rng.uniform(0.75, 1.0)
+        for day, share in ((5, 0.6), (20, 0.4)):
+            rows.append(_transaction(rng, month.replace(day=day), "Salário", income * share,
+                                     "Salário", "Income", "necessidade", today,
+                                     recurring=True, priority=1))
+        ledger.extend(rows)
+
+    # Históricos pequenos: as linhas estruturais passam do tamanho pedido
+    if len(ledger) > size:
+        ledger = rng.sample(ledger, size)
+    return ledger
+
+# ---------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------
+
+def _quiet_streamlit():
+    """Silencia os avisos do Streamlit ao usar st.session_state fora de `streamlit run`"""
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+def load_ledger(backend, transactions, workdir):
+    """
+    Grava o histórico nos repositórios do backend e os torna os repositórios do processo.
+
+    Args:
+        backend (str): "memory" ou "sqlite"
+        transactions (list): Saída de generate_ledger
+        workdir (str): Diretório do banco SQLite temporário
+
+    Returns:
+        repositories.Repositories: Repositórios ativos
+    """
+    import db
+    import repositories
+    import transactions_db
+    from categories import invalidate_category_index
+
+    if backend == "sqlite":
+        db.close_sqlite_connections()
+        db.DB_PATH = os.path.join(workdir, f"benchmark_{len(transactions)}.db")
+        repos = repositories.set_repositories("sqlite")
+        db.apply_migrations()
+    else:
+        repos = repositories.set_repositories("memory")
+    repos.transactions.insert_many(transactions)
+    repos.transactions.rebuild_aggregates()
+    transactions_db.invalidate_transactions_cache()
+    invalidate_category_index()
+    return repos
+
+def time_case(fn, setup=None, repeat=DEFAULT_REPEAT, max_seconds=MAX_SECONDS_PER_CASE):
+    """
+    Mede uma função (o tempo de setup não entra na medida).
+
+    Returns:
+        dict: runs, min_ms, median_ms e mean_ms
+    """
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat:
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() - started > max_seconds:
+            break
+    return {
+        "runs": len(samples),
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3)
+    }
+
+def build_cases():
+    """
+    Casos medidos: (nome, setup, função), todos lendo o histórico pelo
+    transactions_db como as telas fazem.
+    """
+    import streamlit as st
+    import dashboard_engine
+    import reports
+    import transactions_db
+    from budget_tool import calculate_budget_distribution
+    from finance_assistant import FinanceAssistant
+
+    today = date.today()
+    start = (today.replace(day=1) - relativedelta(months=2)).isoformat()
+    categories = ["Alimentação", "Restaurantes", "Moradia", "Salário"]
+    # O resumo não usa a API da OpenAI: a instância dispensa a chave
+    assistant = object.__new__(FinanceAssistant)
+
+    def transactions():
+        return transactions_db.view_transactions()
+
+    def drop_snapshot():
+        st.session_state.pop(transactions_db._SNAPSHOT_KEY, None)
+
+    def drop_rollup():
+        st.session_state.pop(dashboard_engine._ROLLUP_KEY, None)
+        st.session_state.pop(transactions_db._AGGREGATES_KEY, None)
+
+    def drop_dashboard_models():
+        drop_rollup()
+        st.session_state.pop(dashboard_engine._MODEL_CACHE_KEY, None)
+
+    def financial_summary():
+        summary = assistant.get_financial_summary()
+        if summary.get("status") != "success":
+            raise RuntimeError(summary.get("message"))
+
+    return [
+        ("transactions_db.view_transactions (sem snapshot)", drop_snapshot, transactions),
+        ("dashboard.calculate_summary", None,
+         lambda: dashboard_engine.calculate_summary(transactions())),
+        ("dashboard.get_historical_data", drop_rollup,
+         lambda: dashboard_engine.get_historical_data(12)),
+        ("dashboard.filter_transactions", None,
+         lambda: dashboard_engine.filter_transactions(transactions(), start, today.isoformat(),
+                                               categories, ["Despesa", "Receita"])),
+        ("dashboard.get_dashboard_model (sem cache)", drop_dashboard_models,
+         lambda: dashboard_engine.get_dashboard_model()),
+        ("dashboard.get_dashboard_model (em cache)", None,
+         lambda: dashboard_engine.get_dashboard_model()),
+        ("budget_tool.calculate_budget_distribution", None,
+         lambda: calculate_budget_distribution(transactions())),
+        ("reports.cash_flow_data", None,
+         lambda: reports.cash_flow_data(reports.prepare_report_frame(transactions()),
+                                        "Todo período")),
+        ("finance_assistant.get_financial_summary", None, financial_summary)
+    ]
+
+def run_benchmark(sizes=DEFAULT_SIZES, backend="memory", repeat=DEFAULT_REPEAT, seed=42):
+    """
+    Executa o benchmark para cada tamanho de histórico.
+
+    Args:
+        sizes (list): Quantidades de transações
+        backend (str): "memory" ou "sqlite"
+        repeat (int): Execuções de cada caso
+        seed (int): Semente do gerador
+
+    Returns:
+        dict: Relatório com ambiente e, por tamanho, tempos de geração, carga e de cada caso
+    """
+    cases = build_cases()
+    _quiet_streamlit()
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "backend": backend,
+        "seed": seed,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": []
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            start = time.perf_counter()
+            ledger = generate_ledger(size, seed)
+            generate_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            load_ledger(backend, ledger, workdir)
+            load_seconds = time.perf_counter() - start
+            del ledger
+
+            result = {"size": size, "months": _months_for(size),
+                      "generate_seconds": round(generate_seconds, 3),
+                      "load_seconds": round(load_seconds, 3), "cases": {}}
+            for name, setup, fn in cases:
+                result["cases"][name] = time_case(fn, setup, repeat)
+                print(f"{size:>9} {name}: {result['cases'][name]['median_ms']:.2f} ms",
+                      file=sys.stderr)
+            report["results"].append(result)
+        if backend == "sqlite":
+            import db
+            db.close_sqlite_connections()
+    return report
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Compara as medianas com um relatório anterior.
+
+    Args:
+        report (dict): Relatório atual
+        baseline (dict): Relatório de referência
+        tolerance (float): Piora relativa aceita (0.25 = 25%)
+
+    Returns:
+        list: (tamanho, caso, mediana anterior, mediana atual) dos casos que pioraram
+    """
+    previous = {(r["size"], name): case["median_ms"]
+                for r in baseline.get("results", []) for name, case in r["cases"].items()}
+    regressions = []
+    for result in report["results"]:
+        for name, case in result["cases"].items():
+            before = previous.get((result["size"], name))
+            if (before and case["median_ms"] > before * (1 + tolerance)
+                    and case["median_ms"] - before > MIN_REGRESSION_MS):
+                regressions.append((result["size"], name, before, case["median_ms"]))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Tamanhos dos históricos, separados por vírgula")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory",
+                        help="Repositórios usados na carga e nas leituras")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Execuções por caso")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: saída padrão)")
+    parser.add_argument("--baseline", help="Relatório JSON anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Piora relativa aceita na comparação com --baseline")
+    args = parser.parse_args()
+
+    os.environ["FINANCAS_BACKEND"] = args.backend
+    result = run_benchmark([int(s) for s in args.sizes.split(",") if s.strip()],
+                           args.backend, args.repeat, args.seed)
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for size, name, before, after in regressions:
+            print(f"REGRESSÃO {size} {name}: {before:.2f} ms -> {after:.2f} ms", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
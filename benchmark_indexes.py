@@ -0,0 +1,145 @@
+"""
+Compara planos de consulta e tempos da tabela transactions sem e com os índices.
+
+Cria um banco SQLite temporário com transações sintéticas, executa as
+consultas usadas pelas telas (listagem por período, filtros de tipo/status,
+categoria e contas a vencer), aplica a migração de índices de db.py e repete
+as mesmas consultas, mostrando o EXPLAIN QUERY PLAN e o tempo médio de cada uma.
+
+Uso:
+    python benchmark_indexes.py [--rows 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+# (nome, SQL, parâmetros) — mesmas formas de consulta de db.query_transactions
+QUERIES = [
+    ("listagem do mês",
+     "SELECT * FROM transactions WHERE date >= ? AND date < ? ORDER BY date DESC, id DESC",
+     ("2024-03-01", "2024-04-01")),
+    ("período por usuário",
+     "SELECT * FROM transactions WHERE user_id = ? AND date >= ? AND date < ? ORDER BY date DESC",
+     (1, "2024-01-01", "2024-04-01")),
+    ("tipo e status no período",
+     "SELECT SUM(amount) FROM transactions WHERE user_id = ? AND type IN (?, ?) "
+     "AND status IN (?, ?) AND date >= ? AND date < ?",
+     (1, "Expense", "despesa", "pago", "Pago", "2024-01-01", "2024-07-01")),
+    ("por categoria",
+     "SELECT id, amount, date FROM transactions WHERE category = ?",
+     ("Mercado",)),
+    ("contas a vencer",
+     "SELECT * FROM transactions WHERE due_date >= ? AND due_date < ? AND status = ? "
+     "ORDER BY due_date",
+     ("2024-06-01", "2024-06-15", "pendente")),
+    ("últimas transações",
+     "SELECT * FROM transactions ORDER BY date DESC, id DESC LIMIT 50",
+     ())
+]
+
+CATEGORIES = ["Mercado", "Aluguel", "Transporte", "Lazer", "Saúde", "Educação",
+              "Restaurante", "Assinaturas", "Salário", "Freelance", "Investimentos",
+              "Energia", "Água", "Internet", "Farmácia", "Presentes"]
+TYPES = ["Expense", "Income", "Investment"]
+STATUSES = ["pago", "pendente"]
+
+def create_database(path, rows, seed=42):
+    """Cria a tabela transactions (esquema de db.py) com linhas sintéticas"""
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE transactions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     user_id INTEGER DEFAULT 1,
+                     description TEXT NOT NULL,
+                     amount REAL NOT NULL,
+                     category TEXT NOT NULL,
+                     date TEXT NOT NULL,
+                     due_date TEXT,
+                     type TEXT NOT NULL,
+                     status TEXT DEFAULT 'pendente',
+                     recurring BOOLEAN DEFAULT 0,
+                     priority INTEGER DEFAULT 2,
+                     quinzena INTEGER,
+                     installments INTEGER DEFAULT 1,
+                     current_installment INTEGER DEFAULT 1,
+                     fixed_expense BOOLEAN DEFAULT 0,
+                     categoria_tipo TEXT DEFAULT 'outros',
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    def generate():
+        for i in range(rows):
+            day = start + timedelta(days=rng.randrange(6 * 365))
+            due = day + timedelta(days=rng.randrange(30)) if rng.random() < 0.4 else None
+            yield (rng.choice([1, 1, 1, 2]), f"Transação {i}", round(rng.uniform(5, 3000), 2),
+                   rng.choice(CATEGORIES), day.isoformat(),
+                   due.isoformat() if due else None, rng.choice(TYPES),
+                   rng.choice(STATUSES), 1 if day.day <= 15 else 2)
+
+    with conn:
+        conn.executemany('''INSERT INTO transactions
+                            (user_id, description, amount, category, date, due_date,
+                             type, status, quinzena)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', generate())
+    return conn
+
+def query_plan(conn, sql, params):
+    """Linhas do EXPLAIN QUERY PLAN de uma consulta"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def time_query(conn, sql, params, repeat):
+    """Tempo médio (ms) de uma consulta, lendo todas as linhas"""
+    conn.execute(sql, params).fetchall()  # aquece o cache de páginas
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def run_queries(conn, repeat):
+    return {name: {"plan": query_plan(conn, sql, params),
+                   "ms": time_query(conn, sql, params, repeat)}
+            for name, sql, params in QUERIES}
+
+def run_benchmark(rows=100000, repeat=20):
+    """
+    Executa o benchmark e imprime o resultado.
+
+    Args:
+        rows (int): Quantidade de transações sintéticas
+        repeat (int): Execuções de cada consulta para a média
+
+    Returns:
+        dict: {"before": {...}, "after": {...}} por consulta
+    """
+    # Importado aqui para que o script mostre rapidamente erros de argumentos
+    from db import _migration_4_transaction_indexes
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, "bench.db"), rows)
+        before = run_queries(conn, repeat)
+        start = time.perf_counter()
+        _migration_4_transaction_indexes(conn)
+        migration_seconds = time.perf_counter() - start
+        after = run_queries(conn, repeat)
+        conn.close()
+
+    print(f"{rows} transações, média de {repeat} execuções; "
+          f"criação dos índices: {migration_seconds:.2f}s\n")
+    for name, _, _ in QUERIES:
+        b, a = before[name], after[name]
+        speedup = b["ms"] / a["ms"] if a["ms"] else float("inf")
+        print(f"{name}: {b['ms']:.2f} ms -> {a['ms']:.2f} ms ({speedup:.1f}x)")
+        print(f"    antes:  {' | '.join(b['plan'])}")
+        print(f"    depois: {' | '.join(a['plan'])}")
+    return {"before": before, "after": after}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="Transações sintéticas")
+    parser.add_argument("--repeat", type=int, default=20, help="Execuções por consulta")
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.repeat)
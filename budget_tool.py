@@ -5,74 +5,24 @@ import streamlit as st
 import plotly.graph_objects as go
 from datetime import datetime
 from transactions_db import view_transactions
+import aggregations
+from app_logging import get_logger
+from profiler import profiled
 from theme_manager import init_theme_manager, theme_config_section, get_theme_colors, apply_theme_to_plotly_chart
 
+logger = get_logger(__name__)
+
+@profiled()
 def calculate_budget_distribution(transactions):
     """Calcula a distribuição atual do orçamento seguindo a regra 50/30/20"""
-    # Filtrar apenas transações pagas
-    paid_transactions = [t for t in transactions if str(t.get('status', '')).lower() in ['pago', 'paid']]
-    
-    # Calcular receita total
-    income = sum(float(t.get('amount', 0)) for t in paid_transactions if str(t.get('type', '')).lower() in ['receita', 'income', 'revenue'])
-    
-    if income == 0:
-        return None
-    
-    # Calcular despesas por categoria
-    expenses = {
-        'Necessidades': 0,  # 50%
-        'Desejos': 0,      # 30%
-        'Poupança': 0      # 20%
-    }
-    
-    for t in paid_transactions:
-        tipo = str(t.get('type', '')).lower()
-        categoria_tipo = str(t.get('categoria_tipo', '')).lower()
-        amount = float(t.get('amount', 0))
-        
-        # Log para depuração
-        print(f"Processando transação: {t.get('description')} | Tipo: {tipo} | Categoria: {categoria_tipo} | Valor: {amount}")
-        
-        if tipo in ['despesa', 'expense', 'expenses']:
-            if categoria_tipo in ['necessidade', 'necessidades']:
-                expenses['Necessidades'] += amount
-                print(f"  → Adicionando à Necessidades: R${amount:.2f}")
-            elif categoria_tipo in ['desejo', 'desejos']:
-                expenses['Desejos'] += amount
-                print(f"  → Adicionando à Desejos: R${amount:.2f}")
-            else:
-                # Se não tiver categoria específica, considerar como necessidade
-                expenses['Necessidades'] += amount
-                print(f"  → Categoria não especificada, adicionando à Necessidades: R${amount:.2f}")
-        elif tipo in ['investimento', 'investment']:
-            # Todos os investimentos vão para poupança
-            expenses['Poupança'] += amount
-            print(f"  → Adicionando à Poupança: R${amount:.2f}")
-    
-    # Calcular percentuais ideais
-    ideal = {
-        'Necessidades': income * 0.5,
-        'Desejos': income * 0.3,
-        'Poupança': income * 0.2
-    }
-    
-    # Calcular percentuais reais
-    real = {cat: (value / income * 100) if income > 0 else 0 
-            for cat, value in expenses.items()}
-    
-    print(f"Resumo do orçamento:")
-    print(f"  Renda total: R${income:.2f}")
-    print(f"  Necessidades: R${expenses['Necessidades']:.2f} ({real['Necessidades']:.1f}%)")
-    print(f"  Desejos: R${expenses['Desejos']:.2f} ({real['Desejos']:.1f}%)")
-    print(f"  Poupança: R${expenses['Poupança']:.2f} ({real['Poupança']:.1f}%)")
-    
-    return {
-        'income': income,
-        'expenses': expenses,
-        'ideal': ideal,
-        'real': real
-    }
+    distribution = aggregations.calculate_budget_distribution(transactions)
+    if distribution:
+        logger.debug("Resumo do orçamento: renda R$%.2f, necessidades R$%.2f, desejos R$%.2f, poupança R$%.2f",
+                     distribution['income'], distribution['expenses']['Necessidades'],
+                     distribution['expenses']['Desejos'], distribution['expenses']['Poupança'])
+    return distribution
 
+@profiled(page=True)
 def show_budget_tool():
     """Mostra a ferramenta de orçamento 50/30/20"""
     st.title("Orçamento 50/30/20")
@@ -92,32 +42,17 @@ def show_budget_tool():
     - **20%** para poupança e investimentos
     """)
     
-    # Obter transações diretamente do Supabase
+    # Obter transações do snapshot compartilhado
     try:
-        from supabase_db import init_supabase
-        
-        # Inicializar conexão com Supabase
-        supabase = init_supabase()
-        if not supabase:
-            st.error("Erro ao conectar ao banco de dados Supabase.")
-            return
-            
-        # Buscar todas as transações
-        print("Buscando transações para o orçamento 50/30/20...")
-        response = supabase.table("transactions").select("*").limit(100).execute()
-        transactions = response.data
-        print(f"Total de transações encontradas: {len(transactions)}")
+        transactions = view_transactions()
+        logger.debug("Orçamento 50/30/20 com %d transações", len(transactions))
         
         if not transactions:
             st.warning("Nenhuma transação registrada ainda.")
             return
-            
-        # Exibir IDs das transações para debug
-        print(f"IDs das transações: {[t.get('id') for t in transactions]}")
     except Exception as e:
         st.error(f"Erro ao buscar transações: {e}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception("Erro ao buscar transações para o orçamento")
         return
     
     # Calcular distribuição do orçamento
@@ -1,11 +1,7 @@
-import sqlite3
-from db import DB_PATH
-from supabase_db import (
-    init_supabase,
-    get_categories as supabase_get_categories,
-    add_category as supabase_add_category,
-    update_category as supabase_update_category
-)
+import threading
+import time
+import pandas as pd
+from repositories import get_repositories
 
 def initialize_categories():
     """Inicializa as categorias padrão no banco de dados"""
@@ -63,6 +59,100 @@ def initialize_categories():
         for categoria, tipo in receitas:
             add_category(categoria, "Receita", tipo)
 
+# ---------------------------------------------------------------------
+# Índice de categorias
+# ---------------------------------------------------------------------
+# As categorias ativas ficam em memória no processo, indexadas por nome e
+# por tipo. O índice é descartado a cada add/update/delete_category e
+# expira após CATEGORY_INDEX_TTL_SECONDS (alterações feitas por outro processo).
+
+CATEGORY_INDEX_TTL_SECONDS = 300
+
+_category_index = None
+_category_index_lock = threading.Lock()
+
+def invalidate_category_index():
+    """Descarta o índice de categorias (a próxima consulta recarrega do banco)"""
+    global _category_index
+    with _category_index_lock:
+        _category_index = None
+
+def _build_category_index(categories):
+    """Monta o índice a partir das categorias retornadas pelo banco"""
+    active = []
+    for cat in categories or []:
+        if cat.get("active") != True:
+            continue
+        cat = dict(cat)
+        if "categoria_tipo" in cat:
+            cat["categoria_tipo"] = str(cat["categoria_tipo"]).lower()
+        active.append(cat)
+    active.sort(key=lambda x: x.get("name", ""))
+    
+    by_name = {}
+    by_type = {}
+    by_type_name = {}
+    for cat in active:
+        by_name[cat.get("name")] = cat
+        by_type.setdefault(cat.get("type"), []).append(cat)
+        by_type_name[(cat.get("type"), cat.get("name"))] = cat
+    return {
+        "loaded_at": time.monotonic(),
+        "all": active,
+        "by_name": by_name,
+        "by_type": by_type,
+        "by_type_name": by_type_name
+    }
+
+def _get_category_index():
+    """Retorna o índice de categorias, carregando do banco se necessário"""
+    global _category_index
+    index = _category_index
+    if index is not None and time.monotonic() - index["loaded_at"] <= CATEGORY_INDEX_TTL_SECONDS:
+        return index
+    with _category_index_lock:
+        index = _category_index
+        if index is None or time.monotonic() - index["loaded_at"] > CATEGORY_INDEX_TTL_SECONDS:
+            categories = get_repositories().categories.list()
+            index = _build_category_index(categories)
+            # Resultado vazio (tabela vazia ou falha de conexão) não fica em cache
+            _category_index = index if index["all"] else None
+    return index
+
+def get_category(name, type_filter=None):
+    """
+    Busca uma categoria ativa pelo nome em O(1).
+    
+    Args:
+        name (str): Nome da categoria
+        type_filter (str, optional): Tipo (Despesa/Receita/Investimento)
+        
+    Returns:
+        dict | None: Cópia da categoria, ou None se não existir
+    """
+    index = _get_category_index()
+    if type_filter:
+        cat = index["by_type_name"].get((type_filter, name))
+    else:
+        cat = index["by_name"].get(name)
+    return dict(cat) if cat else None
+
+def get_categoria_tipo(name, default="outros"):
+    """
+    Retorna o categoria_tipo (minúsculo) de uma categoria pelo nome.
+    
+    Args:
+        name (str): Nome da categoria
+        default (str): Valor usado se a categoria não existir
+        
+    Returns:
+        str: Tipo da categoria (necessidade/desejo/poupanca/outros)
+    """
+    cat = _get_category_index()["by_name"].get(name)
+    if cat and cat.get("categoria_tipo"):
+        return cat["categoria_tipo"]
+    return default
+
 def get_categories(type_filter=None, category_type_filter=None):
     """
     Retorna categorias do banco de dados
@@ -74,33 +164,22 @@ def get_categories(type_filter=None, category_type_filter=None):
     Returns:
         list: Lista de dicionários com as categorias
     """
-    # Obter todas as categorias do Supabase
-    categories = supabase_get_categories()
-    
-    # Aplicar filtros se necessário
-    if categories:
-        # Filtrar por tipo se especificado
-        if type_filter:
-            categories = [cat for cat in categories if cat.get("type") == type_filter]
-            
-        # Filtrar por categoria_tipo se especificado
-        if category_type_filter:
-            # Normalizar o filtro para minúsculas
-            category_type_filter = str(category_type_filter).lower()
-            categories = [cat for cat in categories if str(cat.get("categoria_tipo", "")).lower() == category_type_filter]
-        
-        # Filtrar apenas categorias ativas
-        categories = [cat for cat in categories if cat.get("active") == True]
-        
-        # Normalizar categoria_tipo para minúsculas em todas as categorias
-        for cat in categories:
-            if "categoria_tipo" in cat:
-                cat["categoria_tipo"] = str(cat["categoria_tipo"]).lower()
-        
-        # Ordenar por nome
-        categories.sort(key=lambda x: x.get("name", ""))
+    index = _get_category_index()
+    
+    # Filtrar por tipo se especificado
+    if type_filter:
+        categories = index["by_type"].get(type_filter, [])
+    else:
+        categories = index["all"]
     
-    return categories
+    # Filtrar por categoria_tipo se especificado
+    if category_type_filter:
+        # Normalizar o filtro para minúsculas
+        category_type_filter = str(category_type_filter).lower()
+        categories = [cat for cat in categories if str(cat.get("categoria_tipo", "")).lower() == category_type_filter]
+    
+    # Cópias, para que o chamador possa alterar os dicionários sem afetar o índice
+    return [dict(cat) for cat in categories]
 
 def add_category(name, type_trans, categoria_tipo="outros"):
     """
@@ -111,11 +190,13 @@ def add_category(name, type_trans, categoria_tipo="outros"):
         type_trans (str): Tipo (Despesa/Receita)
         categoria_tipo (str): Tipo da categoria (necessidade/desejo/poupanca/outros)
     """
-    return supabase_add_category(
-        name=name,
-        category_type=type_trans,
-        categoria_tipo=categoria_tipo
-    )
+    result = get_repositories().categories.add({
+        "name": name,
+        "type": type_trans,
+        "categoria_tipo": categoria_tipo
+    })
+    invalidate_category_index()
+    return result
 
 def delete_category(category_id):
     """
@@ -124,43 +205,91 @@ def delete_category(category_id):
     Args:
         category_id (int): ID da categoria
     """
-    # No Supabase, usamos update para marcar como inativo
-    return supabase_update_category(category_id, {"active": False})
+    # Exclusão lógica: a categoria continua no banco, marcada como inativa
+    result = get_repositories().categories.update(category_id, {"active": False})
+    invalidate_category_index()
+    return result
+
+def plan_recategorization(transactions, type_filter=None):
+    """
+    Compara o categoria_tipo das transações com o das categorias atuais.
+    
+    O diff é calculado de uma vez sobre um DataFrame e agrupado pelo
+    categoria_tipo de destino.
+    
+    Args:
+        transactions (list): Transações a verificar
+        type_filter (str, optional): Considerar apenas transações desse tipo
+        
+    Returns:
+        dict: total, changed, by_target ({tipo: {"categories", "count"}}) e
+            changes (id, description, category, de, para)
+    """
+    cat_map = {name: cat.get("categoria_tipo") for name, cat in _get_category_index()["by_name"].items()}
+    plan = {"total": 0, "changed": 0, "by_target": {}, "changes": [], "rows": []}
+    
+    df = pd.DataFrame(list(transactions or []))
+    if df.empty or "category" not in df.columns:
+        return plan
+    for column in ("id", "description", "type", "categoria_tipo"):
+        if column not in df.columns:
+            df[column] = None
+    if type_filter:
+        df = df[df["type"] == type_filter]
+    plan["total"] = len(df)
+    
+    novo = df["category"].map(cat_map)
+    changed = df[novo.notna() & (novo != df["categoria_tipo"]) & df["id"].notna()].copy()
+    changed["para"] = novo[changed.index]
+    plan["changed"] = len(changed)
+    
+    for tipo, grupo in changed.groupby("para"):
+        plan["by_target"][tipo] = {
+            "categories": sorted(grupo["category"].unique().tolist()),
+            "count": len(grupo)
+        }
+    changed = changed.astype(object).where(changed.notna(), None)
+    plan["changes"] = changed.rename(columns={"categoria_tipo": "de"})[
+        ["id", "description", "category", "de", "para"]].to_dict("records")
+    plan["rows"] = changed.drop(columns=["para"]).to_dict("records")
+    return plan
 
-def recategorize_transactions(type_filter=None):
+def recategorize_transactions(type_filter=None, dry_run=False):
     """
     Atualiza a classificação 50/30/20 de todas as transações com base nas categorias atuais
     
+    As alterações são aplicadas com uma escrita por categoria_tipo de destino
+    (UPDATE ... WHERE category IN (...)), e não uma por transação.
+    
     Args:
         type_filter (str, optional): Filtrar por tipo (Despesa/Receita)
+        dry_run (bool): Apenas calcula o diff, sem gravar
+        
+    Returns:
+        dict: Relatório do plan_recategorization mais "updates" (escritas
+            feitas) e "dry_run"
     """
     # Para evitar importação circular, importamos aqui
-    from supabase_db import get_transactions, update_transaction
+    from transactions_db import view_transactions, bulk_update_transactions
     
-    # Obter todas as transações
-    transactions = get_transactions()
+    # Obter todas as transações direto do banco
+    plan = plan_recategorization(view_transactions(force_refresh=True), type_filter)
+    rows = plan.pop("rows")
+    plan["dry_run"] = dry_run
+    plan["updates"] = 0
+    if dry_run:
+        return plan
     
-    # Criar mapeamento de categorias para tipos
-    all_categories = get_categories()
-    cat_map = {cat.get("name"): cat.get("categoria_tipo") for cat in all_categories}
-    
-    # Filtrar por tipo se especificado
-    if type_filter:
-        transactions = [t for t in transactions if t.get("type") == type_filter]
-    
-    # Atualizar categoria_tipo de cada transação
-    for transaction in transactions:
-        transaction_id = transaction.get("id")
-        if not transaction_id:
-            continue
-            
-        category = transaction.get("category")
-        if not category or category not in cat_map:
-            continue
-            
-        new_categoria_tipo = cat_map.get(category)
-        if new_categoria_tipo and new_categoria_tipo != transaction.get("categoria_tipo"):
-            update_transaction(transaction_id, {"categoria_tipo": new_categoria_tipo})
+    for tipo, target in plan["by_target"].items():
+        previous = [row for row in rows if row.get("category") in target["categories"]]
+        bulk_update_transactions(
+            {"categoria_tipo": tipo},
+            categories=target["categories"],
+            types=[type_filter] if type_filter else None,
+            previous=previous
+        )
+        plan["updates"] += 1
+    return plan
 
 def update_category(category_id, name=None, type_trans=None, categoria_tipo=None, active=None):
     """
@@ -185,9 +314,11 @@ def update_category(category_id, name=None, type_trans=None, categoria_tipo=None
     if active is not None:
         data["active"] = active
     
-    # Atualizar categoria no Supabase
+    # Atualizar categoria no banco ativo
     if data:
-        return supabase_update_category(category_id, data)
+        result = get_repositories().categories.update(category_id, data)
+        invalidate_category_index()
+        return result
     
     return None
 
@@ -0,0 +1,80 @@
+"""
+Verifica o orçamento de tempo de importação do ponto de entrada (run.py).
+
+Importa run.py em um processo Python novo, mede o tempo e confere que
+nenhum módulo de página nem dependência pesada foi carregado antes de uma
+página ser selecionada. Retorna código de saída 1 se o orçamento for estourado.
+
+Uso:
+    python check_import_time.py [--budget SEGUNDOS]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# Orçamento padrão para importar run.py com o cache de bytecode já quente
+DEFAULT_BUDGET_SECONDS = 3.0
+
+# Módulos que só podem ser carregados quando a página correspondente é aberta
+# (plotly.graph_objects fica de fora: o próprio streamlit já o importa)
+LAZY_MODULES = [
+    "dashboard", "dashboard2", "dashboard_engine", "finance_assistant", "budget_tool", "reports",
+    "goals", "ui", "openai", "plotly.express"
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import run
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+def measure_import():
+    """
+    Importa run.py em um subprocesso.
+
+    Returns:
+        dict: {"seconds": tempo de importação, "modules": módulos carregados}
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def check_import_time(budget=DEFAULT_BUDGET_SECONDS):
+    """
+    Executa a verificação e imprime o resultado.
+
+    Args:
+        budget (float): Tempo máximo aceito, em segundos
+
+    Returns:
+        bool: True se dentro do orçamento e sem importações antecipadas
+    """
+    # A primeira execução compila o bytecode; a medida vale a partir da segunda
+    measure_import()
+    result = measure_import()
+    loaded = [m for m in LAZY_MODULES if m in result["modules"]]
+
+    print(f"Importação de run.py: {result['seconds']:.3f}s (orçamento {budget:.3f}s)")
+    print(f"Módulos carregados: {len(result['modules'])}")
+    ok = True
+    if result["seconds"] > budget:
+        print("ERRO: tempo de importação acima do orçamento")
+        ok = False
+    if loaded:
+        print(f"ERRO: módulos carregados antes de selecionar a página: {', '.join(loaded)}")
+        ok = False
+    if ok:
+        print("OK")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="Tempo máximo de importação em segundos")
+    args = parser.parse_args()
+    sys.exit(0 if check_import_time(args.budget) else 1)
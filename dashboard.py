@@ -6,241 +6,33 @@ from datetime import datetime, timedelta
 import sqlite3
 from dateutil.relativedelta import relativedelta
 import json
-from transactions_db import view_goals as get_goals
-from transactions_db import view_transactions
-from categories import get_categories  # função original para obter categorias
+from transactions_db import view_transactions, invalidate_transactions_cache
+# Os cálculos ficam em dashboard_engine (compartilhado com dashboard2.py);
+# os nomes continuam exportados aqui para quem importa de dashboard.
+from dashboard_engine import (
+    PERIOD_OPTIONS, parse_date, period_bounds, filter_bounds, filter_transactions,
+    connect_to_database, get_categories, view_goals, calculate_summary, get_monthly_summary,
+    period_summary, total_summary, get_balance, get_expense_distribution,
+    get_monthly_rollup, get_historical_data, projetar_valores_futuros,
+    DashboardModel, get_dashboard_model
+)
 from theme_manager import init_theme_manager, get_theme_colors, theme_config_section, apply_theme_to_plotly_chart
 import calendar
 import io
 import base64
 import numpy as np
-from supabase_db import init_supabase
+import aggregations
+from app_logging import get_logger
+from profiler import profiled
 import random
 
-# ---------------------------------------------------------------------
-# Helper Functions
-# ---------------------------------------------------------------------
-
-def parse_date(date_str):
-    """
-    Converte uma string em objeto datetime usando formatos comuns.
-    Retorna None se a conversão não for possível.
-    """
-    if not date_str:
-        return None
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
-        try:
-            return datetime.strptime(date_str, fmt)
-        except (ValueError, TypeError):
-            continue
-    return None
-
-def filter_transactions(transactions, start_date=None, end_date=None, category_filter=None, transaction_types=None):
-    """
-    Filtra a lista de transações com base em data, categorias e tipos.
-    Se nenhum filtro de data for fornecido, mantém apenas as transações do mês atual.
-    """
-    filtered = []
-    for transaction in transactions:
-        date_str = transaction.get('date')
-        trans_date = parse_date(date_str)
-        if not trans_date:
-            continue
-
-        # Filtro por data
-        if start_date and end_date:
-            start = datetime.strptime(start_date, "%Y-%m-%d")
-            end = datetime.strptime(end_date, "%Y-%m-%d")
-            if not (start <= trans_date <= end):
-                continue
-        elif not (start_date or end_date):
-            # Se não foi passado filtro, manter apenas transações do mês atual
-            today = datetime.now()
-            if not (trans_date.month == today.month and trans_date.year == today.year):
-                continue
-
-        filtered.append(transaction)
-
-    # Filtro por categoria (se informado)
-    if category_filter and len(category_filter) > 0:
-        filtered = [t for t in filtered if t.get('category') in category_filter]
-
-    # Filtro por tipo de transação (case insensitive e considerando variações)
-    if transaction_types and len(transaction_types) > 0:
-        filtered_by_type = []
-        for transaction in filtered:
-            t_type = transaction.get('type', '').lower()
-            for tipo in transaction_types:
-                tipo_lower = tipo.lower()
-                if (tipo_lower == t_type or
-                    (tipo_lower == 'receita' and t_type in ['receita', 'income', 'revenue']) or
-                    (tipo_lower == 'despesa' and t_type in ['despesa', 'expense', 'expenses']) or
-                    (tipo_lower == 'investimento' and t_type in ['investimento', 'investment'])):
-                    filtered_by_type.append(transaction)
-                    break
-        filtered = filtered_by_type
-
-    return filtered
-
-# ---------------------------------------------------------------------
-# Funções de Conexão e Acesso ao Banco de Dados
-# ---------------------------------------------------------------------
-
-def connect_to_database():
-    """
-    Estabelece conexão com o banco de dados.
-    
-    Returns:
-        sqlite3.Connection ou supabase.Client: Conexão com o banco de dados.
-    """
-    try:
-        return init_supabase()
-    except Exception as e:
-        st.error(f"Erro ao conectar ao banco de dados: {e}")
-        raise
+logger = get_logger(__name__)
 
 # ---------------------------------------------------------------------
-# Funções de Processamento dos Dados
+# Funções de Gráficos
 # ---------------------------------------------------------------------
 
-def calculate_summary(transactions):
-    """
-    Calcula o resumo financeiro a partir das transações.
-    
-    Args:
-        transactions (list): Lista de transações a serem analisadas.
-        
-    Returns:
-        dict: Resumo financeiro contendo receitas, despesas, saldo, investimentos,
-              distribuição por categoria, regra 50/30/20 e KPIs.
-    """
-    if not transactions:
-        return {
-            "receitas": 0, 
-            "despesas": 0, 
-            "saldo_mes": 0, 
-            "investimentos": 0, 
-            "por_categoria": {}, 
-            "regra_50_30_20": {"Necessidades": 0, "Desejos": 0, "Investimentos": 0}, 
-            "kpis": {"saude_financeira": "Sem dados", "taxa_poupanca": 0, "relacao_despesa_receita": 0}
-        }
-    
-    print(f"Analisando {len(transactions)} transações")
-    tipos_unicos = set(str(t.get('type', '')).lower() for t in transactions)
-    print(f"Tipos únicos encontrados: {tipos_unicos}")
-    
-    for t in transactions:
-        print(f"ID: {t.get('id')} | Desc: {t.get('description')} | Tipo: {t.get('type')} | Status: {t.get('status')} | Valor: {t.get('amount')} | Categoria Tipo: {t.get('categoria_tipo')}")
-    
-    receitas = 0
-    despesas = 0
-    investimentos = 0
-
-    for transaction in transactions:
-        try:
-            tipo = str(transaction.get('type', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            status = str(transaction.get('status', '')).lower()
-            
-            if status not in ['pago', 'paid']:
-                print(f"Transação não considerada - status: {status}: {transaction.get('description')}")
-                continue
-                
-            if tipo in ['receita', 'income', 'revenue']:
-                receitas += valor
-                print(f"Receita encontrada: {transaction.get('description')} - R${valor} (Tipo: {tipo})")
-            elif tipo in ['despesa', 'expense', 'expenses']:
-                despesas += valor
-                print(f"Despesa encontrada: {transaction.get('description')} - R${valor} (Tipo: {tipo})")
-            elif tipo in ['investimento', 'investment']:
-                investimentos += valor
-                print(f"Investimento encontrado: {transaction.get('description')} - R${valor} (Tipo: {tipo})")
-            else:
-                print(f"Tipo desconhecido: {tipo} para transação: {transaction.get('description')}")
-        except Exception as e:
-            print(f"Erro ao processar transação: {e}")
-            continue
-
-    saldo = receitas - despesas - investimentos
-
-    por_categoria = {}
-    for transaction in transactions:
-        try:
-            tipo = str(transaction.get('type', '')).lower()
-            if tipo not in ['despesa', 'expense', 'expenses']:
-                continue
-            status = str(transaction.get('status', '')).lower()
-            if status not in ['pago', 'paid']:
-                continue
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            
-            if categoria_tipo in ['necessidade', 'necessidades']:
-                categoria = 'Necessidades'
-            elif categoria_tipo in ['desejo', 'desejos']:
-                categoria = 'Lazer'
-            elif categoria_tipo == 'investimento':
-                categoria = 'Investimentos'
-            else:
-                categoria = 'Outros'
-            
-            por_categoria[categoria] = por_categoria.get(categoria, 0) + valor
-        except Exception as e:
-            print(f"Erro ao processar categoria: {e}")
-            continue
-
-    regra_50_30_20 = {"Necessidades": 0, "Desejos": 0, "Investimentos": investimentos}
-    for transaction in transactions:
-        try:
-            tipo = str(transaction.get('type', '')).lower()
-            if tipo not in ['despesa', 'expense', 'expenses']:
-                continue
-            status = str(transaction.get('status', '')).lower()
-            if status not in ['pago', 'paid']:
-                continue
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            if categoria_tipo in ['necessidade', 'necessidades']:
-                regra_50_30_20["Necessidades"] += valor
-                print(f"Adicionando à Necessidades: {transaction.get('description')} - R${valor}")
-            elif categoria_tipo in ['desejo', 'desejos']:
-                regra_50_30_20["Desejos"] += valor
-                print(f"Adicionando à Desejos: {transaction.get('description')} - R${valor}")
-            else:
-                print(f"Categoria tipo não mapeada: {categoria_tipo} para transação: {transaction.get('description')}")
-        except Exception as e:
-            print(f"Erro ao processar regra 50/30/20: {e}")
-            continue
-
-    taxa_poupanca = (investimentos / receitas * 100) if receitas > 0 else 0
-    relacao_despesa_receita = ((despesas + investimentos) / receitas * 100) if receitas > 0 else 0
-
-    if saldo > 0 and taxa_poupanca >= 10:
-        saude_financeira = "Ótima"
-    elif saldo > 0:
-        saude_financeira = "Boa"
-    elif saldo == 0:
-        saude_financeira = "Atenção"
-    else:
-        saude_financeira = "Crítica"
-
-    print(f"Resumo calculado: Receitas={receitas}, Despesas={despesas}, Investimentos={investimentos}")
-    print(f"Regra 50/30/20: {regra_50_30_20}")
-    
-    return {
-        "receitas": receitas,
-        "despesas": despesas,
-        "saldo_mes": saldo,
-        "investimentos": investimentos,
-        "por_categoria": por_categoria,
-        "regra_50_30_20": regra_50_30_20,
-        "kpis": {
-            "saude_financeira": saude_financeira,
-            "taxa_poupanca": taxa_poupanca,
-            "relacao_despesa_receita": relacao_despesa_receita
-        }
-    }
-
+@profiled()
 def create_pie_chart(data, column, title):
     theme_colors = get_theme_colors()
 
@@ -283,6 +75,7 @@ def create_pie_chart(data, column, title):
 
     return fig
 
+@profiled()
 def create_bar_chart(data, x, y, title):
     """
     Cria um gráfico de barras com tema.
@@ -333,6 +126,7 @@ def create_bar_chart(data, x, y, title):
     )
     return fig
 
+@profiled()
 def create_budget_comparison_chart(actual, ideal, labels):
     """
     Compara o orçamento real versus ideal com um gráfico de barras.
@@ -365,6 +159,7 @@ def create_budget_comparison_chart(actual, ideal, labels):
     )
     return apply_theme_to_plotly_chart(fig)
 
+@profiled()
 def create_trend_chart(titulo, dados_mensais, y_label="Valor (R$)"):
     """
     Cria um gráfico de linha para visualizar a tendência ao longo do tempo.
@@ -408,278 +203,6 @@ def create_trend_chart(titulo, dados_mensais, y_label="Valor (R$)"):
     )
     return apply_theme_to_plotly_chart(fig)
 
-def projetar_valores_futuros(dados_historicos, meses_futuros=3, metodo="media_movel"):
-    """
-    Projeta valores futuros com base em dados históricos usando média móvel ou tendência linear.
-    
-    Args:
-        dados_historicos (dict): Histórico no formato {período: valor}.
-        meses_futuros (int): Número de meses para projeção.
-        metodo (str): "media_movel" ou "tendencia".
-        
-    Returns:
-        dict: Projeção no formato {período: valor}.
-    """
-    if not dados_historicos or len(dados_historicos) < 2:
-        return {}
-    periodos = sorted(list(dados_historicos.keys()))
-    valores = [dados_historicos[p] for p in periodos]
-    if metodo == "media_movel":
-        n_meses = min(3, len(valores))
-        media = sum(valores[-n_meses:]) / n_meses
-        previsao = [media] * meses_futuros
-    elif metodo == "tendencia":
-        if len(valores) >= 2:
-            tendencia = valores[-1] - valores[-2]
-            tendencia = max(min(tendencia, valores[-1] * 0.2), -valores[-1] * 0.2)
-            previsao = [valores[-1] + tendencia * (i+1) for i in range(meses_futuros)]
-        else:
-            previsao = [valores[-1]] * meses_futuros
-    else:
-        previsao = [valores[-1]] * meses_futuros
-
-    ultimo_periodo = periodos[-1]
-    if '-' in ultimo_periodo:
-        ano, mes = ultimo_periodo.split('-')
-        periodos_futuros = []
-        for i in range(1, meses_futuros + 1):
-            mes_futuro = int(mes) + i
-            ano_futuro = int(ano)
-            if mes_futuro > 12:
-                ano_futuro += (mes_futuro - 1) // 12
-                mes_futuro = ((mes_futuro - 1) % 12) + 1
-            periodos_futuros.append(f"{ano_futuro}-{mes_futuro:02d}")
-    else:
-        periodos_futuros = [f"P{i+1}" for i in range(meses_futuros)]
-    projecoes = {periodos_futuros[i]: previsao[i] for i in range(meses_futuros)}
-    return projecoes
-
-# ---------------------------------------------------------------------
-# Funções de Resumo Mensal e Histórico
-# ---------------------------------------------------------------------
-
-def get_monthly_summary(month=None, year=None, start_date=None, end_date=None, category_filter=None, transaction_types=None):
-    """
-    Obtém o resumo mensal de transações aplicando os filtros de data, categoria e tipo.
-    
-    Args:
-        month (int, opcional): Mês para filtrar.
-        year (int, opcional): Ano para filtrar.
-        start_date (str, opcional): Data inicial (YYYY-MM-DD).
-        end_date (str, opcional): Data final (YYYY-MM-DD).
-        category_filter (list, opcional): Lista de categorias.
-        transaction_types (list, opcional): Lista de tipos de transação.
-        
-    Returns:
-        dict: Resumo financeiro do período.
-    """
-    try:
-        transactions = view_transactions()
-        if not transactions:
-            st.warning("Nenhuma transação encontrada no banco de dados.")
-            return {
-                "receitas": 0, "despesas": 0, "saldo_mes": 0, "investimentos": 0,
-                "por_categoria": {}, "regra_50_30_20": {},
-                "kpis": {"saude_financeira": "Sem dados", "taxa_poupanca": 0, "relacao_despesa_receita": 0}
-            }
-        filtered_transactions = filter_transactions(transactions, start_date, end_date, category_filter, transaction_types)
-        print(f"Após filtragem, restaram {len(filtered_transactions)} transações")
-        tipos_encontrados = set(t.get('type', '').lower() for t in filtered_transactions)
-        print(f"Tipos encontrados após filtragem: {tipos_encontrados}")
-        summary = calculate_summary(filtered_transactions)
-        print(f"DEBUG - Resumo calculado: Receitas={summary['receitas']}, Despesas={summary['despesas']}, Investimentos={summary['investimentos']}")
-        return summary
-    except Exception as e:
-        st.error(f"Erro ao obter resumo mensal: {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return {
-            "receitas": 0, "despesas": 0, "saldo_mes": 0, "investimentos": 0,
-            "por_categoria": {}, "regra_50_30_20": {},
-            "kpis": {"saude_financeira": "Sem dados", "taxa_poupanca": 0, "relacao_despesa_receita": 0}
-        }
-
-def get_historical_data(months=12):
-    """
-    Obtém dados históricos de receitas, despesas, investimentos e saldo para os últimos 'months' meses.
-    
-    Args:
-        months (int): Número de meses no histórico.
-        
-    Returns:
-        dict: Dados organizados por período (YYYY-MM) para cada métrica.
-    """
-    try:
-        transactions = view_transactions()
-        current_date = datetime.now()
-        dados_historicos = {"Receitas": {}, "Despesas": {}, "Investimentos": {}, "Saldo": {}}
-        for i in range(months-1, -1, -1):
-            data_ref = current_date.replace(day=1) - relativedelta(months=i)
-            periodo = f"{data_ref.year}-{data_ref.month:02d}"
-            dados_historicos["Receitas"][periodo] = 0
-            dados_historicos["Despesas"][periodo] = 0
-            dados_historicos["Investimentos"][periodo] = 0
-            if data_ref.month == 12:
-                month_end = data_ref.replace(year=data_ref.year+1, month=1, day=1).strftime("%Y-%m-%d")
-            else:
-                month_end = data_ref.replace(month=data_ref.month+1, day=1).strftime("%Y-%m-%d")
-            month_start = data_ref.strftime("%Y-%m-%d")
-            for transaction in transactions:
-                trans_date = transaction.get('date', '')
-                if month_start <= trans_date < month_end:
-                    valor = float(transaction.get('amount', 0))
-                    tipo = str(transaction.get('type', '')).lower()
-                    status = str(transaction.get('status', '')).lower()
-                    if status not in ['pago', 'paid']:
-                        continue
-                    if tipo in ['receita', 'income', 'revenue']:
-                        dados_historicos["Receitas"][periodo] += valor
-                        dados_historicos["Saldo"][periodo] = dados_historicos["Saldo"].get(periodo, 0) + valor
-                    elif tipo in ['despesa', 'expense', 'expenses']:
-                        dados_historicos["Despesas"][periodo] += valor
-                        dados_historicos["Saldo"][periodo] = dados_historicos["Saldo"].get(periodo, 0) - valor
-                    elif tipo in ['investimento', 'investment']:
-                        dados_historicos["Investimentos"][periodo] += valor
-                        dados_historicos["Saldo"][periodo] = dados_historicos["Saldo"].get(periodo, 0) - valor
-            if periodo not in dados_historicos["Saldo"]:
-                dados_historicos["Saldo"][periodo] = 0
-            print(f"Dados do período {periodo}:")
-            print(f"Receitas: R$ {dados_historicos['Receitas'][periodo]:.2f}")
-            print(f"Despesas: R$ {dados_historicos['Despesas'][periodo]:.2f}")
-            print(f"Investimentos: R$ {dados_historicos['Investimentos'][periodo]:.2f}")
-            print(f"Saldo: R$ {dados_historicos['Saldo'][periodo]:.2f}")
-            print("---")
-        dados_historicos["Receitas"] = {k: dados_historicos["Receitas"][k] for k in sorted(dados_historicos["Receitas"].keys())}
-        dados_historicos["Despesas"] = {k: dados_historicos["Despesas"][k] for k in sorted(dados_historicos["Despesas"].keys())}
-        dados_historicos["Investimentos"] = {k: dados_historicos["Investimentos"][k] for k in sorted(dados_historicos["Investimentos"].keys())}
-        dados_historicos["Saldo"] = {k: dados_historicos["Saldo"][k] for k in sorted(dados_historicos["Saldo"].keys())}
-        return dados_historicos
-    except Exception as e:
-        st.error(f"Erro ao obter dados históricos: {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return {"Receitas": {}, "Despesas": {}, "Investimentos": {}, "Saldo": {}}
-
-def get_balance():
-    """
-    Calcula o saldo atual, total investido e patrimônio total.
-    
-    Returns:
-        dict: {"saldo_conta": ..., "total_investido": ..., "patrimonio_total": ...}
-    """
-    try:
-        transactions = view_transactions()
-        saldo_conta = 0
-        total_investido = 0
-        for transaction in transactions:
-            status = str(transaction.get('status', '')).lower()
-            if status not in ['pago', 'paid']:
-                continue
-            tipo = str(transaction.get('type', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            if tipo in ['receita', 'income', 'revenue']:
-                saldo_conta += valor
-            elif tipo in ['despesa', 'expense', 'expenses']:
-                saldo_conta -= valor
-            elif tipo in ['investimento', 'investment']:
-                saldo_conta -= valor
-                total_investido += valor
-        patrimonio_total = saldo_conta + total_investido
-        return {
-            "saldo_conta": saldo_conta,
-            "total_investido": total_investido,
-            "patrimonio_total": patrimonio_total
-        }
-    except Exception as e:
-        st.error(f"Erro ao calcular saldo: {e}")
-        return {"saldo_conta": 0, "total_investido": 0, "patrimonio_total": 0}
-
-def get_expense_distribution(category_filter=None, transactions_data=None):
-    """
-    Obtém a distribuição de despesas por categoria.
-    
-    Args:
-        category_filter (list): Lista opcional de categorias para filtrar.
-        transactions_data (list): Lista opcional de transações já filtradas.
-        
-    Returns:
-        dict: {categoria: valor}
-    """
-    try:
-        from transactions_db import view_transactions
-        print("Buscando transações para distribuição de despesas...")
-        if transactions_data is None:
-            from supabase_db import init_supabase
-            supabase = init_supabase()
-            if not supabase:
-                print("Erro ao conectar ao Supabase")
-                return {}
-            response = supabase.table("transactions").select("*").execute()
-            transactions = response.data
-            print(f"Buscando diretamente do Supabase: {len(transactions)} transações encontradas")
-        else:
-            transactions = transactions_data
-            print(f"Usando transações fornecidas: {len(transactions)} transações")
-        
-        despesas = {}
-        despesas_encontradas = 0
-        print(f"Processando {len(transactions)} transações para análise de categorias")
-        for transaction in transactions:
-            tipo = str(transaction.get('type', '')).lower()
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            status = str(transaction.get('status', '')).lower()
-            print(f"Analisando: {transaction.get('description')}, Tipo: {tipo}, Categoria: {categoria_tipo}, Status: {status}, Valor: {transaction.get('amount')}")
-            if tipo not in ['despesa', 'expense', 'expenses']:
-                print(f"Ignorando (não é despesa): {transaction.get('description')} - Tipo: {tipo}")
-                continue
-                
-            categoria = categoria_tipo if categoria_tipo else 'Outros'
-            if categoria in ['necessidade', 'necessidades']:
-                categoria = 'Necessidades'
-            elif categoria in ['desejo', 'desejos']:
-                categoria = 'Lazer'
-            elif categoria == 'investimento':
-                categoria = 'Investimentos'
-            else:
-                categoria = 'Outros'
-            if category_filter and categoria not in category_filter:
-                print(f"Ignorando (filtro de categoria): {transaction.get('description')}")
-                continue
-            valor = float(transaction.get('amount', 0))
-            despesas[categoria] = despesas.get(categoria, 0) + valor
-            print(f"Adicionando à categoria {categoria}: +R${valor:.2f} = R${despesas[categoria]:.2f}")
-            despesas_encontradas += 1
-        print(f"Total de despesas encontradas: {despesas_encontradas}")
-        print(f"Distribuição de despesas final: {despesas}")
-        return dict(sorted(despesas.items(), key=lambda x: x[1], reverse=True)) if despesas else {}
-    except Exception as e:
-        print(f"ERRO na distribuição de despesas: {e}")
-        st.error(f"Erro ao obter distribuição de despesas: {e}")
-        import traceback
-        print(traceback.format_exc())
-        return {}
-
-def get_categories():
-    """
-    Obtém todas as categorias disponíveis para filtros.
-    
-    Returns:
-        list: Lista de nomes das categorias.
-    """
-    from categories import get_categories as get_all_categories
-    all_categories = get_all_categories()
-    category_names = [cat.get("name", "") for cat in all_categories if cat.get("name")]
-    return sorted(category_names)
-
-def view_goals():
-    """
-    Recupera as metas financeiras do usuário.
-    
-    Returns:
-        list: Lista de metas.
-    """
-    return get_goals()
-
 # ---------------------------------------------------------------------
 # Função Principal de Exibição do Dashboard
 # ---------------------------------------------------------------------
@@ -719,41 +242,23 @@ def show_dashboard():
         st.markdown(button_style, unsafe_allow_html=True)
         if st.button("🔄 Atualizar Dados", use_container_width=True):
             st.cache_data.clear()
+            invalidate_transactions_cache()
             st.rerun()
     
     # Sidebar com filtros
     with st.sidebar:
         st.subheader("📆 Período de Análise")
-        periodo_opcoes = ["Mês Atual", "Mês Anterior", "Últimos 3 Meses", "Ano Atual", "Personalizado"]
-        periodo_selecionado = st.selectbox("Selecione o período", periodo_opcoes)
-        data_inicio = None
-        data_fim = None
+        periodo_selecionado = st.selectbox("Selecione o período", PERIOD_OPTIONS)
         data_atual = datetime.now()
-        if periodo_selecionado == "Mês Atual":
-            data_inicio = data_atual.replace(day=1)
-            if data_atual.month == 12:
-                data_fim = data_atual.replace(year=data_atual.year + 1, month=1, day=1)
-            else:
-                data_fim = data_atual.replace(month=data_atual.month + 1, day=1)
-        elif periodo_selecionado == "Mês Anterior":
-            if data_atual.month == 1:
-                data_inicio = data_atual.replace(year=data_atual.year - 1, month=12, day=1)
-                data_fim = data_atual.replace(day=1)
-            else:
-                data_inicio = data_atual.replace(month=data_atual.month - 1, day=1)
-                data_fim = data_atual.replace(day=1)
-        elif periodo_selecionado == "Últimos 3 Meses":
-            data_inicio = (data_atual - timedelta(days=90)).replace(day=1)
-            data_fim = data_atual.replace(day=data_atual.day + 1)
-        elif periodo_selecionado == "Ano Atual":
-            data_inicio = data_atual.replace(month=1, day=1)
-            data_fim = data_atual.replace(year=data_atual.year + 1, month=1, day=1)
-        elif periodo_selecionado == "Personalizado":
+        data_inicio, data_fim = period_bounds(periodo_selecionado, data_atual)
+        if periodo_selecionado == "Personalizado":
             data_inicio = st.date_input("Data Inicial", value=data_atual.replace(day=1))
             data_fim = st.date_input("Data Final", value=data_atual)
             if data_inicio >= data_fim:
                 st.warning("Data inicial deve ser anterior à data final")
                 data_fim = data_inicio + timedelta(days=1)
+            # A data final escolhida é inclusiva; as consultas usam limite exclusivo
+            data_fim = data_fim + timedelta(days=1)
         inicio_str = data_inicio.strftime("%Y-%m-%d") if data_inicio else None
         fim_str = data_fim.strftime("%Y-%m-%d") if data_fim else None
         st.markdown("---")
@@ -773,61 +278,20 @@ def show_dashboard():
         )
         aplicar_filtros = st.button("Aplicar Filtros", type="primary")
     
-    summary = None
-    filtered_transactions = view_transactions()
+    # Todos os dados das abas vêm de um único DashboardModel, calculado uma vez
+    # por estado dos dados e dos filtros e reaproveitado entre as execuções
     if aplicar_filtros:
-        if inicio_str or fim_str:
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if (inicio_str is None or t.get('date', '') >= inicio_str) and
-                   (fim_str is None or t.get('date', '') <= fim_str)
-            ]
-        if categorias_selecionadas:
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if t.get('category') in categorias_selecionadas
-            ]
-        if tipo_transacao:
-            tipo_map = {
-                "Receita": ["income", "receita", "revenue"],
-                "Despesa": ["expense", "despesa", "expenses"],
-                "Investimento": ["investment", "investimento"]
-            }
-            tipos_permitidos = []
-            for t in tipo_transacao:
-                if t in tipo_map:
-                    tipos_permitidos.extend(tipo_map[t])
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if str(t.get('type', '')).lower() in tipos_permitidos
-            ]
-        summary = calculate_summary(filtered_transactions)
+        model = get_dashboard_model(inicio_str, fim_str, categorias_selecionadas, tipo_transacao)
         st.success(f"Filtros aplicados: {periodo_selecionado}")
     else:
-        data_atual = datetime.now()
-        inicio_padrao = data_atual.replace(day=1)
-        if data_atual.month == 12:
-            fim_padrao = data_atual.replace(year=data_atual.year + 1, month=1, day=1)
-        else:
-            fim_padrao = data_atual.replace(month=data_atual.month + 1, day=1)
-        inicio_str = inicio_padrao.strftime("%Y-%m-%d")
-        fim_str = fim_padrao.strftime("%Y-%m-%d")
-        filtered_transactions = [
-            t for t in filtered_transactions 
-            if (t.get('date', '') >= inicio_str) and (t.get('date', '') < fim_str)
-        ]
-        summary = calculate_summary(filtered_transactions)
-    
-    print("Buscando transações para o dashboard...")
-    transactions = view_transactions()
-    print(f"Total de transações encontradas: {len(transactions)}")
-    for t in transactions:
-        print(f"ID: {t.get('id')} | Desc: {t.get('description')} | Tipo: {t.get('type')} | Status: {t.get('status')}")
-    
-    resumo_total = calculate_summary(transactions)
-    print(f"Resumo total calculado: Receitas={resumo_total['receitas']}, Despesas={resumo_total['despesas']}, Investimentos={resumo_total['investimentos']}")
+        model = get_dashboard_model()
+    transactions = model.transactions
+    logger.debug("Dashboard com %d transações", len(transactions))
     
-    balance = get_balance()
+    summary = model.summary
+    # KPIs gerais a partir dos agregados mensais (O(meses)); sem eles, das transações
+    resumo_total = model.resumo_total
+    balance = model.balance
     theme_colors = get_theme_colors()
     
     st.subheader("📊 Visão Geral")
@@ -922,8 +386,7 @@ def show_dashboard():
 
         with col2:
             st.subheader("Distribuição de Gastos")
-            todas_transacoes = view_transactions()
-            categorias_valores = get_expense_distribution(transactions_data=todas_transacoes)
+            categorias_valores = model.distribution
             if categorias_valores:
                 df_categorias = pd.DataFrame([{"Categoria": k, "Valor": v} for k, v in categorias_valores.items()])
                 fig_pizza = create_pie_chart(df_categorias, 'Categoria', title='Distribuição de Despesas por Categoria')
@@ -956,8 +419,7 @@ def show_dashboard():
     # Aba 2: Categorias
     with tab2:
         st.subheader("Análise de Categorias")
-        todas_transacoes = view_transactions()
-        categorias_valores = get_expense_distribution(transactions_data=todas_transacoes)
+        categorias_valores = model.distribution
 
         if categorias_valores:
             df_categorias = pd.DataFrame([
@@ -1107,7 +569,7 @@ def show_dashboard():
     # Aba 4: Tendências
     with tab4:
         st.subheader("Análise de Tendências")
-        dados_historicos = get_historical_data()
+        dados_historicos = model.historical
         if dados_historicos["Receitas"]:
             fig_tendencia = create_trend_chart("Tendência de Receitas e Despesas", dados_historicos)
             st.plotly_chart(fig_tendencia, use_container_width=True)
@@ -1165,7 +627,7 @@ def show_dashboard():
     # Aba 5: Metas
     with tab5:
         st.subheader("🎯 Metas Financeiras")
-        metas = view_goals()
+        metas = model.goals
         if metas:
             for meta in metas:
                 meta_valor = float(meta.get('target_amount', 0))
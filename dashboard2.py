@@ -6,206 +6,24 @@ from datetime import datetime, timedelta
 import sqlite3
 from dateutil.relativedelta import relativedelta
 import json
-from transactions_db import view_goals as get_goals
 from transactions_db import view_transactions
-from categories import get_categories
 from theme_manager import init_theme_manager, get_theme_colors, theme_config_section, apply_theme_to_plotly_chart
 import calendar
 import io
 import base64
 import numpy as np
-from supabase_db import init_supabase
+import aggregations
+# Cálculos compartilhados com dashboard.py
+from dashboard_engine import (
+    PERIOD_OPTIONS, period_bounds, connect_to_database, get_categories, view_goals,
+    calculate_summary, get_monthly_summary, period_summary, total_summary, get_balance,
+    get_expense_distribution, get_historical_data, projetar_valores_futuros,
+    get_dashboard_model
+)
+from app_logging import get_logger
 import random
 
-def connect_to_database():
-    """
-    Estabelece conexão com o banco de dados.
-    
-    Returns:
-        sqlite3.Connection ou supabase.Client: Conexão com o banco de dados.
-    """
-    try:
-        # Retornar cliente do Supabase
-        return init_supabase()
-    except Exception as e:
-        st.error(f"Erro ao conectar ao banco de dados: {e}")
-        raise
-
-def calculate_summary(transactions):
-    """
-    Calcula o resumo financeiro a partir das transações
-    
-    Args:
-        transactions: Lista de transações a serem analisadas
-        
-    Returns:
-        dict: Resumo financeiro contendo receitas, despesas, saldo e análises
-    """
-    if not transactions:
-        # Retornar dados vazios quando não há transações
-        return {
-            "receitas": 0, 
-            "despesas": 0, 
-            "saldo_mes": 0, 
-            "investimentos": 0, 
-            "por_categoria": {}, 
-            "regra_50_30_20": {
-                "Necessidades": 0,
-                "Desejos": 0,
-                "Investimentos": 0
-            }, 
-            "kpis": {
-                "saude_financeira": "Sem dados", 
-                "taxa_poupanca": 0, 
-                "relacao_despesa_receita": 0
-            }
-        }
-    
-    # Log para depuração - Verificar dados recebidos
-    print(f"Analisando {len(transactions)} transações")
-    tipos_unicos = set(str(t.get('type', '')).lower() for t in transactions)
-    print(f"Tipos únicos encontrados: {tipos_unicos}")
-    
-    # Imprimir detalhes de cada transação para debug
-    for t in transactions:
-        print(f"ID: {t.get('id')} | Desc: {t.get('description')} | Tipo: {t.get('type')} | Status: {t.get('status')} | Valor: {t.get('amount')} | Categoria Tipo: {t.get('categoria_tipo')}")
-    
-    # Inicializar contadores
-    receitas = 0
-    despesas = 0
-    investimentos = 0
-    
-    # Primeiro passo: Processar cada transação individualmente
-    for transaction in transactions:
-        try:
-            # Converter todos os campos para formatos consistentes
-            tipo = str(transaction.get('type', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            status = str(transaction.get('status', '')).lower()
-            
-            # Verificar o status da transação - aceitar 'pago' ou 'paid'
-            if status not in ['pago', 'paid']:
-                print(f"Transação não considerada - status: {status}: {transaction.get('description')}")
-                continue
-                
-            # Classificar a transação - verificar todas as variações possíveis
-            if tipo in ['receita', 'income', 'revenue']:
-                receitas += valor
-                print(f"Receita encontrada: {transaction.get('description')} - R${valor} (Tipo: {tipo})")
-            elif tipo in ['despesa', 'expense', 'expenses']:
-                despesas += valor
-                print(f"Despesa encontrada: {transaction.get('description')} - R${valor} (Tipo: {tipo})")
-            elif tipo in ['investimento', 'investment']:
-                investimentos += valor
-                print(f"Investimento encontrado: {transaction.get('description')} - R${valor} (Tipo: {tipo})")
-            else:
-                print(f"Tipo desconhecido: {tipo} para transação: {transaction.get('description')}")
-        except Exception as e:
-            print(f"Erro ao processar transação: {e}")
-            continue
-    
-    # Calcular saldo
-    saldo = receitas - despesas - investimentos
-    
-    # Agregação por categoria
-    por_categoria = {}
-    for transaction in transactions:
-        try:
-            tipo = str(transaction.get('type', '')).lower()
-            if tipo not in ['despesa', 'expense', 'expenses']:
-                continue
-                
-            # Verificar status da transação
-            status = str(transaction.get('status', '')).lower()
-            if status not in ['pago', 'paid']:
-                continue
-                
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            
-            if categoria_tipo in ['necessidade', 'necessidades']:
-                categoria = 'Necessidades'
-            elif categoria_tipo in ['desejo', 'desejos']:
-                categoria = 'Lazer'
-            elif categoria_tipo == 'investimento':
-                categoria = 'Investimentos'
-            else:
-                categoria = 'Outros'
-            
-            if categoria in por_categoria:
-                por_categoria[categoria] += valor
-            else:
-                por_categoria[categoria] = valor
-        except Exception as e:
-            print(f"Erro ao processar categoria: {e}")
-            continue
-    
-    # Calcular regra 50/30/20
-    regra_50_30_20 = {
-        "Necessidades": 0,
-        "Desejos": 0,
-        "Investimentos": investimentos
-    }
-    
-    for transaction in transactions:
-        try:
-            tipo = str(transaction.get('type', '')).lower()
-            if tipo not in ['despesa', 'expense', 'expenses']:
-                continue
-                
-            # Verificar status da transação
-            status = str(transaction.get('status', '')).lower()
-            if status not in ['pago', 'paid']:
-                continue
-                
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            
-            # Normalizar categoria_tipo para comparação
-            if categoria_tipo in ['necessidade', 'necessidades']:
-                regra_50_30_20["Necessidades"] += valor
-                print(f"Adicionando à Necessidades: {transaction.get('description')} - R${valor}")
-            elif categoria_tipo in ['desejo', 'desejos']:
-                regra_50_30_20["Desejos"] += valor
-                print(f"Adicionando à Desejos: {transaction.get('description')} - R${valor}")
-            else:
-                print(f"Categoria tipo não mapeada: {categoria_tipo} para transação: {transaction.get('description')}")
-        except Exception as e:
-            print(f"Erro ao processar regra 50/30/20: {e}")
-            continue
-    
-    # Calcular KPIs
-    taxa_poupanca = (investimentos / receitas * 100) if receitas > 0 else 0
-    relacao_despesa_receita = ((despesas + investimentos) / receitas * 100) if receitas > 0 else 0
-    
-    # Status de saúde financeira
-    if saldo > 0 and taxa_poupanca >= 10:
-        saude_financeira = "Ótima"
-    elif saldo > 0:
-        saude_financeira = "Boa"
-    elif saldo == 0:
-        saude_financeira = "Atenção"
-    else:
-        saude_financeira = "Crítica"
-    
-    # Log para depuração
-    print(f"Resumo calculado: Receitas={receitas}, Despesas={despesas}, Investimentos={investimentos}")
-    print(f"Regra 50/30/20: {regra_50_30_20}")
-    
-    return {
-        "receitas": receitas,
-        "despesas": despesas,
-        "saldo_mes": saldo,
-        "investimentos": investimentos,
-        "por_categoria": por_categoria,
-        "regra_50_30_20": regra_50_30_20,
-        "kpis": {
-            "saude_financeira": saude_financeira,
-            "taxa_poupanca": taxa_poupanca,
-            "relacao_despesa_receita": relacao_despesa_receita
-        }
-    }
+logger = get_logger(__name__)
 
 def create_pie_chart(data, column, title):
     """
@@ -363,580 +181,6 @@ def create_trend_chart(titulo, dados_mensais, y_label="Valor (R$)"):
     # Aplicar tema diretamente sem sobrescrever configurações depois
     return apply_theme_to_plotly_chart(fig)
 
-def projetar_valores_futuros(dados_historicos, meses_futuros=3, metodo="media_movel"):
-    """
-    Projeta valores futuros com base em métodos de previsão simples.
-    
-    Args:
-        dados_historicos: Dicionário com histórico no formato {período: valor}
-        meses_futuros: Quantidade de meses futuros para projetar
-        metodo: Método de previsão ("media_movel" ou "tendencia")
-        
-    Returns:
-        Dicionário com projeções no formato {período: valor}
-    """
-    if not dados_historicos or len(dados_historicos) < 2:
-        return {}
-    
-    # Ordenar dados históricos por período
-    periodos = sorted(list(dados_historicos.keys()))
-    valores = [dados_historicos[p] for p in periodos]
-    
-    if metodo == "media_movel":
-        # Média simples dos últimos 3 meses ou menos se não houver 3 meses
-        n_meses = min(3, len(valores))
-        media = sum(valores[-n_meses:]) / n_meses
-        previsao = [media] * meses_futuros
-    elif metodo == "tendencia":
-        # Tendência linear simples
-        if len(valores) >= 2:
-            tendencia = (valores[-1] - valores[-2])
-            # Limitar a tendência para evitar projeções extremas
-            tendencia = max(min(tendencia, valores[-1] * 0.2), -valores[-1] * 0.2)
-            previsao = [valores[-1] + tendencia * (i+1) for i in range(meses_futuros)]
-        else:
-            # Fallback para média se não houver dados suficientes
-            previsao = [valores[-1]] * meses_futuros
-    else:
-        # Método padrão: último valor
-        previsao = [valores[-1]] * meses_futuros
-    
-    # Gerar períodos futuros
-    ultimo_periodo = periodos[-1]
-    if '-' in ultimo_periodo:
-        ano, mes = ultimo_periodo.split('-')
-        periodos_futuros = []
-        for i in range(1, meses_futuros + 1):
-            mes_futuro = int(mes) + i
-            ano_futuro = int(ano)
-            if mes_futuro > 12:
-                ano_futuro += (mes_futuro - 1) // 12
-                mes_futuro = ((mes_futuro - 1) % 12) + 1
-            periodos_futuros.append(f"{ano_futuro}-{mes_futuro:02d}")
-    else:
-        # Formato alternativo de período
-        periodos_futuros = [f"P{i+1}" for i in range(meses_futuros)]
-    
-    # Montar resultado
-    projecoes = {}
-    for i, periodo in enumerate(periodos_futuros):
-        projecoes[periodo] = previsao[i]
-    
-    return projecoes
-
-def get_monthly_summary(month=None, year=None, start_date=None, end_date=None, category_filter=None, transaction_types=None):
-    """
-    Obtém o resumo mensal de transações.
-    
-    Args:
-        month (int, opcional): Mês específico para filtrar.
-        year (int, opcional): Ano específico para filtrar.
-        start_date (str, opcional): Data inicial para filtro personalizado.
-        end_date (str, opcional): Data final para filtro personalizado.
-        category_filter (list, opcional): Lista de categorias para filtrar.
-        transaction_types (list, opcional): Lista de tipos de transação para filtrar.
-        
-    Returns:
-        dict: Resumo financeiro do período.
-    """
-    try:
-        # Obter todas as transações
-        transactions = view_transactions()
-        
-        if not transactions:
-            st.warning("Nenhuma transação encontrada no banco de dados.")
-            return {"receitas": 0, "despesas": 0, "saldo_mes": 0, "investimentos": 0, "por_categoria": {}, "regra_50_30_20": {}, "kpis": {"saude_financeira": "Sem dados", "taxa_poupanca": 0, "relacao_despesa_receita": 0}}
-            
-        # Filtrar por data
-        filtered_transactions = []
-        
-        for transaction in transactions:
-            # Extrair data da transação ou usar data atual
-            date_str = transaction.get('date', None)
-            if not date_str:
-                continue
-                
-            try:
-                transaction_date = datetime.strptime(date_str, "%Y-%m-%d")
-            except (ValueError, TypeError):
-                # Se falhar, tentar outros formatos comuns
-                try:
-                    transaction_date = datetime.strptime(date_str, "%d/%m/%Y")
-                except (ValueError, TypeError):
-                    # Se ainda falhar, pular esta transação
-                    continue
-            
-            # Aplicar filtro de data
-            if start_date and end_date:
-                start = datetime.strptime(start_date, "%Y-%m-%d")
-                end = datetime.strptime(end_date, "%Y-%m-%d")
-                if not (start <= transaction_date <= end):
-                    continue
-            elif month and year:
-                if not (transaction_date.month == month and transaction_date.year == year):
-                    continue
-            else:
-                # Se nenhum filtro for fornecido, usar mês atual
-                current_date = datetime.now()
-                if not (transaction_date.month == current_date.month and transaction_date.year == current_date.year):
-                    continue
-        
-        # Apply category filter
-        if category_filter and len(category_filter) > 0:
-            filtered_transactions = [t for t in transactions if t.get('category') in category_filter]
-        
-        # Apply transaction type filter - case insensitive
-        if transaction_types and len(transaction_types) > 0:
-            filtered_by_type = []
-            for transaction in filtered_transactions:
-                transaction_type = transaction.get('type', '').lower()
-                type_matches = False
-                
-                for t_type in transaction_types:
-                    # Check both Portuguese and English versions
-                    if (t_type.lower() == transaction_type or 
-                        (t_type.lower() == 'receita' and transaction_type in ['receita', 'income']) or
-                        (t_type.lower() == 'despesa' and transaction_type in ['despesa', 'expense']) or
-                        (t_type.lower() == 'investimento' and transaction_type in ['investimento', 'investment'])):
-                        type_matches = True
-                        break
-                        
-                if type_matches:
-                    filtered_by_type.append(transaction)
-            
-            filtered_transactions = filtered_by_type
-        
-        # Debug para mostrar os tipos de transações encontrados
-        print(f"Após filtragem, restaram {len(filtered_transactions)} transações")
-        tipos_encontrados = set(t.get('type', '').lower() for t in filtered_transactions)
-        print(f"Tipos encontrados após filtragem: {tipos_encontrados}")
-        
-        # Calculate summary from filtered transactions
-        summary = calculate_summary(filtered_transactions)
-        
-        # Debug para ver os valores calculados
-        print(f"DEBUG - Resumo calculado: Receitas={summary['receitas']}, Despesas={summary['despesas']}, Investimentos={summary['investimentos']}")
-        
-        return summary
-    
-    except Exception as e:
-        st.error(f"Erro ao obter resumo mensal: {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return {"receitas": 0, "despesas": 0, "saldo_mes": 0, "investimentos": 0, "por_categoria": {}, "regra_50_30_20": {}, "kpis": {"saude_financeira": "Sem dados", "taxa_poupanca": 0, "relacao_despesa_receita": 0}}
-
-def get_historical_data(n_meses=6):
-    """
-    Obtém dados históricos dos últimos n meses
-    
-    Args:
-        n_meses: Número de meses no histórico
-        
-    Returns:
-        dict: Dados históricos organizados para análise de tendências
-    """
-    try:
-        dados_historicos = {"Receitas": {}, "Despesas": {}, "Investimentos": {}, "Saldo": {}}
-        
-        date_atual = datetime.now()
-        
-        for i in range(n_meses-1, -1, -1):
-            # Calcular mês e ano
-            data_ref = date_atual.replace(day=1) - relativedelta(months=i)
-            mes = data_ref.month
-            ano = data_ref.year
-            
-            # Chave para o período
-            periodo = f"{ano}-{mes:02d}"
-            
-            # Obter resumo do mês
-            resumo = get_monthly_summary(month=mes, year=ano)
-            
-            # Armazenar dados
-            dados_historicos["Receitas"][periodo] = resumo["receitas"]
-            dados_historicos["Despesas"][periodo] = resumo["despesas"]
-            dados_historicos["Investimentos"][periodo] = resumo["investimentos"]
-            dados_historicos["Saldo"][periodo] = resumo["saldo_mes"]
-        
-        return dados_historicos
-    except Exception as e:
-        st.error(f"Erro ao obter dados históricos: {e}")
-        return {"Receitas": {}, "Despesas": {}, "Investimentos": {}, "Saldo": {}}
-
-def get_balance():
-    """
-    Calcula o saldo atual
-    
-    Returns:
-        dict: Informações de saldo, investimentos e patrimônio total
-    """
-    try:
-        # Obter todas as transações e processar em memória
-        # (mais flexível com diferentes formatos de dados)
-        transactions = view_transactions()
-        
-        # Inicializar valores
-        saldo_conta = 0
-        total_investido = 0
-        
-        # Processar cada transação
-        for transaction in transactions:
-            # Verificar se a transação está paga
-            status = str(transaction.get('status', '')).lower()
-            if status not in ['pago', 'paid']:
-                continue
-                
-            # Obter o tipo e valor da transação
-            tipo = str(transaction.get('type', '')).lower()
-            valor = float(transaction.get('amount', 0))
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            
-            # Calcular saldo em conta
-            if tipo in ['receita', 'income', 'revenue']:
-                saldo_conta += valor
-            elif tipo in ['despesa', 'expense', 'expenses']:
-                saldo_conta -= valor
-            elif tipo in ['investimento', 'investment']:
-                saldo_conta -= valor
-                total_investido += valor
-            
-            # Não precisamos mais desta lógica que mistura os tipos de transações
-            # if tipo in ['investimento', 'investment'] or categoria_tipo == 'investimento':
-            #     total_investido += valor
-        
-        # Calcular patrimônio total
-        patrimonio_total = saldo_conta + total_investido
-        
-        return {
-            "saldo_conta": saldo_conta,
-            "total_investido": total_investido,
-            "patrimonio_total": patrimonio_total
-        }
-    except Exception as e:
-        st.error(f"Erro ao calcular saldo: {e}")
-        return {"saldo_conta": 0, "total_investido": 0, "patrimonio_total": 0}
-
-def get_expense_distribution(category_filter=None, transactions_data=None):
-    """
-    Obtém a distribuição de despesas por categoria.
-    
-    Args:
-        category_filter (list): Lista opcional de categorias para filtrar.
-        transactions_data (list): Lista opcional de transações já filtradas.
-        
-    Returns:
-        dict: Dicionário com {categoria: valor} para cada categoria de despesa.
-    """
-    try:
-        # Obter todas as transações diretamente do Supabase
-        from transactions_db import view_transactions
-        
-        print("Buscando transações para distribuição de despesas...")
-        
-        # Se não recebemos transações, buscar todas do banco
-        if transactions_data is None:
-            from supabase_db import init_supabase
-            supabase = init_supabase()
-            if not supabase:
-                print("Erro ao conectar ao Supabase")
-                return {}
-                
-            # Buscar TODAS as transações diretamente do Supabase
-            response = supabase.table("transactions").select("*").execute()
-            transactions = response.data
-            print(f"Buscando diretamente do Supabase: {len(transactions)} transações encontradas")
-        else:
-            transactions = transactions_data
-            print(f"Usando transações fornecidas: {len(transactions)} transações")
-        
-        # Filtrar apenas despesas
-        despesas = {}
-        
-        # Variável para contar despesas encontradas
-        despesas_encontradas = 0
-        
-        print(f"Processando {len(transactions)} transações para análise de categorias")
-        
-        # Processar cada transação
-        for transaction in transactions:
-            # Verificar se é uma despesa
-            tipo = str(transaction.get('type', '')).lower()
-            
-            # Debug para identificar o tipo e categoria
-            categoria_tipo = str(transaction.get('categoria_tipo', '')).lower()
-            status = str(transaction.get('status', '')).lower()
-            
-            print(f"Analisando: {transaction.get('description')}, Tipo: {tipo}, Categoria: {categoria_tipo}, Status: {status}, Valor: {transaction.get('amount')}")
-            
-            if tipo not in ['despesa', 'expense', 'expenses']:
-                print(f"Ignorando (não é despesa): {transaction.get('description')} - Tipo: {tipo}")
-                continue
-            
-            # Incluir todas as despesas, independente do status (pago ou pendente)
-            # Usar categoria_tipo como categoria principal
-            categoria = categoria_tipo if categoria_tipo else 'Outros'
-            if categoria in ['necessidade', 'necessidades']:
-                categoria = 'Necessidades'
-            elif categoria in ['desejo', 'desejos']:
-                categoria = 'Lazer'
-            elif categoria == 'investimento':
-                categoria = 'Investimentos'
-            else:
-                categoria = 'Outros'
-                
-            # Aplicar filtro de categoria se necessário
-            if category_filter and categoria not in category_filter:
-                print(f"Ignorando (filtro de categoria): {transaction.get('description')}")
-                continue
-                
-            # Adicionar ao dicionário de despesas
-            valor = float(transaction.get('amount', 0))
-            if categoria in despesas:
-                despesas[categoria] += valor
-                print(f"Adicionando à categoria {categoria}: +R${valor:.2f} = R${despesas[categoria]:.2f}")
-            else:
-                despesas[categoria] = valor
-                print(f"Nova categoria {categoria}: R${valor:.2f}")
-            
-            despesas_encontradas += 1
-        
-        print(f"Total de despesas encontradas: {despesas_encontradas}")
-        print(f"Distribuição de despesas final: {despesas}")
-        
-        # Ordenar categorias por valor
-        return dict(sorted(despesas.items(), key=lambda x: x[1], reverse=True)) if despesas else {}
-    except Exception as e:
-        print(f"ERRO na distribuição de despesas: {e}")
-        st.error(f"Erro ao obter distribuição de despesas: {e}")
-        import traceback
-        print(traceback.format_exc())
-        
-        # Retornar vazio em caso de erro
-        return {}
-
-def get_historical_data(months=12):
-    """
-    Obtém dados históricos de receitas e despesas para análise de tendências.
-    
-    Args:
-        months (int): Número de meses para obter dados históricos.
-        
-    Returns:
-        dict: Dicionário com chaves 'Receitas', 'Despesas' e 'Investimentos', cada uma
-              contendo um dicionário de {período: valor}.
-    """
-    try:
-        # Importar para evitar importação circular
-        from transactions_db import view_transactions
-        
-        # Obter todas as transações
-        transactions = view_transactions()
-        
-        # Calcular data inicial com base no número de meses
-        hoje = datetime.now()
-        data_inicial = hoje.replace(day=1) - timedelta(days=30 * months)
-        data_inicial_str = data_inicial.strftime("%Y-%m-%d")
-        
-        # Estruturas para armazenar os resultados
-        receitas_por_mes = {}
-        despesas_por_mes = {}
-        investimentos_por_mes = {}
-        saldo_por_mes = {}
-        
-        # Processar cada transação
-        for transaction in transactions:
-            # Obter data e converter para objeto datetime
-            data_str = transaction.get('date')
-            if not data_str:
-                continue
-                
-            try:
-                data = datetime.strptime(data_str, "%Y-%m-%d")
-                periodo = data.strftime("%Y-%m")
-                
-                # Verificar se está dentro do período de interesse
-                if data < data_inicial:
-                    continue
-                    
-                # Obter valores
-                tipo = str(transaction.get('type', '')).lower()
-                valor = float(transaction.get('amount', 0))
-                status = str(transaction.get('status', '')).lower()
-                
-                # Se não estiver pago, não considerar
-                if status not in ['pago', 'paid']:
-                    continue
-                    
-                # Classificar por tipo usando as mesmas variações de tipos
-                if tipo in ['receita', 'income', 'revenue']:
-                    receitas_por_mes[periodo] = receitas_por_mes.get(periodo, 0) + valor
-                    
-                    # Atualizar saldo
-                    saldo_por_mes[periodo] = saldo_por_mes.get(periodo, 0) + valor
-                    
-                elif tipo in ['despesa', 'expense', 'expenses']:
-                    despesas_por_mes[periodo] = despesas_por_mes.get(periodo, 0) + valor
-                    
-                    # Atualizar saldo (negativo para despesas)
-                    saldo_por_mes[periodo] = saldo_por_mes.get(periodo, 0) - valor
-                    
-                elif tipo in ['investimento', 'investment']:
-                    investimentos_por_mes[periodo] = investimentos_por_mes.get(periodo, 0) + valor
-                    
-                    # Atualizar saldo (negativo para investimentos)
-                    saldo_por_mes[periodo] = saldo_por_mes.get(periodo, 0) - valor
-            except Exception as e:
-                print(f"Erro ao processar data da transação: {e}")
-                continue
-        
-        # Garantir que todos os períodos estejam presentes
-        todos_os_periodos = set(receitas_por_mes.keys()) | set(despesas_por_mes.keys()) | set(investimentos_por_mes.keys())
-        
-        for periodo in todos_os_periodos:
-            if periodo not in receitas_por_mes:
-                receitas_por_mes[periodo] = 0
-            if periodo not in despesas_por_mes:
-                despesas_por_mes[periodo] = 0
-            if periodo not in investimentos_por_mes:
-                investimentos_por_mes[periodo] = 0
-            if periodo not in saldo_por_mes:
-                saldo_por_mes[periodo] = 0
-        
-        # Ordenar os dicionários por período
-        receitas_ordenadas = {k: receitas_por_mes[k] for k in sorted(receitas_por_mes.keys())}
-        despesas_ordenadas = {k: despesas_por_mes[k] for k in sorted(despesas_por_mes.keys())}
-        investimentos_ordenados = {k: investimentos_por_mes[k] for k in sorted(investimentos_por_mes.keys())}
-        saldo_ordenado = {k: saldo_por_mes[k] for k in sorted(saldo_por_mes.keys())}
-        
-        dados = {
-            "Receitas": receitas_ordenadas,
-            "Despesas": despesas_ordenadas,
-            "Investimentos": investimentos_ordenados,
-            "Saldo": saldo_ordenado
-        }
-        
-        return dados
-    except Exception as e:
-        st.error(f"Erro ao obter dados históricos: {e}")
-        return {"Receitas": {}, "Despesas": {}, "Investimentos": {}, "Saldo": {}}
-
-def get_categories():
-    """
-    Obtém todas as categorias disponíveis para filtros.
-    
-    Returns:
-        list: Lista de categorias disponíveis.
-    """
-    # Importar para evitar importação circular
-    from categories import get_categories as get_all_categories
-    
-    # Usar a função de categories.py que já está adaptada para Supabase
-    all_categories = get_all_categories()
-    
-    # Extrair apenas os nomes das categorias
-    category_names = [cat.get("name", "") for cat in all_categories if cat.get("name")]
-    
-    return sorted(category_names)
-
-def view_goals():
-    """
-    Recupera as metas financeiras do usuário, utilizando a função do módulo transactions_db.
-    
-    Returns:
-        list: Lista de metas com estrutura (id, tipo, nome, valor_objetivo, valor_atual).
-    """
-    return get_goals()
-
-def get_monthly_summary(month=None, year=None, start_date=None, end_date=None, category_filter=None, transaction_types=None):
-    """
-    Obtém o resumo mensal de transações.
-    
-    Args:
-        month (int, opcional): Mês específico para filtrar.
-        year (int, opcional): Ano específico para filtrar.
-        start_date (str, opcional): Data inicial para filtro personalizado.
-        end_date (str, opcional): Data final para filtro personalizado.
-        category_filter (list, opcional): Lista de categorias para filtrar.
-        transaction_types (list, opcional): Lista de tipos de transação para filtrar.
-        
-    Returns:
-        dict: Resumo financeiro do período.
-    """
-    # Option 1: Get all transactions and filter manually (more reliable)
-    transactions = view_transactions()
-    
-    # Apply date filtering
-    filtered_transactions = []
-    
-    for transaction in transactions:
-        # Extrair data da transação ou usar data atual
-        date_str = transaction.get('date')
-        if not date_str:
-            continue
-            
-        # Convert to datetime for comparison
-        try:
-            transaction_date = datetime.strptime(date_str, "%Y-%m-%d")
-        except (ValueError, TypeError):
-            # Se falhar, tentar outros formatos comuns
-            try:
-                transaction_date = datetime.strptime(date_str, "%d/%m/%Y")
-            except (ValueError, TypeError):
-                # Se ainda falhar, pular esta transação
-                continue
-            
-        # Apply date filters
-        if start_date and end_date:
-            start = datetime.strptime(start_date, "%Y-%m-%d")
-            end = datetime.strptime(end_date, "%Y-%m-%d")
-            if not (start <= transaction_date <= end):
-                continue
-        elif month and year:
-            if not (transaction_date.month == month and transaction_date.year == year):
-                continue
-        else:
-            # Default to current month
-            today = datetime.now()
-            if not (transaction_date.month == today.month and transaction_date.year == today.year):
-                continue
-                
-        # Se passou por todos os filtros de data, adiciona à lista filtrada    
-        filtered_transactions.append(transaction)
-    
-    # Apply category filter
-    if category_filter and len(category_filter) > 0:
-        filtered_transactions = [t for t in transactions if t.get('category') in category_filter]
-    
-    # Apply transaction type filter - case insensitive
-    if transaction_types and len(transaction_types) > 0:
-        filtered_by_type = []
-        for transaction in filtered_transactions:
-            transaction_type = transaction.get('type', '').lower()
-            type_matches = False
-            
-            for t_type in transaction_types:
-                # Check both Portuguese and English versions
-                if (t_type.lower() == transaction_type or 
-                    (t_type.lower() == 'receita' and transaction_type in ['receita', 'income']) or
-                    (t_type.lower() == 'despesa' and transaction_type in ['despesa', 'expense']) or
-                    (t_type.lower() == 'investimento' and transaction_type in ['investimento', 'investment'])):
-                    type_matches = True
-                    break
-                    
-            if type_matches:
-                filtered_by_type.append(transaction)
-        
-        filtered_transactions = filtered_by_type
-        
-    # Debug para mostrar os tipos de transações encontrados
-    print(f"Após filtragem, restaram {len(filtered_transactions)} transações")
-    tipos_encontrados = set(t.get('type', '').lower() for t in filtered_transactions)
-    print(f"Tipos encontrados após filtragem: {tipos_encontrados}")
-    
-    # Calculate summary from filtered transactions
-    summary = calculate_summary(filtered_transactions)
-    return summary
-
 def show_dashboard():
     """
     Mostra o dashboard financeiro completo
@@ -987,41 +231,20 @@ def show_dashboard():
         st.subheader("📆 Período de Análise")
         
         # Opções de período
-        periodo_opcoes = ["Mês Atual", "Mês Anterior", "Últimos 3 Meses", "Ano Atual", "Personalizado"]
-        periodo_selecionado = st.selectbox("Selecione o período", periodo_opcoes)
-        
-        # Variáveis para armazenar datas de início e fim
-        data_inicio = None
-        data_fim = None
+        periodo_selecionado = st.selectbox("Selecione o período", PERIOD_OPTIONS)
         
-        # Definir período com base na seleção
+        # Definir período com base na seleção (fim exclusivo)
         data_atual = datetime.now()
+        data_inicio, data_fim = period_bounds(periodo_selecionado, data_atual)
         
-        if periodo_selecionado == "Mês Atual":
-            data_inicio = data_atual.replace(day=1)
-            if data_atual.month == 12:
-                data_fim = data_atual.replace(year=data_atual.year + 1, month=1, day=1)
-            else:
-                data_fim = data_atual.replace(month=data_atual.month + 1, day=1)
-        elif periodo_selecionado == "Mês Anterior":
-            if data_atual.month == 1:
-                data_inicio = data_atual.replace(year=data_atual.year - 1, month=12, day=1)
-                data_fim = data_atual.replace(day=1)
-            else:
-                data_inicio = data_atual.replace(month=data_atual.month - 1, day=1)
-                data_fim = data_atual.replace(day=1)
-        elif periodo_selecionado == "Últimos 3 Meses":
-            data_inicio = (data_atual - timedelta(days=90)).replace(day=1)
-            data_fim = data_atual.replace(day=data_atual.day + 1)
-        elif periodo_selecionado == "Ano Atual":
-            data_inicio = data_atual.replace(month=1, day=1)
-            data_fim = data_atual.replace(year=data_atual.year + 1, month=1, day=1)
-        elif periodo_selecionado == "Personalizado":
+        if periodo_selecionado == "Personalizado":
             data_inicio = st.date_input("Data Inicial", value=data_atual.replace(day=1))
             data_fim = st.date_input("Data Final", value=data_atual)
             if data_inicio >= data_fim:
                 st.warning("Data inicial deve ser anterior à data final")
                 data_fim = data_inicio + timedelta(days=1)
+            # A data final escolhida é inclusiva; as consultas usam limite exclusivo
+            data_fim = data_fim + timedelta(days=1)
         
         # Formatar datas para consulta
         inicio_str = data_inicio.strftime("%Y-%m-%d") if data_inicio else None
@@ -1053,85 +276,23 @@ def show_dashboard():
         # Botão para aplicar filtros
         aplicar_filtros = st.button("Aplicar Filtros", type="primary")
     
-    # Obter dados do período selecionado
-    summary = None
-    # Variável para armazenar as transações filtradas
-    filtered_transactions = view_transactions() 
-    
+    # Dados de todas as abas, calculados uma vez por estado dos dados e dos filtros
     if aplicar_filtros:
-        # Filtrar transações com base nos parâmetros selecionados
-        if inicio_str or fim_str:
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if (inicio_str is None or t.get('date', '') >= inicio_str) and
-                   (fim_str is None or t.get('date', '') <= fim_str)
-            ]
-        
-        # Aplicar filtros de categoria
-        if categorias_selecionadas:
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if t.get('category') in categorias_selecionadas
-            ]
-            
-        # Aplicar filtros de tipo de transação
-        if tipo_transacao:
-            # Mapear nomes em português para inglês
-            tipo_map = {
-                "Receita": ["income", "receita", "revenue"],
-                "Despesa": ["expense", "despesa", "expenses"],
-                "Investimento": ["investment", "investimento"]
-            }
-            # Criar lista de tipos permitidos (considerando variações em inglês/português)
-            tipos_permitidos = []
-            for t in tipo_transacao:
-                if t in tipo_map:
-                    tipos_permitidos.extend(tipo_map[t])
-            
-            # Filtrar transações pelos tipos permitidos
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if str(t.get('type', '')).lower() in tipos_permitidos
-            ]
-        
-        # Calcular resumo com as transações filtradas
-        summary = calculate_summary(filtered_transactions)
+        model = get_dashboard_model(inicio_str, fim_str, categorias_selecionadas, tipo_transacao)
         st.success(f"Filtros aplicados: {periodo_selecionado}")
     else:
-        # Obter dados do mês atual (padrão)
-        # Filtrar para o mês atual
-        data_atual = datetime.now()
-        inicio_padrao = data_atual.replace(day=1)
-        if data_atual.month == 12:
-            fim_padrao = data_atual.replace(year=data_atual.year + 1, month=1, day=1)
-        else:
-            fim_padrao = data_atual.replace(month=data_atual.month + 1, day=1)
-            
-        inicio_str = inicio_padrao.strftime("%Y-%m-%d")
-        fim_str = fim_padrao.strftime("%Y-%m-%d")
-        
-        # Aplicar o filtro de data padrão
-        filtered_transactions = [
-            t for t in filtered_transactions 
-            if (t.get('date', '') >= inicio_str) and (t.get('date', '') < fim_str)
-        ]
-        
-        # Calcular resumo com as transações filtradas
-        summary = calculate_summary(filtered_transactions)
+        model = get_dashboard_model()
+    summary = model.summary
     
     # Obtém lista de todas as transações
-    print("Buscando transações para o dashboard...")
-    transactions = view_transactions()
-    print(f"Total de transações encontradas: {len(transactions)}")
-    for t in transactions:
-        print(f"ID: {t.get('id')} | Desc: {t.get('description')} | Tipo: {t.get('type')} | Status: {t.get('status')}")
+    transactions = model.transactions
+    logger.debug("Dashboard com %d transações", len(transactions))
     
-    # Calcular o resumo total diretamente aqui para evitar problemas de filtragem
-    resumo_total = calculate_summary(transactions)
-    print(f"Resumo total calculado: Receitas={resumo_total['receitas']}, Despesas={resumo_total['despesas']}, Investimentos={resumo_total['investimentos']}")
+    # Resumo de todo o histórico
+    resumo_total = model.resumo_total
     
     # Obter saldo global
-    balance = get_balance()
+    balance = model.balance
     
     # Obter cores do tema
     theme_colors = get_theme_colors()
@@ -1291,8 +452,7 @@ def show_dashboard():
             st.subheader("Distribuição de Gastos")
             # Criar gráfico de pizza para categorias de despesas
             # Buscar todas as transações para garantir que todas as despesas sejam incluídas
-            todas_transacoes = view_transactions()
-            categorias_valores = get_expense_distribution(transactions_data=todas_transacoes)
+            categorias_valores = model.distribution
             
             if categorias_valores:
                 # Criar DataFrame para visualização
@@ -1351,8 +511,7 @@ def show_dashboard():
         st.subheader("Análise de Categorias")
         
         # Obter todas as transações para análise de categorias
-        todas_transacoes = view_transactions()
-        categorias_valores = get_expense_distribution(transactions_data=todas_transacoes)
+        categorias_valores = model.distribution
         
         if categorias_valores:
             # Criar dataframe para visualização em tabela
@@ -1534,7 +693,7 @@ def show_dashboard():
         st.subheader("Análise de Tendências")
         
         # Obter dados históricos
-        dados_historicos = get_historical_data()
+        dados_historicos = model.historical
         
         if dados_historicos["Receitas"]:
             # Gráfico de tendências
@@ -1615,7 +774,7 @@ def show_dashboard():
         st.subheader("🎯 Metas Financeiras")
         
         # Carregar metas do usuário
-        metas = view_goals()
+        metas = model.goals
         
         if metas:
             for meta in metas:
@@ -1679,84 +838,3 @@ def show_dashboard():
             Para adicionar metas, acesse a página de Metas no menu lateral e defina seus objetivos financeiros.
             Suas metas aparecerão aqui para acompanhamento do progresso.
             """)
-
-def get_historical_data(months=12):
-    """
-    Obtém dados históricos dos últimos meses para visualização de tendências
-    
-    Args:
-        months: Número de meses no histórico
-        
-    Returns:
-        dict: Dados históricos organizados para análise de tendências
-    """
-    try:
-        # Inicializar dicionários para armazenar dados
-        dados_historicos = {
-            "Receitas": {},
-            "Despesas": {},
-            "Investimentos": {},
-            "Saldo": {}
-        }
-        
-        # Obter todas as transações
-        transactions = view_transactions()
-        
-        # Data atual para referência
-        current_date = datetime.now()
-        
-        # Para cada mês no intervalo
-        for i in range(months-1, -1, -1):
-            # Calcular mês e ano
-            data_ref = current_date.replace(day=1) - relativedelta(months=i)
-            periodo = f"{data_ref.year}-{data_ref.month:02d}"
-            
-            # Inicializar valores para o período
-            dados_historicos["Receitas"][periodo] = 0
-            dados_historicos["Despesas"][periodo] = 0
-            dados_historicos["Investimentos"][periodo] = 0
-            
-            # Filtrar transações do mês
-            month_start = data_ref.strftime("%Y-%m-%d")
-            if data_ref.month == 12:
-                month_end = data_ref.replace(year=data_ref.year + 1, month=1, day=1).strftime("%Y-%m-%d")
-            else:
-                month_end = data_ref.replace(month=data_ref.month + 1, day=1).strftime("%Y-%m-%d")
-            
-            # Processar cada transação do período
-            for transaction in transactions:
-                trans_date = transaction.get('date', '')
-                if month_start <= trans_date < month_end:
-                    valor = float(transaction.get('amount', 0))
-                    tipo = str(transaction.get('type', '')).lower()
-                    
-                    if tipo in ['receita', 'income', 'revenue']:
-                        dados_historicos["Receitas"][periodo] += valor
-                    elif tipo in ['despesa', 'expense', 'expenses']:
-                        dados_historicos["Despesas"][periodo] += valor
-                    elif tipo in ['investimento', 'investment']:
-                        dados_historicos["Investimentos"][periodo] += valor
-            
-            # Calcular saldo do período
-            dados_historicos["Saldo"][periodo] = (
-                dados_historicos["Receitas"][periodo] - 
-                dados_historicos["Despesas"][periodo] - 
-                dados_historicos["Investimentos"][periodo]
-            )
-            
-            # Log para debug
-            print(f"Dados do período {periodo}:")
-            print(f"Receitas: R${dados_historicos['Receitas'][periodo]:.2f}")
-            print(f"Despesas: R${dados_historicos['Despesas'][periodo]:.2f}")
-            print(f"Investimentos: R${dados_historicos['Investimentos'][periodo]:.2f}")
-            print(f"Saldo: R${dados_historicos['Saldo'][periodo]:.2f}")
-            print("---")
-        
-        return dados_historicos
-        
-    except Exception as e:
-        print(f"Erro ao obter dados históricos: {e}")
-        st.error(f"Erro ao obter dados históricos: {e}")
-        import traceback
-        print(traceback.format_exc())
-        return {"Receitas": {}, "Despesas": {}, "Investimentos": {}, "Saldo": {}}
@@ -0,0 +1,521 @@
+"""
+Módulo responsável pelos cálculos do dashboard.
+
+Camada única usada por dashboard.py e dashboard2.py: filtros de período,
+resumos, saldo, distribuição de despesas, séries mensais e projeções.
+Tudo é calculado a partir do snapshot de transações da sessão
+(transactions_db.view_transactions) ou dos agregados mensais; nenhuma
+função daqui consulta o banco por conta própria nem desenha nada além das
+mensagens de erro.
+
+get_dashboard_model reúne tudo o que a página do dashboard mostra em um
+DashboardModel, calculado uma vez por estado dos filtros e dos dados e
+guardado em um cache LRU da sessão.
+"""
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+import streamlit as st
+from dateutil.relativedelta import relativedelta
+from transactions_db import view_goals as get_goals
+from transactions_db import view_transactions, query_transactions, filter_transaction_list
+from transactions_db import touched_months_since, get_monthly_aggregates
+from transactions_db import get_snapshot_token, SNAPSHOT_TTL_SECONDS
+from goals_db import get_goals_version
+import aggregations
+from app_logging import get_logger
+from profiler import profiled
+from repositories import get_repositories
+
+logger = get_logger(__name__)
+
+PERIOD_OPTIONS = ["Mês Atual", "Mês Anterior", "Últimos 3 Meses", "Ano Atual", "Personalizado"]
+
+EMPTY_SUMMARY = {
+    "receitas": 0, "despesas": 0, "saldo_mes": 0, "investimentos": 0,
+    "por_categoria": {}, "regra_50_30_20": {},
+    "kpis": {"saude_financeira": "Sem dados", "taxa_poupanca": 0, "relacao_despesa_receita": 0}
+}
+
+# ---------------------------------------------------------------------
+# Períodos e Filtros
+# ---------------------------------------------------------------------
+
+def parse_date(date_str):
+    """
+    Converte uma string em objeto datetime usando formatos comuns.
+    Retorna None se a conversão não for possível.
+    """
+    if not date_str:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except (ValueError, TypeError):
+            continue
+    return None
+
+def period_bounds(periodo, today=None):
+    """
+    Converte uma das PERIOD_OPTIONS (exceto "Personalizado") em datas [início, fim).
+    
+    Args:
+        periodo (str): Período selecionado no dashboard
+        today (datetime, optional): Data de referência; padrão é agora
+    
+    Returns:
+        tuple: (início, fim exclusivo) como datetime, ou (None, None) se desconhecido
+    """
+    today = today or datetime.now()
+    month_start = today.replace(day=1)
+    if periodo == "Mês Atual":
+        return month_start, month_start + relativedelta(months=1)
+    if periodo == "Mês Anterior":
+        return month_start - relativedelta(months=1), month_start
+    if periodo == "Últimos 3 Meses":
+        return (today - timedelta(days=90)).replace(day=1), today + timedelta(days=1)
+    if periodo == "Ano Atual":
+        return today.replace(month=1, day=1), today.replace(year=today.year + 1, month=1, day=1)
+    return None, None
+
+def filter_bounds(start_date=None, end_date=None):
+    """
+    Converte o período dos filtros do dashboard em limites ISO [início, fim).
+    Sem datas, o período padrão é o mês atual.
+    """
+    if start_date and end_date:
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        return start_date, end.strftime("%Y-%m-%d")
+    if not (start_date or end_date):
+        month_start, month_end = period_bounds("Mês Atual")
+        return month_start.strftime("%Y-%m-%d"), month_end.strftime("%Y-%m-%d")
+    return None, None
+
+def filter_transactions(transactions, start_date=None, end_date=None, category_filter=None, transaction_types=None):
+    """
+    Filtra a lista de transações com base em data, categorias e tipos.
+    Se nenhum filtro de data for fornecido, mantém apenas as transações do mês atual.
+    """
+    inicio, fim = filter_bounds(start_date, end_date)
+    return filter_transaction_list(
+        [t for t in transactions if t.get('date')],
+        start_date=inicio,
+        end_date=fim,
+        types=transaction_types or None,
+        categories=category_filter or None
+    )
+
+# ---------------------------------------------------------------------
+# Acesso aos Dados
+# ---------------------------------------------------------------------
+
+def connect_to_database():
+    """
+    Retorna os repositórios do backend ativo (Supabase, SQLite ou memória).
+    
+    Returns:
+        repositories.Repositories: Repositórios de transações, categorias, metas e configurações.
+    """
+    try:
+        return get_repositories()
+    except Exception as e:
+        st.error(f"Erro ao conectar ao banco de dados: {e}")
+        raise
+
+@profiled()
+def get_categories():
+    """
+    Obtém todas as categorias disponíveis para filtros.
+    
+    Returns:
+        list: Lista de nomes das categorias.
+    """
+    from categories import get_categories as get_all_categories
+    all_categories = get_all_categories()
+    category_names = [cat.get("name", "") for cat in all_categories if cat.get("name")]
+    return sorted(category_names)
+
+@profiled()
+def view_goals():
+    """
+    Recupera as metas financeiras do usuário, utilizando a função do módulo transactions_db.
+    
+    Returns:
+        list: Lista de metas com estrutura (id, tipo, nome, valor_objetivo, valor_atual).
+    """
+    return get_goals()
+
+# ---------------------------------------------------------------------
+# Resumos
+# ---------------------------------------------------------------------
+
+@profiled()
+def calculate_summary(transactions):
+    """
+    Calcula o resumo financeiro a partir das transações.
+    
+    Args:
+        transactions (list): Lista de transações a serem analisadas.
+    
+    Returns:
+        dict: Resumo financeiro contendo receitas, despesas, saldo, investimentos,
+              distribuição por categoria, regra 50/30/20 e KPIs.
+    """
+    summary = aggregations.calculate_summary(transactions)
+    logger.debug("Resumo calculado: Receitas=%s, Despesas=%s, Investimentos=%s",
+                 summary['receitas'], summary['despesas'], summary['investimentos'])
+    return summary
+
+@profiled()
+def get_monthly_summary(month=None, year=None, start_date=None, end_date=None, category_filter=None, transaction_types=None):
+    """
+    Obtém o resumo mensal de transações aplicando os filtros de data, categoria e tipo.
+    
+    Args:
+        month (int, opcional): Mês para filtrar.
+        year (int, opcional): Ano para filtrar.
+        start_date (str, opcional): Data inicial (YYYY-MM-DD).
+        end_date (str, opcional): Data final inclusiva (YYYY-MM-DD).
+        category_filter (list, opcional): Lista de categorias.
+        transaction_types (list, opcional): Lista de tipos de transação.
+    
+    Returns:
+        dict: Resumo financeiro do período.
+    """
+    try:
+        if month and year and not (start_date or end_date):
+            start_date = f"{year}-{month:02d}-01"
+            end_date = (datetime(year, month, 1) + relativedelta(months=1) - timedelta(days=1)).strftime("%Y-%m-%d")
+        inicio, fim = filter_bounds(start_date, end_date)
+        filtered_transactions = [t for t in query_transactions(
+            start_date=inicio,
+            end_date=fim,
+            types=transaction_types or None,
+            categories=category_filter or None
+        ) if t.get('date')]
+        logger.debug("Após filtragem, restaram %d transações", len(filtered_transactions))
+        return calculate_summary(filtered_transactions)
+    except Exception as e:
+        st.error(f"Erro ao obter resumo mensal: {e}")
+        import traceback
+        st.error(traceback.format_exc())
+        return dict(EMPTY_SUMMARY)
+
+@profiled()
+def period_summary(start_date=None, end_date=None, types=None, categories=None):
+    """
+    Resumo do período filtrado no dashboard.
+    
+    Sem nenhum filtro, o período é o mês atual e o resumo vem dos agregados
+    mensais quando eles existem; caso contrário, de query_transactions, que
+    filtra o snapshot da sessão ou envia os filtros ao banco.
+    
+    Args:
+        start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+        end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+        types (list, optional): Tipos de transação
+        categories (list, optional): Nomes de categoria
+    
+    Returns:
+        dict: Resumo no formato de calculate_summary
+    """
+    if not (start_date or end_date or types or categories):
+        start_date, end_date = filter_bounds()
+        month = start_date[:7]
+        rows = get_monthly_aggregates(month, month)
+        if rows is not None:
+            return aggregations.summary_from_aggregates(rows)
+    filtered_transactions = query_transactions(
+        start_date=start_date,
+        end_date=end_date,
+        types=types or None,
+        categories=categories or None
+    )
+    return calculate_summary(filtered_transactions)
+
+@profiled()
+def total_summary():
+    """
+    Resumo de todo o histórico: dos agregados mensais (O(meses)) ou, sem eles, das transações.
+    
+    Returns:
+        dict: Resumo no formato de calculate_summary
+    """
+    rows = get_monthly_aggregates()
+    if rows is not None:
+        return aggregations.summary_from_aggregates(rows)
+    return calculate_summary(view_transactions())
+
+# ---------------------------------------------------------------------
+# Saldo e Distribuição
+# ---------------------------------------------------------------------
+
+@profiled()
+def get_balance():
+    """
+    Calcula o saldo atual, total investido e patrimônio total.
+    
+    Returns:
+        dict: {"saldo_conta": ..., "total_investido": ..., "patrimonio_total": ...}
+    """
+    try:
+        rows = get_monthly_aggregates()
+        if rows is not None:
+            return aggregations.balance_from_aggregates(rows)
+        return aggregations.calculate_balance(view_transactions())
+    except Exception as e:
+        st.error(f"Erro ao calcular saldo: {e}")
+        return {"saldo_conta": 0, "total_investido": 0, "patrimonio_total": 0}
+
+@profiled()
+def get_expense_distribution(category_filter=None, transactions_data=None):
+    """
+    Obtém a distribuição de despesas por categoria.
+    
+    Args:
+        category_filter (list): Lista opcional de categorias para filtrar.
+        transactions_data (list): Lista opcional de transações já filtradas.
+    
+    Returns:
+        dict: {categoria: valor}
+    """
+    try:
+        transactions = view_transactions() if transactions_data is None else transactions_data
+        despesas = aggregations.expense_distribution(transactions, category_filter)
+        logger.debug("Distribuição de despesas (%d transações): %s", len(transactions), despesas)
+        return despesas
+    except Exception as e:
+        logger.exception("Erro na distribuição de despesas")
+        st.error(f"Erro ao obter distribuição de despesas: {e}")
+        return {}
+
+# ---------------------------------------------------------------------
+# Séries Mensais e Projeções
+# ---------------------------------------------------------------------
+
+_ROLLUP_KEY = "_monthly_rollup"
+
+@profiled()
+def get_monthly_rollup():
+    """
+    Retorna a consolidação mensal da sessão, atualizada para o snapshot atual.
+    
+    A chave é o token do snapshot (get_snapshot_token), então a consolidação
+    acompanha tanto as escritas quanto as recargas por TTL, que trazem
+    alterações feitas por outros clientes.
+    
+    Os totais vêm da tabela monthly_aggregates quando ela está disponível.
+    Sem ela, quando só alguns meses mudaram desde a última consolidação,
+    apenas eles são recalculados; caso contrário o histórico é consolidado
+    de novo.
+    
+    Limitação conhecida: a recarga provocada por uma escrita deste processo
+    também traz alterações de outros clientes, mas o recálculo parcial só
+    revisita os meses que este processo alterou. Para limitar esse atraso,
+    o histórico é consolidado por inteiro sempre que a última consolidação
+    completa tem mais de SNAPSHOT_TTL_SECONDS, o mesmo atraso que o snapshot
+    já admite para alterações externas.
+    
+    Returns:
+        aggregations.MonthlyRollup: Totais mensais das transações pagas
+    """
+    token = get_snapshot_token()
+    version, loaded_at = token
+    cached = st.session_state.get(_ROLLUP_KEY)
+    if cached is not None and cached["token"] == token:
+        return cached["rollup"]
+    
+    rows = get_monthly_aggregates()
+    if rows is not None:
+        rollup = aggregations.MonthlyRollup().load_aggregates(rows, version)
+        st.session_state[_ROLLUP_KEY] = {"token": token, "rollup": rollup, "rebuilt_at": loaded_at}
+        return rollup
+    
+    transactions = view_transactions()
+    touched = None
+    if cached is not None and loaded_at - cached["rebuilt_at"] <= SNAPSHOT_TTL_SECONDS:
+        # Consolidação completa recente: só as escritas deste processo mudaram algo
+        touched = touched_months_since(cached["rollup"].version)
+    if touched is None:
+        rollup = aggregations.MonthlyRollup().rebuild(transactions, version)
+        rebuilt_at = loaded_at
+    else:
+        rollup = cached["rollup"]
+        rollup.refresh_months(transactions, touched, version)
+        rebuilt_at = cached["rebuilt_at"]
+    st.session_state[_ROLLUP_KEY] = {"token": token, "rollup": rollup, "rebuilt_at": rebuilt_at}
+    return rollup
+
+@profiled()
+def get_historical_data(months=12):
+    """
+    Obtém dados históricos de receitas, despesas, investimentos e saldo para os últimos 'months' meses.
+    
+    Args:
+        months (int): Número de meses no histórico.
+    
+    Returns:
+        dict: Dados organizados por período (YYYY-MM) para cada métrica.
+    """
+    try:
+        return get_monthly_rollup().series(months)
+    except Exception as e:
+        st.error(f"Erro ao obter dados históricos: {e}")
+        import traceback
+        st.error(traceback.format_exc())
+        return {"Receitas": {}, "Despesas": {}, "Investimentos": {}, "Saldo": {}}
+
+def projetar_valores_futuros(dados_historicos, meses_futuros=3, metodo="media_movel"):
+    """
+    Projeta valores futuros com base em dados históricos usando média móvel ou tendência linear.
+    
+    Args:
+        dados_historicos (dict): Histórico no formato {período: valor}.
+        meses_futuros (int): Número de meses para projeção.
+        metodo (str): "media_movel" ou "tendencia".
+    
+    Returns:
+        dict: Projeção no formato {período: valor}.
+    """
+    if not dados_historicos or len(dados_historicos) < 2:
+        return {}
+    periodos = sorted(list(dados_historicos.keys()))
+    valores = [dados_historicos[p] for p in periodos]
+    if metodo == "media_movel":
+        n_meses = min(3, len(valores))
+        media = sum(valores[-n_meses:]) / n_meses
+        previsao = [media] * meses_futuros
+    elif metodo == "tendencia":
+        if len(valores) >= 2:
+            tendencia = valores[-1] - valores[-2]
+            tendencia = max(min(tendencia, valores[-1] * 0.2), -valores[-1] * 0.2)
+            previsao = [valores[-1] + tendencia * (i+1) for i in range(meses_futuros)]
+        else:
+            previsao = [valores[-1]] * meses_futuros
+    else:
+        previsao = [valores[-1]] * meses_futuros
+    
+    ultimo_periodo = periodos[-1]
+    if '-' in ultimo_periodo:
+        ano, mes = ultimo_periodo.split('-')
+        periodos_futuros = []
+        for i in range(1, meses_futuros + 1):
+            mes_futuro = int(mes) + i
+            ano_futuro = int(ano)
+            if mes_futuro > 12:
+                ano_futuro += (mes_futuro - 1) // 12
+                mes_futuro = ((mes_futuro - 1) % 12) + 1
+            periodos_futuros.append(f"{ano_futuro}-{mes_futuro:02d}")
+    else:
+        periodos_futuros = [f"P{i+1}" for i in range(meses_futuros)]
+    projecoes = {periodos_futuros[i]: previsao[i] for i in range(meses_futuros)}
+    return projecoes
+
+# ---------------------------------------------------------------------
+# Modelo do Dashboard
+# ---------------------------------------------------------------------
+# Tudo o que as cinco abas do dashboard mostram, calculado uma vez por
+# (versão dos dados, período, categorias, tipos). Os modelos ficam em um
+# LRU na sessão, então alternar entre períodos já vistos ou redesenhar a
+# página (cada clique em um widget) não recalcula nada.
+
+DASHBOARD_MODEL_CACHE_SIZE = 8
+_MODEL_CACHE_KEY = "_dashboard_models"
+
+DashboardModel = namedtuple("DashboardModel", [
+    "key",            # chave do cache
+    "transactions",   # snapshot completo das transações
+    "summary",        # resumo do período filtrado
+    "resumo_total",   # resumo de todo o histórico
+    "balance",        # saldo em conta, total investido e patrimônio
+    "distribution",   # {categoria: valor} das despesas
+    "historical",     # séries mensais {métrica: {YYYY-MM: valor}}
+    "goals"           # metas financeiras
+])
+
+def dashboard_model_key(start_date=None, end_date=None, categories=None, types=None, history_months=12):
+    """
+    Chave do modelo para o estado atual dos dados e dos filtros.
+    
+    Args:
+        start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+        end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+        categories (list, optional): Categorias filtradas
+        types (list, optional): Tipos de transação filtrados
+        history_months (int): Meses das séries históricas
+        
+    Returns:
+        tuple: (snapshot, versão das metas, período, categorias, tipos, meses)
+    """
+    return (
+        get_snapshot_token(),
+        get_goals_version(),
+        start_date,
+        end_date,
+        tuple(sorted(categories or ())),
+        tuple(sorted(types or ())),
+        history_months
+    )
+
+@profiled()
+def build_dashboard_model(key, start_date=None, end_date=None, categories=None, types=None, history_months=12):
+    """
+    Calcula todos os dados do dashboard a partir de um único snapshot.
+    
+    Args:
+        key (tuple): Saída de dashboard_model_key
+        start_date, end_date, categories, types: Filtros do período (ver period_summary)
+        history_months (int): Meses das séries históricas
+        
+    Returns:
+        DashboardModel: Dados prontos para as abas
+    """
+    # O período filtrado é lido por query_transactions; o histórico completo
+    # só entra no modelo para a distribuição e a regra 50/30/20
+    summary = period_summary(start_date, end_date, types, categories)
+    transactions = view_transactions()
+    return DashboardModel(
+        key=key,
+        transactions=transactions,
+        summary=summary,
+        resumo_total=total_summary(),
+        balance=get_balance(),
+        distribution=get_expense_distribution(transactions_data=transactions),
+        historical=get_historical_data(history_months),
+        goals=view_goals()
+    )
+
+@profiled()
+def get_dashboard_model(start_date=None, end_date=None, categories=None, types=None, history_months=12):
+    """
+    Retorna o DashboardModel dos filtros informados, do cache da sessão quando possível.
+    
+    Sem filtros, o período é o mês atual (ver period_summary).
+    
+    Args:
+        start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+        end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+        categories (list, optional): Categorias filtradas
+        types (list, optional): Tipos de transação filtrados
+        history_months (int): Meses das séries históricas
+        
+    Returns:
+        DashboardModel: Modelo compartilhado pelas abas do dashboard
+    """
+    key = dashboard_model_key(start_date, end_date, categories, types, history_months)
+    cache = st.session_state.get(_MODEL_CACHE_KEY)
+    if cache is None:
+        cache = st.session_state[_MODEL_CACHE_KEY] = OrderedDict()
+    model = cache.get(key)
+    if model is not None:
+        cache.move_to_end(key)
+        return model
+    
+    model = build_dashboard_model(key, start_date, end_date, categories, types, history_months)
+    # Modelos de versões anteriores dos dados nunca mais serão usados
+    for old_key in [k for k in cache if k[:2] != key[:2]]:
+        del cache[old_key]
+    cache[key] = model
+    while len(cache) > DASHBOARD_MODEL_CACHE_SIZE:
+        cache.popitem(last=False)
+    logger.debug("Modelo do dashboard calculado (%d no cache)", len(cache))
+    return model
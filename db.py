@@ -1,8 +1,14 @@
+import queue
 import sqlite3
-from goals_db import init_goals_table
+import threading
+from datetime import datetime
+from contextlib import contextmanager
 from db_backup import backup_transactions, restore_transactions, list_backups
 import os
 import streamlit as st
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 # Importar a nova integração com Supabase
 from supabase_db import (
@@ -23,49 +29,142 @@ def use_supabase():
     except:
         return False
 
-# Função para inicializar o banco de dados
-def init_db():
-    """Inicializa o banco de dados (SQLite ou Supabase)"""
-    if use_supabase():
-        # Inicializar tabelas no Supabase
-        init_supabase_tables()
-        return
-        
-    # Código original para SQLite
-    # Verificar se o banco já existe e está inicializado
-    if os.path.exists(DB_PATH):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        # Verificar se as tabelas existem
-        c.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = {table[0] for table in c.fetchall()}
+# ---------------------------------------------------------------------
+# Conexões SQLite
+# ---------------------------------------------------------------------
+# As conexões ficam em um pequeno pool por arquivo de banco, compartilhado
+# pelas sessões do Streamlit (cada uma roda em sua thread). Cada conexão é
+# aberta uma única vez com WAL (leitores não bloqueiam o escritor),
+# synchronous=NORMAL, mmap e cache de páginas maior; como a conexão vive
+# por todo o processo, o cache de instruções do sqlite3 reaproveita as
+# consultas preparadas.
+
+SQLITE_POOL_SIZE = 4
+SQLITE_BUSY_TIMEOUT_SECONDS = 5
+SQLITE_CACHED_STATEMENTS = 256
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA cache_size=-20000",    # ~20 MB
+    "PRAGMA temp_store=MEMORY"
+]
+
+_sqlite_pools = {}
+_sqlite_pools_lock = threading.Lock()
+
+def _open_sqlite_connection(path):
+    """Abre uma conexão já configurada com os PRAGMAs de desempenho"""
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+                           check_same_thread=False,
+                           cached_statements=SQLITE_CACHED_STATEMENTS)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _get_sqlite_pool(path):
+    pool = _sqlite_pools.get(path)
+    if pool is None:
+        with _sqlite_pools_lock:
+            pool = _sqlite_pools.setdefault(path, queue.LifoQueue(maxsize=SQLITE_POOL_SIZE))
+    return pool
+
+@contextmanager
+def sqlite_connection(path=None):
+    """
+    Empresta uma conexão do pool do processo.
+    
+    A conexão é de uso exclusivo dentro do bloco; ao sair, uma transação
+    não confirmada é desfeita e a conexão volta ao pool. Use conn.commit()
+    ou "with conn:" para confirmar as escritas.
+    
+    Args:
+        path (str, optional): Arquivo do banco; padrão DB_PATH
         
-        if all(table in tables for table in ['transactions', 'categories', 'users', 'settings', 'goals']):
+    Yields:
+        sqlite3.Connection: Conexão configurada
+    """
+    path = path or DB_PATH
+    pool = _get_sqlite_pool(path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _open_sqlite_connection(path)
+    try:
+        yield conn
+    finally:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            pool.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
             conn.close()
-            return  # Banco já está inicializado, não precisa fazer nada
-        
-        conn.close()
 
-    # Se chegou aqui, precisa inicializar o banco
-    # Fazer backup das transações existentes apenas se o arquivo existir
-    if os.path.exists(DB_PATH):
+def close_sqlite_connections():
+    """Fecha as conexões ociosas de todos os pools (ex.: antes de substituir o arquivo)"""
+    with _sqlite_pools_lock:
+        pools = list(_sqlite_pools.values())
+        _sqlite_pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+def use_local_replica():
+    """
+    Determina se as leituras devem usar a réplica local do Supabase (local_replica.py).
+    
+    Ligada por LOCAL_REPLICA = true em st.secrets ou FINANCAS_LOCAL_REPLICA=1;
+    só tem efeito quando o Supabase está configurado.
+    """
+    flag = os.environ.get("FINANCAS_LOCAL_REPLICA")
+    if flag is None:
         try:
-            backup_file = backup_transactions()
-            print(f"Backup criado em: {backup_file}")
-        except Exception as e:
-            print(f"Não foi possível fazer backup: {str(e)}")
-            backup_file = None
+            flag = st.secrets.get("LOCAL_REPLICA", False)
+        except Exception:
+            flag = False
+    enabled = str(flag).strip().lower() in ("1", "true", "sim", "yes")
+    return enabled and use_supabase()
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+# ---------------------------------------------------------------------
+# Inicialização e migrações do esquema
+# ---------------------------------------------------------------------
+# init_db() roda uma única vez por processo: as execuções seguintes do
+# script do Streamlit não fazem nenhuma consulta de esquema. No SQLite a
+# tabela schema_version registra as migrações aplicadas; cada migração é
+# aplicada uma única vez, em ordem. No Supabase o esquema é criado por
+# supabase_schema.sql e aqui apenas a conexão é verificada.
 
-    # Inicializar tabela de metas primeiro
-    init_goals_table()
+_init_lock = threading.Lock()
+_initialized_backend = None
 
+def _migration_1_initial_schema(conn):
+    """Estrutura inicial: transactions, categories, users, goals e settings"""
+    c = conn.cursor()
+    
+    # Bancos criados antes do controle de versão já têm todas as tabelas
+    c.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {table[0] for table in c.fetchall()}
+    if all(table in tables for table in ['transactions', 'categories', 'users', 'settings', 'goals']):
+        return
+    
+    # Fazer backup das transações existentes apenas se a tabela existir
+    backup_file = None
+    if 'transactions' in tables:
+        try:
+            backup_file = backup_transactions(query_transactions())
+            logger.info("Backup criado em: %s", backup_file)
+        except Exception as e:
+            logger.warning("Não foi possível fazer backup: %s", e)
+            backup_file = None
+    
+    # A tabela de metas é criada abaixo, junto com as demais (colunas do Supabase na migração 5)
+    
     # Remover tabela categories se existir para recriar com a estrutura correta
     c.execute('DROP TABLE IF EXISTS categories')
-    conn.commit()
     
     # Tabela de categorias
     c.execute('''CREATE TABLE IF NOT EXISTS categories
@@ -74,21 +173,18 @@ def init_db():
                   type TEXT NOT NULL,
                   categoria_tipo TEXT NOT NULL,
                   active BOOLEAN DEFAULT 1)''')
-    conn.commit()
     
     # Adicionar colunas se não existirem
     try:
         c.execute('''ALTER TABLE transactions 
                      ADD COLUMN categoria_tipo TEXT DEFAULT 'outros' ''')
-        conn.commit()
-    except:
+    except sqlite3.OperationalError:
         pass  # Coluna já existe ou tabela não existe ainda
         
     try:
         c.execute('''ALTER TABLE transactions 
                      ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP''')
-        conn.commit()
-    except:
+    except sqlite3.OperationalError:
         pass  # Coluna já existe ou tabela não existe ainda
     
     # Tabela de usuários (opcional por enquanto)
@@ -117,7 +213,6 @@ def init_db():
                   fixed_expense BOOLEAN DEFAULT 0,
                   categoria_tipo TEXT DEFAULT 'outros',
                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    conn.commit()
     
     # Tabela de metas completa
     c.execute('''CREATE TABLE IF NOT EXISTS goals
@@ -135,7 +230,6 @@ def init_db():
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
                   name TEXT NOT NULL,
                   value TEXT NOT NULL)''')
-    
     conn.commit()
     
     # Inicializar configurações depois das tabelas estarem criadas
@@ -144,33 +238,491 @@ def init_db():
     initialize_categories()
     init_settings()
     
-    # Se tiver feito backup, restaura as transações
-    if os.path.exists(DB_PATH) and 'backup_file' in locals() and backup_file:
+    # Se tiver feito backup, restaura as transações (os agregados são
+    # recalculados pela migração 2)
+    if backup_file:
         try:
-            restore_transactions(backup_file)
+            report = restore_transactions(backup_file, target="sqlite", rebuild_aggregates=False)
+            if report:
+                logger.info("Transações restauradas: %d (%d inválidas, %d duplicadas)",
+                            report['written'], report['invalid'], report['duplicates'])
         except Exception as e:
-            print(f"Erro ao restaurar transações: {str(e)}")
+            logger.error("Erro ao restaurar transações: %s", e)
+
+def _migration_2_monthly_aggregates(conn):
+    """Tabela monthly_aggregates, preenchida a partir das transações existentes"""
+    conn.execute(MONTHLY_AGGREGATES_DDL)
+    # query_transactions (usada pela reconstrução) lê todas as colunas atuais
+    _add_fitid_column(conn)
+    conn.commit()
+    rebuild_monthly_aggregates()
+
+def _migration_3_local_replica(conn):
+    """Tabelas de controle da réplica local: marcas d'água e fila de escritas"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS sync_state
+                    (table_name TEXT PRIMARY KEY,
+                     last_id INTEGER NOT NULL DEFAULT 0,
+                     last_created_at TEXT,
+                     synced_at TIMESTAMP,
+                     full_synced_at TIMESTAMP)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sync_outbox
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     table_name TEXT NOT NULL,
+                     op TEXT NOT NULL,
+                     row_id INTEGER,
+                     payload TEXT NOT NULL,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     attempts INTEGER DEFAULT 0,
+                     last_error TEXT)''')
+    conn.commit()
+
+# Índices compostos na ordem dos filtros usados pelas telas: período por
+# usuário, tipo/status por período e contas a vencer por data de vencimento.
+# idx_transactions_date atende as listagens sem filtro de usuário
+# (ORDER BY date DESC).
+TRANSACTION_INDEXES = [
+    ("idx_transactions_user_date", "transactions (user_id, date)"),
+    ("idx_transactions_user_type_status_date", "transactions (user_id, type, status, date)"),
+    ("idx_transactions_category", "transactions (category)"),
+    ("idx_transactions_due_date_status", "transactions (due_date, status)"),
+    ("idx_transactions_date", "transactions (date)")
+]
+
+def _migration_4_transaction_indexes(conn):
+    """Índices da tabela transactions para filtros por data, tipo/status e categoria"""
+    for name, definition in TRANSACTION_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    # Estatísticas para o planejador escolher entre os índices
+    conn.execute("ANALYZE transactions")
+    conn.commit()
+
+def _migration_5_goals_schema(conn):
+    """Tabela goals com as mesmas colunas do Supabase (title, status, updated_at)"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(goals)")]
+    if "title" in columns:
+        return
+    # O SQLite não altera restrições de colunas: a tabela é recriada e as
+    # metas antigas recebem a descrição como título
+    conn.execute("ALTER TABLE goals RENAME TO goals_old")
+    conn.execute('''CREATE TABLE goals
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     user_id INTEGER DEFAULT 1,
+                     title TEXT NOT NULL,
+                     description TEXT,
+                     target_amount REAL NOT NULL,
+                     current_amount REAL DEFAULT 0,
+                     deadline TEXT,
+                     category TEXT,
+                     status TEXT DEFAULT 'Em Andamento',
+                     notes TEXT,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute('''INSERT INTO goals (id, user_id, title, description, target_amount,
+                                       current_amount, deadline, category, created_at, updated_at)
+                    SELECT id, user_id, description, description, target_amount,
+                           current_amount, deadline, category, created_at, created_at
+                    FROM goals_old''')
+    conn.execute("DROP TABLE goals_old")
+    conn.commit()
+
+def _add_fitid_column(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+    if "fitid" not in columns:
+        conn.execute("ALTER TABLE transactions ADD COLUMN fitid TEXT")
+
+def _migration_6_transaction_fitid(conn):
+    """Coluna fitid: identificador da transação no extrato OFX importado"""
+    _add_fitid_column(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_fitid ON transactions (fitid)")
+    conn.commit()
+
+def _migration_7_aggregates_state(conn):
+    """Marcador persistente do estado de monthly_aggregates"""
+    conn.execute(AGGREGATES_STATE_DDL)
+    conn.commit()
+
+# (versão, descrição, função). Novas migrações entram sempre no final.
+MIGRATIONS = [
+    (1, "estrutura inicial", _migration_1_initial_schema),
+    (2, "agregados mensais", _migration_2_monthly_aggregates),
+    (3, "réplica local", _migration_3_local_replica),
+    (4, "índices de transações", _migration_4_transaction_indexes),
+    (5, "metas no esquema do Supabase", _migration_5_goals_schema),
+    (6, "fitid das transações importadas", _migration_6_transaction_fitid),
+    (7, "estado dos agregados mensais", _migration_7_aggregates_state)
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    """Retorna a última versão de esquema aplicada (0 se nenhuma)"""
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                 (version INTEGER PRIMARY KEY,
+                  description TEXT NOT NULL,
+                  applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute("SELECT MAX(version) FROM schema_version")
+    return c.fetchone()[0] or 0
+
+def apply_migrations():
+    """
+    Aplica no SQLite as migrações ainda não registradas em schema_version.
+    
+    Returns:
+        list: Versões aplicadas nesta chamada
+    """
+    applied = []
+    with sqlite_connection() as conn:
+        current = get_schema_version(conn)
+        for version, description, migration in MIGRATIONS:
+            if version <= current:
+                continue
+            migration(conn)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                         (version, description))
+            conn.commit()
+            applied.append(version)
+            logger.info("Migração %s aplicada: %s", version, description)
+    return applied
+
+def init_db(force=False):
+    """
+    Inicializa o banco de dados do backend ativo (repositories.get_backend)
+    uma vez por processo.
     
-    conn.close()
+    Args:
+        force (bool): Refaz a verificação mesmo se o processo já inicializou
+    """
+    global _initialized_backend
+    if _initialized_backend is not None and not force:
+        return
     
+    with _init_lock:
+        if _initialized_backend is not None and not force:
+            return
+        from repositories import get_backend
+        backend = get_backend()
+        if backend == "memory":
+            # Repositórios em memória não têm esquema
+            pass
+        elif backend == "supabase":
+            # A réplica local usa o mesmo esquema do SQLite e continua
+            # servindo leituras mesmo se o Supabase estiver fora do ar
+            if use_local_replica():
+                apply_migrations()
+            # Tabelas criadas por supabase_schema.sql; apenas verificar a conexão
+            if not init_supabase_tables():
+                return
+        else:
+            apply_migrations()
+        if backend != "memory":
+            _ensure_monthly_aggregates()
+        _initialized_backend = backend
+
+def _ensure_monthly_aggregates():
+    """
+    Reconstrói monthly_aggregates se o marcador persistente não for "built"
+    (tabela nunca reconstruída ou deixada desatualizada por outro processo).
+    """
+    from repositories import get_repositories
+    repo = get_repositories().transactions
+    try:
+        if repo.aggregates_status() != "built":
+            repo.rebuild_aggregates()
+    except Exception as e:
+        logger.warning("Falha ao reconstruir monthly_aggregates: %s", e)
+
 def get_transactions():
     """Obtém transações do banco ativo (SQLite ou Supabase)"""
     if use_supabase():
         return supabase_get_transactions()
     
     # Código original para SQLite
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''SELECT id, user_id, description, amount, category, date,
-                       due_date, type, status, recurring, priority,
-                       quinzena, installments, current_installment, fixed_expense,
-                       categoria_tipo, created_at
-                FROM transactions 
-                ORDER BY date DESC''')
-    transactions = c.fetchall()
-    conn.close()
+    with sqlite_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT id, user_id, description, amount, category, date,
+                           due_date, type, status, recurring, priority,
+                           quinzena, installments, current_installment, fixed_expense,
+                           categoria_tipo, created_at
+                    FROM transactions 
+                    ORDER BY date DESC''')
+        transactions = c.fetchall()
     return transactions
 
+TRANSACTION_COLUMNS = [
+    "id", "user_id", "description", "amount", "category", "date",
+    "due_date", "type", "status", "recurring", "priority",
+    "quinzena", "installments", "current_installment", "fixed_expense",
+    "categoria_tipo", "fitid", "created_at"
+]
+
+def query_transactions(start_date=None, end_date=None, types=None, statuses=None,
+                       categories=None, categorias_tipo=None):
+    """
+    Consulta transações no SQLite aplicando os filtros na cláusula WHERE.
+    
+    Args:
+        start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+        end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+        types (list, optional): Valores aceitos para a coluna type
+        statuses (list, optional): Valores aceitos para a coluna status
+        categories (list, optional): Valores aceitos para a coluna category
+        categorias_tipo (list, optional): Valores aceitos para a coluna categoria_tipo
+        
+    Returns:
+        list: Lista de transações como dicionários
+    """
+    clauses = []
+    params = []
+    if start_date:
+        clauses.append("date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("date < ?")
+        params.append(end_date)
+    for column, values in (("type", types), ("status", statuses),
+                           ("category", categories), ("categoria_tipo", categorias_tipo)):
+        if values:
+            values = list(values)
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    
+    sql = f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY date DESC, id DESC"
+    
+    with sqlite_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        transactions = [dict(row) for row in conn.execute(sql, params)]
+    return transactions
+
+def find_fitids(fitids):
+    """
+    Retorna quais dos FITIDs informados já estão gravados no SQLite.
+    
+    Args:
+        fitids (iterable): Identificadores de transações de extratos OFX
+        
+    Returns:
+        set: FITIDs já importados
+    """
+    fitids = list(fitids)
+    found = set()
+    with sqlite_connection() as conn:
+        for start in range(0, len(fitids), 500):
+            chunk = fitids[start:start + 500]
+            found.update(row[0] for row in conn.execute(
+                f"SELECT fitid FROM transactions WHERE fitid IN ({', '.join('?' for _ in chunk)})", chunk))
+    return found
+
+def insert_transactions(transactions):
+    """
+    Insere várias transações no SQLite em uma única transação.
+    
+    Args:
+        transactions (list): Dicionários com as colunas de TRANSACTION_COLUMNS (sem id)
+        
+    Returns:
+        int: Quantidade de linhas inseridas
+    """
+    if not transactions:
+        return 0
+    columns = [c for c in TRANSACTION_COLUMNS if c != "id" and c in transactions[0]]
+    sql = (f"INSERT INTO transactions ({', '.join(columns)}) "
+           f"VALUES ({', '.join(':' + c for c in columns)})")
+    with sqlite_connection() as conn, conn:
+        conn.executemany(sql, transactions)
+    return len(transactions)
+
+def upsert_transactions(transactions):
+    """
+    Grava várias transações no SQLite, substituindo as que já têm o mesmo id.
+    
+    Transações sem id (ou com id None) recebem um novo id do banco.
+    
+    Args:
+        transactions (list): Dicionários com as mesmas colunas de TRANSACTION_COLUMNS
+        
+    Returns:
+        int: Quantidade de linhas gravadas
+    """
+    if not transactions:
+        return 0
+    columns = [c for c in TRANSACTION_COLUMNS if c in transactions[0]]
+    sql = (f"INSERT OR REPLACE INTO transactions ({', '.join(columns)}) "
+           f"VALUES ({', '.join(':' + c for c in columns)})")
+    with sqlite_connection() as conn, conn:
+        conn.executemany(sql, transactions)
+    return len(transactions)
+
+def bulk_update_transactions(data, ids=None, categories=None, types=None):
+    """
+    Aplica a mesma alteração a várias transações com um único UPDATE.
+    
+    Args:
+        data (dict): Colunas a alterar
+        ids (list, optional): IDs das transações
+        categories (list, optional): Categorias das transações
+        types (list, optional): Restringe aos tipos informados
+        
+    Returns:
+        int: Quantidade de linhas alteradas
+    """
+    columns = [c for c in data if c in TRANSACTION_COLUMNS and c != "id"]
+    if not columns:
+        return 0
+    if ids is None and not categories:
+        raise ValueError("Informe ids ou categorias para a atualização em lote")
+    
+    clauses = []
+    params = [data[c] for c in columns]
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+    for column, values in (("id", ids), ("category", categories), ("type", types)):
+        if values:
+            values = list(values)
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    sql = (f"UPDATE transactions SET {', '.join(c + ' = ?' for c in columns)} "
+           f"WHERE {' AND '.join(clauses)}")
+    with sqlite_connection() as conn, conn:
+        count = conn.execute(sql, params).rowcount
+    return count
+
+# ---------------------------------------------------------------------
+# Agregados mensais materializados
+# ---------------------------------------------------------------------
+
+MONTHLY_AGGREGATES_DDL = '''CREATE TABLE IF NOT EXISTS monthly_aggregates
+                 (user_id INTEGER NOT NULL DEFAULT 1,
+                  month TEXT NOT NULL,
+                  type TEXT NOT NULL,
+                  categoria_tipo TEXT NOT NULL,
+                  total_amount REAL NOT NULL DEFAULT 0,
+                  paid_amount REAL NOT NULL DEFAULT 0,
+                  transaction_count INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (user_id, month, type, categoria_tipo))'''
+
+# Marcador persistente de monthly_aggregates: "built" depois de uma
+# reconstrução completa, "stale" quando um delta não pôde ser aplicado.
+# Sem marcador (tabela nunca reconstruída) os agregados não são usados.
+AGGREGATES_STATE_DDL = '''CREATE TABLE IF NOT EXISTS monthly_aggregates_state
+                 (id INTEGER PRIMARY KEY CHECK (id = 1),
+                  status TEXT NOT NULL,
+                  updated_at TEXT)'''
+
+def _set_aggregates_status(conn, status):
+    conn.execute(AGGREGATES_STATE_DDL)
+    conn.execute('''INSERT INTO monthly_aggregates_state (id, status, updated_at) VALUES (1, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET status = excluded.status,
+                                                   updated_at = excluded.updated_at''',
+                 (status, datetime.now().isoformat()))
+
+def _get_aggregates_status(conn):
+    try:
+        row = conn.execute("SELECT status FROM monthly_aggregates_state WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # Tabela ainda não criada (migração 7)
+        return None
+    return row[0] if row else None
+
+def get_aggregates_status():
+    """
+    Estado de monthly_aggregates no SQLite.
+    
+    Returns:
+        str | None: "built", "stale" ou None se a tabela nunca foi reconstruída
+    """
+    with sqlite_connection() as conn:
+        return _get_aggregates_status(conn)
+
+def mark_aggregates_stale():
+    """Marca monthly_aggregates como desatualizada até a próxima reconstrução"""
+    with sqlite_connection() as conn, conn:
+        _set_aggregates_status(conn, "stale")
+
+def apply_monthly_aggregate_deltas(deltas):
+    """
+    Soma os deltas às linhas de monthly_aggregates (criando as que faltarem).
+    
+    Args:
+        deltas (list): Saída de aggregations.aggregate_deltas
+    """
+    if not deltas:
+        return
+    with sqlite_connection() as conn, conn:
+        conn.executemany('''INSERT INTO monthly_aggregates
+                                (user_id, month, type, categoria_tipo,
+                                 total_amount, paid_amount, transaction_count)
+                            VALUES (:user_id, :month, :type, :categoria_tipo,
+                                    :total_amount, :paid_amount, :transaction_count)
+                            ON CONFLICT (user_id, month, type, categoria_tipo) DO UPDATE SET
+                                total_amount = total_amount + excluded.total_amount,
+                                paid_amount = paid_amount + excluded.paid_amount,
+                                transaction_count = transaction_count + excluded.transaction_count''',
+                         deltas)
+        conn.execute("DELETE FROM monthly_aggregates WHERE transaction_count <= 0")
+
+def get_monthly_aggregates(start_month=None, end_month=None, user_id=None):
+    """
+    Lê as linhas de monthly_aggregates.
+    
+    Args:
+        start_month (str, optional): Período inicial inclusivo (YYYY-MM)
+        end_month (str, optional): Período final inclusivo (YYYY-MM)
+        user_id (int, optional): Restringe a um usuário
+        
+    Returns:
+        list | None: Linhas como dicionários, ou None se a tabela não está
+            reconstruída (get_aggregates_status diferente de "built")
+    """
+    clauses = []
+    params = []
+    if start_month:
+        clauses.append("month >= ?")
+        params.append(start_month)
+    if end_month:
+        clauses.append("month <= ?")
+        params.append(end_month)
+    if user_id is not None:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    sql = "SELECT * FROM monthly_aggregates"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY month"
+    
+    with sqlite_connection() as conn:
+        if _get_aggregates_status(conn) != "built":
+            return None
+        conn.row_factory = sqlite3.Row
+        rows = [dict(row) for row in conn.execute(sql, params)]
+    return rows
+
+def rebuild_monthly_aggregates():
+    """
+    Recalcula monthly_aggregates inteira a partir da tabela de transações.
+    
+    Returns:
+        int: Quantidade de linhas gravadas
+    """
+    from aggregations import build_monthly_aggregates
+    rows = build_monthly_aggregates(query_transactions())
+    with sqlite_connection() as conn, conn:
+        conn.execute(MONTHLY_AGGREGATES_DDL)
+        conn.execute("DELETE FROM monthly_aggregates")
+        conn.executemany('''INSERT INTO monthly_aggregates
+                                (user_id, month, type, categoria_tipo,
+                                 total_amount, paid_amount, transaction_count)
+                            VALUES (:user_id, :month, :type, :categoria_tipo,
+                                    :total_amount, :paid_amount, :transaction_count)''', rows)
+        # Na mesma transação: o marcador nunca descreve um conteúdo diferente
+        _set_aggregates_status(conn, "built")
+    return len(rows)
+
 # Função para migrar dados do SQLite para o Supabase
 def migrate_to_supabase():
     """Migra todos os dados do SQLite local para o Supabase"""
@@ -1,45 +1,958 @@
+import io
 import os
 import json
+import gzip
+import math
+import time
+import hashlib
 import datetime
 import streamlit as st
+from app_logging import get_logger
 
-def backup_transactions(transactions, user_id=1):
+logger = get_logger(__name__)
+
+BACKUP_DIR = 'backup'
+
+def backup_transactions(transactions, user_id=1, incremental=False):
     """
     Cria um backup das transações
     
     Esta é uma versão simplificada que mantém compatibilidade com o código existente.
+    Com incremental=True grava apenas as diferenças em relação ao último
+    backup incremental (veja create_incremental_backup). Um backup completo
+    idêntico a um já existente não é gravado de novo: o índice registra o
+    novo ponto de restauração apontando para o arquivo existente.
     """
-    os.makedirs('backup', exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"backup/transactions_backup_{timestamp}.json"
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(transactions, f, ensure_ascii=False, indent=4)
-    
+    if incremental:
+        return create_incremental_backup(transactions)
+
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    now = datetime.datetime.now()
+    content_hash = _content_hash(transactions)
+    index = load_backup_index()
+    existing = next(
+        (entry for entry in index["snapshots"]
+         if entry["sha256"] == content_hash
+         and os.path.exists(os.path.join(BACKUP_DIR, entry["file"]))),
+        None
+    )
+    if existing:
+        name = existing["file"]
+        logger.info("Backup idêntico a %s; apenas registrado no índice", name)
+    else:
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        name = f"transactions_backup_{timestamp}.json"
+        suffix = 1
+        while os.path.exists(os.path.join(BACKUP_DIR, name)):
+            name = f"transactions_backup_{timestamp}_{suffix}.json"
+            suffix += 1
+        with open(os.path.join(BACKUP_DIR, name), 'w', encoding='utf-8') as f:
+            json.dump(transactions, f, ensure_ascii=False, indent=4)
+
+    filename = os.path.join(BACKUP_DIR, name)
+    index["snapshots"].append({
+        "created_at": now.isoformat(),
+        "file": name,
+        "sha256": content_hash,
+        "records": len(transactions),
+        "size": os.path.getsize(filename)
+    })
+    _save_backup_index(index)
     return filename
 
-def restore_transactions(filename):
+def list_backups():
     """
-    Restaura transações de um arquivo de backup
+    Lista todos os arquivos de backup disponíveis
     
     Esta é uma versão simplificada que mantém compatibilidade com o código existente.
+    Os nomes vêm do índice (backup/index.json), sem abrir cada arquivo.
+    """
+    backup_files = {entry["file"] for entry in load_backup_index()["snapshots"]}
+    return sorted(backup_files, reverse=True)  # Ordenar do mais recente para o mais antigo
+
+# ---------------------------------------------------------------------------
+# Backups incrementais
+#
+# Cada cadeia começa com um snapshot base (base_<timestamp>.jsonl.gz, uma
+# transação por linha) seguido de deltas (delta_<timestamp>.jsonl.gz) com uma
+# operação por linha:
+#     {"op": "upsert", "id": 7, "created_at": "...", "record": {...}}
+#     {"op": "delete", "id": 7, "created_at": "..."}
+# O manifesto (manifest.json) descreve as cadeias em ordem; as impressões
+# digitais (id -> hash do registro) do último estado ficam em
+# fingerprints.json.gz, então um novo delta não precisa reler a cadeia.
+# ---------------------------------------------------------------------------
+
+INCREMENTAL_DIR = os.path.join(BACKUP_DIR, 'incremental')
+MANIFEST_FILE = 'manifest.json'
+FINGERPRINTS_FILE = 'fingerprints.json.gz'
+# Depois de tantos deltas a próxima execução começa uma nova cadeia (novo base)
+MAX_DELTAS_PER_BASE = 50
+_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S_%f"
+
+def _record_key(record):
+    """Chave de um registro no backup incremental (id da transação)"""
+    return str(record.get('id'))
+
+def _fingerprint(record):
+    """Hash estável do conteúdo de um registro"""
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def _write_jsonl_gz(path, rows):
+    """Grava linhas JSON comprimidas de forma atômica (arquivo temporário + rename)"""
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, default=str))
+            f.write('\n')
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+def iter_jsonl(path):
+    """
+    Lê um arquivo JSON-lines (comprimido com gzip ou não) linha a linha.
+
+    Args:
+        path (str): Caminho do arquivo .jsonl ou .jsonl.gz
+
+    Yields:
+        dict: Um objeto por linha não vazia
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def load_manifest(backup_dir=INCREMENTAL_DIR):
+    """
+    Carrega o manifesto dos backups incrementais.
+
+    Returns:
+        dict: {"chains": [{"base": {...}, "deltas": [{...}, ...]}, ...]}
+    """
+    path = os.path.join(backup_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"chains": []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_manifest(manifest, backup_dir):
+    path = os.path.join(backup_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _load_fingerprints(backup_dir):
+    path = os.path.join(backup_dir, FINGERPRINTS_FILE)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_fingerprints(fingerprints, backup_dir):
+    path = os.path.join(backup_dir, FINGERPRINTS_FILE)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(fingerprints, f)
+    os.replace(tmp_path, path)
+
+def create_incremental_backup(transactions, backup_dir=INCREMENTAL_DIR,
+                              max_deltas=MAX_DELTAS_PER_BASE, force_base=False):
+    """
+    Cria um backup incremental das transações.
+
+    Na primeira execução (ou quando a cadeia atual já tem max_deltas deltas)
+    grava um snapshot base; nas demais grava só as transações inseridas,
+    alteradas ou removidas desde o último backup. Se nada mudou, nenhum
+    arquivo é criado.
+
+    Args:
+        transactions (list): Estado atual das transações (dicts com 'id')
+        backup_dir (str): Diretório dos backups incrementais
+        max_deltas (int): Número máximo de deltas por cadeia
+        force_base (bool): Força a criação de um novo snapshot base
+
+    Returns:
+        str | None: Caminho do arquivo criado ou None se não houve mudanças
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    manifest = load_manifest(backup_dir)
+    fingerprints = _load_fingerprints(backup_dir)
+    now = datetime.datetime.now()
+    timestamp = now.strftime(_TIMESTAMP_FORMAT)
+    created_at = now.isoformat()
+
+    current = {}
+    for record in transactions:
+        current[_record_key(record)] = record
+    current_fingerprints = {key: _fingerprint(record) for key, record in current.items()}
+
+    chains = manifest["chains"]
+    new_chain = (
+        force_base or not chains or fingerprints is None
+        or len(chains[-1]["deltas"]) >= max_deltas
+    )
+
+    if new_chain:
+        filename = f"base_{timestamp}.jsonl.gz"
+        count = _write_jsonl_gz(os.path.join(backup_dir, filename), current.values())
+        chains.append({
+            "base": {"file": filename, "created_at": created_at, "records": count},
+            "deltas": []
+        })
+    else:
+        def operations():
+            for key, record in current.items():
+                if fingerprints.get(key) != current_fingerprints[key]:
+                    yield {"op": "upsert", "id": record.get('id'),
+                           "created_at": record.get('created_at'), "record": record}
+            for key in fingerprints.keys() - current.keys():
+                yield {"op": "delete", "id": key, "created_at": created_at}
+
+        changes = list(operations())
+        if not changes:
+            logger.info("Backup incremental ignorado: nenhuma mudança desde o último")
+            return None
+        filename = f"delta_{timestamp}.jsonl.gz"
+        _write_jsonl_gz(os.path.join(backup_dir, filename), changes)
+        chains[-1]["deltas"].append({
+            "file": filename,
+            "created_at": created_at,
+            "upserts": sum(1 for op in changes if op["op"] == "upsert"),
+            "deletes": sum(1 for op in changes if op["op"] == "delete")
+        })
+
+    # Ordem: arquivo de dados, manifesto e por último as impressões digitais.
+    # Uma falha antes das impressões digitais só faz o próximo delta repetir
+    # mudanças já gravadas, nunca perdê-las
+    _save_manifest(manifest, backup_dir)
+    _save_fingerprints(current_fingerprints, backup_dir)
+    return os.path.join(backup_dir, filename)
+
+def list_restore_points(backup_dir=INCREMENTAL_DIR):
+    """
+    Lista os pontos de restauração dos backups incrementais.
+
+    Returns:
+        list: dicts {"created_at", "file", "kind" ('base' ou 'delta')},
+              do mais recente para o mais antigo
+    """
+    points = []
+    for chain in load_manifest(backup_dir)["chains"]:
+        points.append({**chain["base"], "kind": "base"})
+        points.extend({**delta, "kind": "delta"} for delta in chain["deltas"])
+    points.sort(key=lambda point: point["created_at"], reverse=True)
+    return points
+
+def _as_iso(timestamp):
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, (datetime.datetime, datetime.date)):
+        return timestamp.isoformat()
+    return str(timestamp)
+
+def _chain_at(target, backup_dir):
+    """Cadeia mais recente cujo snapshot base é anterior (ou igual) ao instante (None se não há)"""
+    chains = [
+        chain for chain in load_manifest(backup_dir)["chains"]
+        if target is None or chain["base"]["created_at"] <= target
+    ]
+    return chains[-1] if chains else None
+
+def reconstruct_state(timestamp=None, backup_dir=INCREMENTAL_DIR):
+    """
+    Reconstrói o conjunto de transações em um ponto no tempo.
+
+    Usa a cadeia mais recente cujo snapshot base é anterior (ou igual) ao
+    instante pedido e reaplica seus deltas até esse instante.
+
+    Args:
+        timestamp (datetime | str, optional): Instante desejado (ISO 8601);
+            padrão é o último backup
+        backup_dir (str): Diretório dos backups incrementais
+
+    Returns:
+        list: Transações ordenadas por id ([] se não há backup até o instante)
+    """
+    target = _as_iso(timestamp)
+    chain = _chain_at(target, backup_dir)
+    if chain is None:
+        return []
+
+    state = {}
+    for record in iter_jsonl(os.path.join(backup_dir, chain["base"]["file"])):
+        state[_record_key(record)] = record
+    for delta in chain["deltas"]:
+        if target is not None and delta["created_at"] > target:
+            break
+        for op in iter_jsonl(os.path.join(backup_dir, delta["file"])):
+            key = str(op["id"])
+            if op["op"] == "delete":
+                state.pop(key, None)
+            else:
+                state[key] = op["record"]
+
+    def sort_key(record):
+        record_id = record.get('id')
+        return (0, record_id, '') if isinstance(record_id, int) else (1, 0, str(record_id))
+
+    return sorted(state.values(), key=sort_key)
+
+# ---------------------------------------------------------------------------
+# Restauração em streaming
+#
+# Os arquivos são lidos aos poucos (array JSON ou JSON-lines, com ou sem
+# gzip), cada registro é validado contra o esquema de transactions e os
+# registros válidos são gravados em lotes, cada lote em uma transação do
+# banco. Assim a memória usada não depende do tamanho do backup.
+# ---------------------------------------------------------------------------
+
+DEFAULT_RESTORE_BATCH_SIZE = 500
+_READ_CHUNK_SIZE = 1 << 20
+
+class _ByteCounter(io.RawIOBase):
+    """Envolve um arquivo binário contando os bytes lidos (para o progresso)"""
+
+    def __init__(self, raw, stats):
+        self.raw = raw
+        self.stats = stats
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        self.stats["bytes_read"] += count or 0
+        return count
+
+class _PrefixedStream:
+    """Devolve um prefixo já lido antes do restante do fluxo de texto"""
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        if self.prefix:
+            prefix, self.prefix = self.prefix, ''
+            return prefix + self.stream.read(max(size - len(prefix), 0) if size > 0 else -1)
+        return self.stream.read(size)
+
+def _iter_json_array(stream, chunk_size=_READ_CHUNK_SIZE):
+    """Decodifica os elementos de um array JSON sem carregar o arquivo inteiro"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n' + (',' if started else ''):
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Array JSON incompleto")
+            fill()
+            continue
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError("Esperado um array JSON")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        # Um valor que termina no fim do buffer pode ter sido cortado
+        if end >= len(buffer) and not eof:
+            fill()
+            continue
+        pos = end
+        yield value
+
+def iter_backup_records(filename, stats=None):
+    """
+    Lê os registros de um arquivo de backup um a um.
+
+    Aceita o formato legado (array JSON), JSON-lines e as versões comprimidas
+    com gzip (.gz), incluindo os snapshots base dos backups incrementais.
+
+    Args:
+        filename (str): Caminho do arquivo
+        stats (dict, optional): Recebe em "bytes_read" os bytes já lidos do arquivo
+
+    Yields:
+        dict: Um registro por vez
+    """
+    with open(filename, 'rb') as raw:
+        if stats is not None:
+            stats.setdefault("bytes_read", 0)
+            raw = _ByteCounter(raw, stats)
+        binary = io.BufferedReader(raw, _READ_CHUNK_SIZE)
+        if filename.endswith('.gz'):
+            binary = gzip.GzipFile(fileobj=binary)
+        stream = io.TextIOWrapper(binary, encoding='utf-8')
+
+        first = ''
+        while not first:
+            char = stream.read(1)
+            if not char:
+                return
+            if not char.isspace():
+                first = char
+
+        if first == '[':
+            yield from _iter_json_array(_PrefixedStream(first, stream))
+        else:
+            line = first + stream.readline()
+            while line:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+                line = stream.readline()
+
+_TRANSACTION_DEFAULTS = {
+    "user_id": 1,
+    "due_date": None,
+    "status": "pendente",
+    "recurring": False,
+    "priority": 2,
+    "quinzena": None,
+    "installments": 1,
+    "current_installment": 1,
+    "fixed_expense": False,
+    "categoria_tipo": "outros",
+    "fitid": None
+}
+_INTEGER_FIELDS = ["user_id", "priority", "quinzena", "installments", "current_installment"]
+_BOOLEAN_FIELDS = ["recurring", "fixed_expense"]
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 't', 'sim', 'yes')
+    return bool(value)
+
+def _as_date(value):
+    text = str(value).strip()[:10]
+    datetime.date.fromisoformat(text)  # levanta ValueError se inválida
+    return text
+
+def validate_transaction(record):
+    """
+    Valida um registro de backup contra o esquema da tabela transactions.
+
+    Campos desconhecidos são descartados e os opcionais ausentes recebem os
+    valores padrão da tabela.
+
+    Args:
+        record (dict): Registro lido do backup
+
+    Returns:
+        dict: Registro normalizado com todas as colunas de transactions
+
+    Raises:
+        ValueError: Se faltar um campo obrigatório ou algum valor for inválido
+    """
+    if not isinstance(record, dict):
+        raise ValueError("registro não é um objeto")
+
+    clean = {}
+    record_id = record.get('id')
+    clean['id'] = int(record_id) if record_id not in (None, '') else None
+
+    for field in ('description', 'category', 'type'):
+        value = record.get(field)
+        if value is None or not str(value).strip():
+            raise ValueError(f"campo obrigatório ausente: {field}")
+        clean[field] = str(value)
+
+    try:
+        amount = float(record.get('amount'))
+    except (TypeError, ValueError):
+        raise ValueError("amount inválido")
+    if not math.isfinite(amount):
+        raise ValueError("amount inválido")
+    clean['amount'] = amount
+
+    if record.get('date') in (None, ''):
+        raise ValueError("campo obrigatório ausente: date")
+    clean['date'] = _as_date(record['date'])
+
+    for field, default in _TRANSACTION_DEFAULTS.items():
+        value = record.get(field)
+        clean[field] = default if value is None or value == '' else value
+    if clean['due_date'] is not None:
+        clean['due_date'] = _as_date(clean['due_date'])
+    for field in _INTEGER_FIELDS:
+        if clean[field] is not None:
+            clean[field] = int(clean[field])
+    for field in _BOOLEAN_FIELDS:
+        clean[field] = _as_bool(clean[field])
+
+    created_at = record.get('created_at')
+    clean['created_at'] = (
+        str(created_at) if created_at
+        else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
+    return clean
+
+def _target_repo(target):
+    """Repositório de transações do destino da restauração"""
+    import repositories
+    if target == "supabase":
+        # Direto no Supabase, mesmo com a réplica local ligada
+        return repositories.SupabaseTransactionsRepo()
+    if target == "sqlite":
+        return repositories.SQLiteTransactionsRepo()
+    repos = repositories.get_repositories()
+    if repos.backend != target:
+        raise ValueError(f"Destino de restauração indisponível: {target}")
+    return repos.transactions
+
+def _write_batch(batch, target):
+    return _target_repo(target).upsert_many(batch)
+
+def _rebuild_aggregates(target):
+    """Recalcula monthly_aggregates do destino e invalida os caches de leitura"""
+    _target_repo(target).rebuild_aggregates()
+    from transactions_db import invalidate_transactions_cache
+    invalidate_transactions_cache()
+
+def restore_records(records, target=None, batch_size=DEFAULT_RESTORE_BATCH_SIZE,
+                    dry_run=False, rebuild_aggregates=True, progress_callback=None,
+                    _stats=None):
+    """
+    Valida, remove duplicatas e grava registros de transação em lotes.
+
+    Registros com o mesmo id de um já visto são ignorados (vale o primeiro);
+    registros com id substituem a transação de mesmo id no banco.
+
+    Args:
+        records (iterable): Registros de transação (ex.: iter_backup_records)
+        target (str, optional): "sqlite", "supabase" ou "memory"; padrão é o backend ativo
+        batch_size (int): Registros por transação do banco
+        dry_run (bool): Apenas lê e valida, sem gravar
+        rebuild_aggregates (bool): Recalcula monthly_aggregates ao final
+        progress_callback (callable, optional): Recebe o relatório parcial após cada lote
+
+    Returns:
+        dict: Relatório com registros lidos, gravados, inválidos, duplicados,
+            lotes, bytes lidos e segundos
+    """
+    if target is None:
+        from repositories import get_backend
+        target = get_backend()
+
+    report = {"target": target, "read": 0, "written": 0, "invalid": 0, "duplicates": 0,
+              "batches": 0, "bytes_read": None, "bytes_total": None,
+              "seconds": 0.0, "dry_run": dry_run}
+    seen_ids = set()
+    start = time.perf_counter()
+
+    def update_progress():
+        if _stats:
+            report["bytes_read"] = _stats.get("bytes_read")
+            report["bytes_total"] = _stats.get("bytes_total")
+        report["seconds"] = time.perf_counter() - start
+
+    def flush(batch):
+        if not dry_run:
+            _write_batch(batch, target)
+        report["written"] += len(batch)
+        report["batches"] += 1
+        update_progress()
+        logger.info("Restauração: %d registros gravados em %d lotes",
+                    report["written"], report["batches"])
+        if progress_callback:
+            progress_callback(dict(report))
+
+    batch = []
+    for record in records:
+        report["read"] += 1
+        try:
+            clean = validate_transaction(record)
+        except (ValueError, TypeError) as e:
+            report["invalid"] += 1
+            logger.debug("Registro %d inválido: %s", report["read"], e)
+            continue
+        if clean["id"] is not None:
+            if clean["id"] in seen_ids:
+                report["duplicates"] += 1
+                continue
+            seen_ids.add(clean["id"])
+        batch.append(clean)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if report["written"] and rebuild_aggregates and not dry_run:
+        _rebuild_aggregates(target)
+
+    update_progress()
+    logger.info("Restauração concluída: %d gravados, %d inválidos, %d duplicados (%.1fs)",
+                report["written"], report["invalid"], report["duplicates"], report["seconds"])
+    return report
+
+def restore_transactions(filename, target=None, batch_size=DEFAULT_RESTORE_BATCH_SIZE,
+                         dry_run=False, rebuild_aggregates=True, progress_callback=None):
+    """
+    Restaura transações de um arquivo de backup para o SQLite ou o Supabase.
+
+    O arquivo é lido em streaming (veja iter_backup_records), então backups
+    de centenas de MB não são carregados inteiros na memória.
+
+    Args:
+        filename (str): Arquivo de backup (.json, .jsonl ou .gz)
+        target (str, optional): "sqlite", "supabase" ou "memory"; padrão é o backend ativo
+        batch_size (int): Registros por transação do banco
+        dry_run (bool): Apenas lê e valida, sem gravar
+        rebuild_aggregates (bool): Recalcula monthly_aggregates ao final
+        progress_callback (callable, optional): Recebe o relatório parcial após cada lote
+
+    Returns:
+        dict | None: Relatório da restauração (veja restore_records) ou None em caso de erro
     """
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            transactions = json.load(f)
-        return transactions
+        stats = {"bytes_read": 0, "bytes_total": os.path.getsize(filename)}
+        return restore_records(
+            iter_backup_records(filename, stats), target=target, batch_size=batch_size,
+            dry_run=dry_run, rebuild_aggregates=rebuild_aggregates,
+            progress_callback=progress_callback, _stats=stats
+        )
     except Exception as e:
         st.error(f"Erro ao restaurar backup: {e}")
         return None
 
-def list_backups():
+def restore_point_in_time(timestamp=None, backup_dir=INCREMENTAL_DIR, target=None,
+                          dry_run=False, rebuild_aggregates=True, **kwargs):
     """
-    Lista todos os arquivos de backup disponíveis
-    
-    Esta é uma versão simplificada que mantém compatibilidade com o código existente.
+    Restaura as transações no estado de um ponto no tempo dos backups incrementais.
+
+    As transações do estado reconstruído são gravadas (substituindo as de
+    mesmo id) e as que existem no destino mas não existiam no instante pedido
+    são removidas, de modo que a tabela fica exatamente como naquele momento.
+
+    Args:
+        timestamp (datetime | str, optional): Instante desejado; padrão é o último backup
+        backup_dir (str): Diretório dos backups incrementais
+        target (str, optional): "sqlite", "supabase" ou "memory"; padrão é o backend ativo
+        dry_run (bool): Apenas calcula o relatório, sem gravar nem remover
+        rebuild_aggregates (bool): Recalcula monthly_aggregates ao final
+        **kwargs: Repassados para restore_records (batch_size, progress_callback)
+
+    Returns:
+        dict: Relatório da restauração (veja restore_records) com "deleted",
+            a quantidade de transações removidas (ou a remover, em dry_run)
+
+    Raises:
+        ValueError: Se nenhum snapshot base cobre o instante pedido (nada é alterado)
+    """
+    # Sem snapshot base não há estado conhecido: a tabela não pode ser tratada como vazia
+    if _chain_at(_as_iso(timestamp), backup_dir) is None:
+        raise ValueError(f"Nenhum backup incremental cobre o instante {_as_iso(timestamp) or 'atual'} "
+                         f"em {backup_dir}")
+
+    if target is None:
+        from repositories import get_backend
+        target = get_backend()
+
+    state = reconstruct_state(timestamp, backup_dir)
+    report = restore_records(state, target=target, dry_run=dry_run,
+                             rebuild_aggregates=False, **kwargs)
+
+    # Ids comparados como texto: os backups podem trazer ids numéricos como string
+    kept = {str(record.get('id')) for record in state if record.get('id') is not None}
+    repo = _target_repo(target)
+    extra = [t['id'] for t in repo.iter() if str(t.get('id')) not in kept]
+    report["deleted"] = len(extra)
+    if extra and not dry_run:
+        repo.delete_many(extra)
+        logger.info("Restauração no tempo: %d transações posteriores removidas", len(extra))
+
+    if (report["written"] or extra) and rebuild_aggregates and not dry_run:
+        _rebuild_aggregates(target)
+    return report
+
+# ---------------------------------------------------------------------------
+# Índice, deduplicação e retenção
+#
+# backup/index.json registra cada ponto de restauração completo (data, arquivo,
+# hash do conteúdo, registros e tamanho). Vários pontos podem apontar para o
+# mesmo arquivo quando o conteúdo é idêntico. A retenção segue o esquema
+# avô-pai-filho (GFS): mantém os últimos N backups e o mais recente de cada
+# dia, semana e mês dentro dos limites da política; um arquivo só é apagado
+# quando nenhum ponto mantido aponta para ele.
+# ---------------------------------------------------------------------------
+
+INDEX_FILE = 'index.json'
+DEFAULT_RETENTION = {"last": 5, "daily": 7, "weekly": 4, "monthly": 12}
+_LEGACY_PREFIX = 'transactions_backup_'
+
+def _content_hash(records):
+    """Hash SHA-256 do conteúdo dos registros, na ordem em que aparecem"""
+    digest = hashlib.sha256()
+    for record in records:
+        digest.update(json.dumps(record, sort_keys=True, ensure_ascii=False,
+                                 default=str).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def _created_at_from_name(name):
+    """Data de criação pelo nome transactions_backup_YYYYmmdd_HHMMSS[...].json"""
+    stamp = name[len(_LEGACY_PREFIX):].split('.')[0][:15]
+    try:
+        return datetime.datetime.strptime(stamp, "%Y%m%d_%H%M%S").isoformat()
+    except ValueError:
+        return None
+
+def rebuild_backup_index(backup_dir=BACKUP_DIR):
+    """
+    Recria o índice lendo os arquivos de backup completos do diretório.
+
+    Args:
+        backup_dir (str): Diretório dos backups
+
+    Returns:
+        dict: Índice recriado ({"snapshots": [...]}, do mais antigo ao mais recente)
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    snapshots = []
+    for name in sorted(os.listdir(backup_dir)):
+        if not (name.startswith(_LEGACY_PREFIX) and name.endswith('.json')):
+            continue
+        path = os.path.join(backup_dir, name)
+        records = 0
+
+        def counted():
+            nonlocal records
+            for record in iter_backup_records(path):
+                records += 1
+                yield record
+
+        try:
+            content_hash = _content_hash(counted())
+        except (ValueError, OSError) as e:
+            logger.warning("Backup ilegível ignorado no índice: %s (%s)", name, e)
+            continue
+        snapshots.append({
+            "created_at": _created_at_from_name(name)
+                or datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+            "file": name,
+            "sha256": content_hash,
+            "records": records,
+            "size": os.path.getsize(path)
+        })
+    snapshots.sort(key=lambda entry: entry["created_at"])
+    index = {"snapshots": snapshots}
+    _save_backup_index(index, backup_dir)
+    return index
+
+def load_backup_index(backup_dir=BACKUP_DIR):
+    """
+    Carrega o índice dos backups completos, criando-o se ainda não existir.
+
+    Returns:
+        dict: {"snapshots": [{"created_at", "file", "sha256", "records", "size"}, ...]}
+    """
+    path = os.path.join(backup_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return rebuild_backup_index(backup_dir)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_backup_index(index, backup_dir=BACKUP_DIR):
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, INDEX_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def list_snapshots(backup_dir=BACKUP_DIR):
+    """
+    Lista os pontos de restauração completos a partir do índice.
+
+    Returns:
+        list: Entradas do índice, da mais recente para a mais antiga
+    """
+    snapshots = load_backup_index(backup_dir)["snapshots"]
+    return sorted(snapshots, key=lambda entry: entry["created_at"], reverse=True)
+
+def _remove_unreferenced(files, kept_entries, backup_dir, dry_run):
+    """Apaga os arquivos que não são mais referenciados por nenhuma entrada mantida"""
+    referenced = {entry["file"] for entry in kept_entries}
+    removed = sorted(name for name in set(files) - referenced
+                     if os.path.exists(os.path.join(backup_dir, name)))
+    if not dry_run:
+        for name in removed:
+            os.remove(os.path.join(backup_dir, name))
+    return removed
+
+def dedup_backups(backup_dir=BACKUP_DIR, dry_run=False):
     """
-    os.makedirs('backup', exist_ok=True)
-    backup_dir = 'backup'
-    backup_files = [f for f in os.listdir(backup_dir) if f.startswith('transactions_backup_') and f.endswith('.json')]
-    backup_files.sort(reverse=True)  # Ordenar do mais recente para o mais antigo
-    return backup_files
+    Mantém uma única cópia de cada conteúdo de backup.
+
+    Entradas com o mesmo hash passam a apontar para o arquivo mais antigo
+    com esse conteúdo e as cópias redundantes são apagadas; todos os pontos
+    de restauração continuam no índice.
+
+    Args:
+        backup_dir (str): Diretório dos backups
+        dry_run (bool): Apenas informa o que seria apagado
+
+    Returns:
+        dict: {"removed": arquivos apagados, "bytes_freed": bytes liberados}
+    """
+    index = load_backup_index(backup_dir)
+    snapshots = sorted(index["snapshots"], key=lambda entry: entry["created_at"])
+    canonical = {}
+    previous_files = [entry["file"] for entry in snapshots]
+    for entry in snapshots:
+        entry["file"] = canonical.setdefault(entry["sha256"], entry["file"])
+
+    sizes = {name: os.path.getsize(os.path.join(backup_dir, name))
+             for name in previous_files if os.path.exists(os.path.join(backup_dir, name))}
+    removed = _remove_unreferenced(previous_files, snapshots, backup_dir, dry_run)
+    if not dry_run:
+        index["snapshots"] = snapshots
+        _save_backup_index(index, backup_dir)
+    return {"removed": removed, "bytes_freed": sum(sizes.get(name, 0) for name in removed)}
+
+def select_retained(created_at_list, policy=None):
+    """
+    Escolhe os pontos mantidos pela política avô-pai-filho.
+
+    Percorre do mais recente para o mais antigo mantendo os primeiros
+    policy["last"] pontos e o ponto mais recente de cada um dos últimos
+    policy["daily"] dias, policy["weekly"] semanas ISO e policy["monthly"]
+    meses que têm backups.
+
+    Args:
+        created_at_list (list): Datas ISO 8601 dos pontos
+        policy (dict, optional): Quantidades "last", "daily", "weekly", "monthly"
+
+    Returns:
+        set: Posições (em created_at_list) dos pontos mantidos
+    """
+    policy = {**DEFAULT_RETENTION, **(policy or {})}
+    buckets = {
+        "daily": lambda moment: moment.date(),
+        "weekly": lambda moment: moment.isocalendar()[:2],
+        "monthly": lambda moment: (moment.year, moment.month)
+    }
+    seen = {name: set() for name in buckets}
+    kept = set()
+    order = sorted(range(len(created_at_list)), key=lambda i: created_at_list[i], reverse=True)
+    for rank, i in enumerate(order):
+        moment = datetime.datetime.fromisoformat(created_at_list[i])
+        if rank < policy["last"]:
+            kept.add(i)
+        for name, bucket_of in buckets.items():
+            bucket = bucket_of(moment)
+            if bucket not in seen[name] and len(seen[name]) < policy[name]:
+                seen[name].add(bucket)
+                kept.add(i)
+    return kept
+
+def apply_retention(policy=None, backup_dir=BACKUP_DIR,
+                    incremental_dir=INCREMENTAL_DIR, dry_run=False):
+    """
+    Aplica a política de retenção aos backups completos e incrementais.
+
+    Backups incrementais são tratados por cadeia inteira (base + deltas),
+    datada pelo seu último ponto, pois um delta não é restaurável sem o
+    snapshot base e os deltas anteriores. A cadeia em uso nunca é apagada.
+
+    Args:
+        policy (dict, optional): Veja DEFAULT_RETENTION
+        backup_dir (str): Diretório dos backups completos
+        incremental_dir (str): Diretório dos backups incrementais
+        dry_run (bool): Apenas informa o que seria apagado
+
+    Returns:
+        dict: {"kept": pontos mantidos, "pruned": pontos descartados,
+               "removed": arquivos apagados}
+    """
+    index = load_backup_index(backup_dir)
+    snapshots = index["snapshots"]
+    kept_positions = select_retained([entry["created_at"] for entry in snapshots], policy)
+    kept = [entry for i, entry in enumerate(snapshots) if i in kept_positions]
+    removed = _remove_unreferenced([entry["file"] for entry in snapshots], kept,
+                                   backup_dir, dry_run)
+    report = {"kept": len(kept), "pruned": len(snapshots) - len(kept), "removed": removed}
+    if not dry_run:
+        index["snapshots"] = kept
+        _save_backup_index(index, backup_dir)
+
+    manifest = load_manifest(incremental_dir)
+    chains = manifest["chains"]
+    last_points = [
+        (chain["deltas"][-1] if chain["deltas"] else chain["base"])["created_at"]
+        for chain in chains
+    ]
+    kept_chains = select_retained(last_points, policy) | {len(chains) - 1} if chains else set()
+    for i, chain in enumerate(chains):
+        points = 1 + len(chain["deltas"])
+        if i in kept_chains:
+            report["kept"] += points
+            continue
+        report["pruned"] += points
+        for item in [chain["base"], *chain["deltas"]]:
+            path = os.path.join(incremental_dir, item["file"])
+            report["removed"].append(os.path.relpath(path, backup_dir))
+            if not dry_run and os.path.exists(path):
+                os.remove(path)
+    if not dry_run and len(kept_chains) < len(chains):
+        manifest["chains"] = [chain for i, chain in enumerate(chains) if i in kept_chains]
+        _save_manifest(manifest, incremental_dir)
+    return report
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manutenção dos backups de transações")
+    parser.add_argument("--list", action="store_true", help="Lista os pontos de restauração")
+    parser.add_argument("--dedup", action="store_true", help="Remove cópias idênticas")
+    parser.add_argument("--prune", action="store_true", help="Aplica a política de retenção")
+    parser.add_argument("--rebuild-index", action="store_true", help="Recria backup/index.json")
+    parser.add_argument("--dry-run", action="store_true", help="Não apaga nada")
+    for name, default in DEFAULT_RETENTION.items():
+        parser.add_argument(f"--keep-{name}", type=int, default=default)
+    args = parser.parse_args()
+
+    if args.rebuild_index:
+        print(f"Índice recriado: {len(rebuild_backup_index()['snapshots'])} backups")
+    if args.dedup:
+        result = dedup_backups(dry_run=args.dry_run)
+        print(f"Cópias removidas: {len(result['removed'])} ({result['bytes_freed']} bytes)")
+    if args.prune:
+        policy = {name: getattr(args, f"keep_{name}") for name in DEFAULT_RETENTION}
+        result = apply_retention(policy, dry_run=args.dry_run)
+        print(f"Mantidos: {result['kept']}, descartados: {result['pruned']}, "
+              f"arquivos apagados: {len(result['removed'])}")
+    if args.list or not (args.rebuild_index or args.dedup or args.prune):
+        for entry in list_snapshots():
+            print(f"{entry['created_at']}  {entry['file']}  {entry['records']} registros  "
+                  f"{entry['sha256'][:12]}")
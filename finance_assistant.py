@@ -2,40 +2,41 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import json
-from openai import OpenAI
 from transactions_db import view_transactions
 from categories import get_categories
 from theme_manager import init_theme_manager, theme_config_section, get_theme_colors
-from supabase_db import init_supabase
+from app_logging import get_logger
 
-# Configuração da API OpenAI usando st.secrets
-OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+logger = get_logger(__name__)
+
+def get_openai_api_key():
+    """Lê a chave da API OpenAI de st.secrets (None se não configurada)"""
+    try:
+        return st.secrets["OPENAI_API_KEY"]
+    except Exception:
+        return None
 
 class FinanceAssistant:
     """Assistente de finanças usando a API OpenAI para fornecer dicas personalizadas."""
     
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, api_key=None):
+        api_key = api_key or get_openai_api_key()
+        if not api_key:
+            raise ValueError("A chave OPENAI_API_KEY não está configurada em st.secrets.")
+        # Importado aqui para não carregar o SDK da OpenAI no início da aplicação
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key)
         
     def get_financial_summary(self):
         """Obtém um resumo dos dados financeiros do usuário."""
         try:
-            # Obter transações diretamente do Supabase
-            supabase = init_supabase()
-            if not supabase:
-                return {"status": "error", "message": "Erro ao conectar ao banco de dados."}
-                
-            print("Buscando transações para o assistente financeiro...")
-            response = supabase.table("transactions").select("*").limit(100).execute()
-            transactions = response.data
-            print(f"Total de transações encontradas: {len(transactions)}")
+            # Obter transações do snapshot compartilhado
+            transactions = view_transactions()
+            logger.debug("Assistente financeiro com %d transações", len(transactions))
             
             if not transactions:
                 return {"status": "empty", "message": "Nenhuma transação encontrada."}
             
-            # Exibir IDs das transações para debug
-            print(f"IDs das transações: {[t.get('id') for t in transactions]}")
-            
             # Converter transações para DataFrame
             df = pd.DataFrame(transactions)
             
@@ -204,13 +205,11 @@ class FinanceAssistant:
                 "dias_ate_proximo_pagamento": dias_ate_proximo_recebimento
             }
             
-            print(f"Resumo financeiro calculado: {json.dumps(summary, default=str)}")
+            logger.debug("Resumo financeiro calculado: %s", summary)
             return summary
             
         except Exception as e:
-            import traceback
-            print(f"Erro ao obter resumo financeiro: {e}")
-            print(traceback.format_exc())
+            logger.exception("Erro ao obter resumo financeiro")
             return {"status": "error", "message": f"Erro ao processar dados: {str(e)}"}
     
     def get_advice(self, query_type=None):
@@ -542,7 +541,11 @@ def show_finance_assistant():
     # Mostrar configuração de tema
     theme_config_section()
     
-    assistant = FinanceAssistant()
+    try:
+        assistant = FinanceAssistant()
+    except Exception as e:
+        st.error(f"Assistente indisponível: {e}")
+        return
     
     st.write("""
     Este assistente usa inteligência artificial para analisar seus dados financeiros e fornecer conselhos personalizados 
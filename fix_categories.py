@@ -13,10 +13,18 @@ def main():
         print("Erro: Não foi possível conectar ao Supabase")
         return
     
+    # Mostrar o diff antes de gravar
+    report = recategorize_transactions(dry_run=True)
+    print(f"{report['changed']} de {report['total']} transações precisam de novo tipo de categoria")
+    for tipo, target in report["by_target"].items():
+        print(f"  -> {tipo}: {target['count']} transações ({', '.join(target['categories'])})")
+    if not report["changed"]:
+        return
+    
     # Recategorizar todas as transações
     print("Atualizando categorias das transações...")
-    recategorize_transactions()
-    print("Processo de atualização concluído!")
+    report = recategorize_transactions()
+    print(f"Processo de atualização concluído! ({report['updates']} escritas em lote)")
 
 if __name__ == "__main__":
     main()
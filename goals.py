@@ -9,7 +9,9 @@ from goals_db import (
     init_goals_table, add_goal, update_goal, 
     delete_goal, view_goals, get_goal, update_goal_amount
 )
+from profiler import profiled
 
+@profiled(page=True)
 def show_goals():
     """Mostra a página de metas financeiras."""
     st.title(" Metas Financeiras")
@@ -38,6 +40,7 @@ def show_goals():
         with tab2:
             show_goal_form()
 
+@profiled()
 def show_goals_list():
     """Mostra a lista de metas cadastradas."""
     goals = view_goals()
@@ -95,6 +98,7 @@ def show_goals_list():
                     else:
                         st.error("Erro ao excluir meta.")
 
+@profiled()
 def show_goal_amount_form():
     """Mostra o formulário para atualizar o valor atual de uma meta."""
     if not st.session_state.updating_goal_amount:
@@ -150,6 +154,7 @@ def show_goal_amount_form():
             st.session_state.updating_goal_amount = None
             st.rerun()
 
+@profiled()
 def show_goal_form():
     """Mostra o formulário para adicionar/editar uma meta."""
     # Determinar se estamos editando ou criando
@@ -1,16 +1,36 @@
 """
 Módulo responsável pelas operações de banco de dados das metas financeiras.
 """
+import threading
 from datetime import datetime
 from typing import Dict, List, Optional
 import streamlit as st
-from supabase_db import init_supabase
+import repositories
+from profiler import profiled
+
+# Versão das metas, incrementada a cada escrita (como a versão das transações
+# em transactions_db); usada para invalidar cálculos que guardam as metas.
+_goals_version = 0
+_goals_version_lock = threading.Lock()
+
+def get_goals_version() -> int:
+    """Retorna a versão atual das metas (incrementada a cada escrita)."""
+    return _goals_version
+
+def mark_goals_changed():
+    """Incrementa a versão das metas."""
+    global _goals_version
+    with _goals_version_lock:
+        _goals_version += 1
 
 def init_goals_table():
     """Inicializa a tabela de metas no banco de dados."""
-    # A tabela já é inicializada no Supabase
+    # A tabela é criada por supabase_schema.sql no Supabase e pelas migrações de db.py no SQLite
     pass
 
+def _goals_repo():
+    return repositories.get_repositories().goals
+
 def add_goal(goal_data: Dict) -> int:
     """Adiciona uma nova meta ao banco de dados."""
     try:
@@ -18,12 +38,6 @@ def add_goal(goal_data: Dict) -> int:
         if not all(key in goal_data for key in ['title', 'target_amount']):
             raise ValueError("Título e valor alvo são obrigatórios")
         
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            st.error("Erro ao conectar ao banco de dados.")
-            return None
-        
         # Preparar dados para inserção
         goal_data_to_insert = {
             "title": goal_data['title'],
@@ -37,11 +51,11 @@ def add_goal(goal_data: Dict) -> int:
             "updated_at": datetime.now().isoformat()
         }
         
-        # Inserir no Supabase
-        response = supabase.table("goals").insert(goal_data_to_insert).execute()
+        rows = _goals_repo().add(goal_data_to_insert)
+        mark_goals_changed()
         
-        if response.data and len(response.data) > 0:
-            return response.data[0]['id']
+        if rows:
+            return rows[0]['id']
         return None
         
     except Exception as e:
@@ -52,12 +66,6 @@ def add_goal(goal_data: Dict) -> int:
 def update_goal(goal_id: int, goal_data: Dict) -> bool:
     """Atualiza uma meta existente."""
     try:
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            st.error("Erro ao conectar ao banco de dados.")
-            return False
-        
         # Preparar dados para atualização
         goal_data_to_update = {}
         
@@ -87,10 +95,9 @@ def update_goal(goal_id: int, goal_data: Dict) -> bool:
         if not goal_data_to_update:
             return False
         
-        # Atualizar no Supabase
-        response = supabase.table("goals").update(goal_data_to_update).eq("id", goal_id).execute()
-        
-        return response.data is not None and len(response.data) > 0
+        updated = _goals_repo().update(goal_id, goal_data_to_update)
+        mark_goals_changed()
+        return len(updated) > 0
         
     except Exception as e:
         print(f"Erro ao atualizar meta: {str(e)}")
@@ -100,35 +107,21 @@ def update_goal(goal_id: int, goal_data: Dict) -> bool:
 def delete_goal(goal_id: int) -> bool:
     """Exclui uma meta do banco de dados."""
     try:
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            st.error("Erro ao conectar ao banco de dados.")
-            return False
-        
-        # Excluir do Supabase
-        response = supabase.table("goals").delete().eq("id", goal_id).execute()
-        
-        return response.data is not None
+        _goals_repo().delete(goal_id)
+        mark_goals_changed()
+        return True
         
     except Exception as e:
         print(f"Erro ao excluir meta: {str(e)}")
         st.error(f"Erro ao excluir meta: {str(e)}")
         return False
 
+@profiled()
 def view_goals() -> List[Dict]:
     """Retorna todas as metas cadastradas."""
     try:
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            st.error("Erro ao conectar ao banco de dados.")
-            return []
-        
-        # Buscar todas as metas
-        response = supabase.table("goals").select("*").order("created_at", desc=True).execute()
-        
-        goals = response.data
+        # Buscar todas as metas (mais recentes primeiro)
+        goals = _goals_repo().list()
         
         # Converter valores numéricos para float
         for goal in goals:
@@ -142,20 +135,14 @@ def view_goals() -> List[Dict]:
         st.error(f"Erro ao buscar metas: {str(e)}")
         return []
 
+@profiled()
 def get_goal(goal_id: int) -> Optional[Dict]:
     """Retorna uma meta específica pelo ID."""
     try:
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            st.error("Erro ao conectar ao banco de dados.")
-            return None
-        
         # Buscar meta pelo ID
-        response = supabase.table("goals").select("*").eq("id", goal_id).execute()
+        goal = _goals_repo().get(goal_id)
         
-        if response.data and len(response.data) > 0:
-            goal = response.data[0]
+        if goal:
             goal['target_amount'] = float(goal['target_amount'])
             goal['current_amount'] = float(goal['current_amount'])
             return goal
@@ -170,12 +157,6 @@ def get_goal(goal_id: int) -> Optional[Dict]:
 def update_goal_amount(goal_id: int, new_amount: float) -> bool:
     """Atualiza apenas o valor atual de uma meta."""
     try:
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            st.error("Erro ao conectar ao banco de dados.")
-            return False
-        
         # Buscar meta atual para verificar se o novo valor não excede o alvo
         goal = get_goal(goal_id)
         if not goal:
@@ -195,10 +176,9 @@ def update_goal_amount(goal_id: int, new_amount: float) -> bool:
         if new_amount >= goal['target_amount']:
             update_data['status'] = 'Concluída'
         
-        # Atualizar no Supabase
-        response = supabase.table("goals").update(update_data).eq("id", goal_id).execute()
-        
-        return response.data is not None and len(response.data) > 0
+        updated = _goals_repo().update(goal_id, update_data)
+        mark_goals_changed()
+        return len(updated) > 0
         
     except Exception as e:
         print(f"Erro ao atualizar valor da meta: {str(e)}")
@@ -0,0 +1,549 @@
+"""
+Módulo responsável pela réplica local (SQLite) dos dados do Supabase.
+
+Com a réplica ligada (veja db.use_local_replica) as transações e categorias
+são lidas do financas.db local e as escritas de transações passam por uma
+fila durável (tabela sync_outbox):
+
+* pull: busca no Supabase apenas as linhas com id acima da marca d'água de
+  cada tabela (sync_state). A cada FULL_SYNC_INTERVAL_SECONDS uma leitura
+  completa reconcilia alterações e exclusões feitas por outros clientes.
+* escrita: a linha é gravada no SQLite e a operação entra na fila na mesma
+  transação; a escrita retorna logo em seguida e a fila é enviada por uma
+  thread de fundo, sem a rede no caminho da escrita. Se o Supabase estiver
+  fora do ar a operação continua na fila e é reenviada na próxima
+  sincronização. Inserções recebem um id local negativo, trocado pelo id
+  definitivo quando a fila é enviada (o id local continua aceito por
+  get/update/delete neste processo).
+
+O envio é "pelo menos uma vez": se o processo cair entre a escrita no
+Supabase e a remoção da operação da fila, a operação é repetida. Inserções
+levam uma chave gerada no cliente (coluna client_id), então o reenvio não
+duplica a transação.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+import aggregations
+import db
+import supabase_db
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Tabelas espelhadas. Metas ficam de fora: o esquema do Supabase (title,
+# status, updated_at) difere da tabela goals local. As configurações já são
+# locais (settings.py).
+REPLICA_TABLES = ["categories", "transactions"]
+SYNC_INTERVAL_SECONDS = 30
+FULL_SYNC_INTERVAL_SECONDS = 600
+PULL_PAGE_SIZE = 1000
+
+# _sync_lock serializa sync/envio da fila (pode esperar pela rede);
+# _local_lock protege só as escritas no SQLite local e nunca é mantido
+# durante uma requisição ao Supabase.
+_sync_lock = threading.RLock()
+_local_lock = threading.RLock()
+_last_sync = 0.0
+_last_full_sync = 0.0
+_ready_tables = set()
+_sync_thread = None
+_flush_thread = None
+_flush_requested = False
+_flush_thread_lock = threading.Lock()
+# id local (negativo) -> id definitivo, para quem ainda guarda o id local
+_id_aliases = {}
+
+@contextmanager
+def _connect():
+    """Conexão do pool do SQLite (db.sqlite_connection) com linhas como sqlite3.Row"""
+    with db.sqlite_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        yield conn
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _upsert_rows(conn, table, rows):
+    """Grava linhas vindas do Supabase, apenas nas colunas que existem localmente"""
+    if not rows:
+        return
+    local = set(_table_columns(conn, table))
+    columns = [c for c in rows[0] if c in local]
+    sql = (f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join('?' for _ in columns)})")
+    conn.executemany(sql, [[row.get(c) for c in columns] for row in rows])
+
+def _rows_by_ids(conn, table, ids):
+    ids = list(ids)
+    rows = []
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows.extend(dict(row) for row in conn.execute(
+            f"SELECT * FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})", chunk))
+    return rows
+
+def _pending_row_ids(conn, table):
+    """IDs com escritas locais ainda não enviadas (não são sobrescritos pelo pull)"""
+    return {row[0] for row in conn.execute(
+        "SELECT row_id FROM sync_outbox WHERE table_name = ? AND row_id IS NOT NULL", (table,))}
+
+def is_ready(table):
+    """
+    Indica se a tabela já foi copiada pelo menos uma vez para a réplica.
+
+    Args:
+        table (str): Nome da tabela
+
+    Returns:
+        bool: True se as leituras locais já refletem o Supabase
+    """
+    if table in _ready_tables:
+        return True
+    try:
+        with _connect() as conn:
+            row = conn.execute("SELECT 1 FROM sync_state WHERE table_name = ?", (table,)).fetchone()
+    except sqlite3.Error:
+        return False
+    if row is not None:
+        _ready_tables.add(table)
+    return row is not None
+
+# ---------------------------------------------------------------------
+# Pull (Supabase -> SQLite)
+# ---------------------------------------------------------------------
+
+def pull_table(table, full=False):
+    """
+    Copia para o SQLite as linhas novas (ou todas, se full=True) de uma tabela.
+
+    Cada página é gravada junto com a nova marca d'água em uma única
+    transação, então uma interrupção retoma de onde parou. Linhas com
+    escritas locais pendentes não são sobrescritas.
+
+    Args:
+        table (str): Nome da tabela
+        full (bool): Relê a tabela inteira e remove as linhas apagadas no Supabase
+
+    Returns:
+        int: Quantidade de linhas copiadas
+    """
+    with _connect() as conn:
+        state = conn.execute("SELECT last_id FROM sync_state WHERE table_name = ?",
+                             (table,)).fetchone()
+        after_id = 0 if full or state is None else state["last_id"]
+        seen = set()
+        pulled = 0
+
+        for page in supabase_db.iter_table_pages(table, after_id, PULL_PAGE_SIZE):
+            seen.update(row["id"] for row in page)
+            last = page[-1]
+            # Lidas sob _local_lock: uma escrita local feita durante o pull não é sobrescrita
+            with _local_lock, conn:
+                pending = _pending_row_ids(conn, table)
+                rows = [row for row in page if row["id"] not in pending]
+                old = []
+                if table == "transactions" and not full:
+                    old = _rows_by_ids(conn, table, [row["id"] for row in rows])
+                _upsert_rows(conn, table, rows)
+                conn.execute('''INSERT INTO sync_state (table_name, last_id, last_created_at, synced_at)
+                                VALUES (?, ?, ?, ?)
+                                ON CONFLICT(table_name) DO UPDATE SET
+                                    last_id = MAX(last_id, excluded.last_id),
+                                    last_created_at = excluded.last_created_at,
+                                    synced_at = excluded.synced_at''',
+                             (table, last["id"], last.get("created_at"), datetime.now().isoformat()))
+            if table == "transactions" and not full:
+                db.apply_monthly_aggregate_deltas(aggregations.net_aggregate_deltas(old, rows))
+            pulled += len(rows)
+
+        with _local_lock, conn:
+            now = datetime.now().isoformat()
+            pending = _pending_row_ids(conn, table)
+            conn.execute('''INSERT INTO sync_state (table_name, last_id, synced_at)
+                            VALUES (?, 0, ?)
+                            ON CONFLICT(table_name) DO UPDATE SET synced_at = excluded.synced_at''',
+                         (table, now))
+            if full:
+                # Linhas que sumiram do Supabase (ids locais negativos ainda não foram enviados)
+                local_ids = {row[0] for row in conn.execute(f"SELECT id FROM {table} WHERE id > 0")}
+                removed = list(local_ids - seen - pending)
+                for start in range(0, len(removed), 500):
+                    chunk = removed[start:start + 500]
+                    conn.execute(f"DELETE FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})",
+                                 chunk)
+                conn.execute("UPDATE sync_state SET full_synced_at = ? WHERE table_name = ?",
+                             (now, table))
+
+    if table == "transactions" and full:
+        db.rebuild_monthly_aggregates()
+    return pulled
+
+# ---------------------------------------------------------------------
+# Fila de escritas (SQLite -> Supabase)
+# ---------------------------------------------------------------------
+
+def _enqueue(conn, table, op, row_id, payload):
+    conn.execute("INSERT INTO sync_outbox (table_name, op, row_id, payload) VALUES (?, ?, ?, ?)",
+                 (table, op, row_id, json.dumps(payload, default=str)))
+
+def _apply_remote_aggregates(old_rows, new_rows):
+    """Atualiza monthly_aggregates do Supabase; falhas não desfazem a escrita"""
+    try:
+        supabase_db.apply_monthly_aggregate_deltas(
+            aggregations.net_aggregate_deltas(old_rows, new_rows))
+    except Exception as e:
+        logger.warning("Não foi possível atualizar agregados no Supabase: %s", e)
+        # Os outros clientes deixam de usar a tabela até a próxima reconstrução
+        try:
+            supabase_db.set_aggregates_status("stale")
+        except Exception as e:
+            logger.warning("Não foi possível marcar os agregados do Supabase como desatualizados: %s", e)
+
+def _push(entry):
+    """
+    Envia uma operação da fila ao Supabase.
+
+    Returns:
+        int | None: id definitivo, para inserções
+    """
+    payload = json.loads(entry["payload"])
+    op = entry["op"]
+    if op == "insert":
+        # Operações enfileiradas antes da coluna client_id recebem uma chave agora
+        client_id = payload.pop("client_id", None) or str(uuid.uuid4())
+        row, created = supabase_db.insert_transaction_once(payload, client_id)
+        if created:
+            _apply_remote_aggregates([], [row])
+        return row["id"]
+    if op == "update":
+        old = supabase_db.get_transaction(entry["row_id"])
+        updated = supabase_db.update_transaction(entry["row_id"], payload)
+        if updated is False:
+            raise ConnectionError("Supabase indisponível")
+        _apply_remote_aggregates([old] if old else [], updated or [])
+    elif op == "delete":
+        deleted = supabase_db.delete_transaction(entry["row_id"])
+        if deleted is False:
+            raise ConnectionError("Supabase indisponível")
+        _apply_remote_aggregates(deleted or [], [])
+    elif op == "bulk_update":
+        # O estado anterior lido no Supabase inclui alterações feitas por outros clientes
+        previous, updated = supabase_db.bulk_update_transactions(payload["data"], ids=payload["ids"])
+        _apply_remote_aggregates(previous, updated)
+    else:
+        raise ValueError(f"Operação desconhecida na fila: {op}")
+    return None
+
+def flush_outbox():
+    """
+    Envia ao Supabase as escritas pendentes, na ordem em que foram feitas.
+
+    Para na primeira falha (a ordem das operações é preservada); a operação
+    que falhou registra a tentativa e o erro e é reenviada na próxima chamada.
+    Operações enfileiradas durante o envio também são enviadas.
+
+    Returns:
+        dict: {"pushed": enviadas, "pending": ainda na fila, "id_map": {id local: id definitivo},
+            "error": mensagem da falha ou None}
+    """
+    id_map = {}
+    pushed = 0
+    error = None
+    with _sync_lock:
+        with _connect() as conn:
+            last_id = 0
+            while error is None:
+                entries = conn.execute("SELECT * FROM sync_outbox WHERE id > ? ORDER BY id",
+                                       (last_id,)).fetchall()
+                if not entries:
+                    break
+                for entry in entries:
+                    last_id = entry["id"]
+                    # A linha pode ter recebido o id definitivo neste mesmo lote
+                    entry = dict(entry, row_id=id_map.get(entry["row_id"], entry["row_id"]))
+                    try:
+                        real_id = _push(entry)
+                    except Exception as e:
+                        error = str(e)
+                        with _local_lock, conn:
+                            conn.execute('''UPDATE sync_outbox SET attempts = attempts + 1, last_error = ?
+                                            WHERE id = ?''', (error, entry["id"]))
+                        logger.warning("Envio da fila interrompido (%s #%d): %s",
+                                       entry["op"], entry["id"], e)
+                        break
+                    with _local_lock, conn:
+                        if entry["op"] == "insert" and real_id is not None:
+                            temp_id = entry["row_id"]
+                            if _still_queued(conn, entry["id"]):
+                                conn.execute("DELETE FROM transactions WHERE id = ?", (real_id,))
+                                conn.execute("UPDATE transactions SET id = ? WHERE id = ?", (real_id, temp_id))
+                                # Operações seguintes sobre a mesma linha passam a usar o id definitivo
+                                conn.execute('''UPDATE sync_outbox SET row_id = ?
+                                                WHERE table_name = ? AND row_id = ?''',
+                                             (real_id, entry["table_name"], temp_id))
+                            else:
+                                # Removida localmente enquanto era enviada: remove também no Supabase
+                                _enqueue(conn, entry["table_name"], "delete", real_id, {})
+                            id_map[temp_id] = real_id
+                            _id_aliases[temp_id] = real_id
+                        conn.execute("DELETE FROM sync_outbox WHERE id = ?", (entry["id"],))
+                    pushed += 1
+            pending = conn.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]
+    if pushed:
+        logger.info("Fila enviada: %d operações (%d pendentes)", pushed, pending)
+    return {"pushed": pushed, "pending": pending, "id_map": id_map, "error": error}
+
+def _still_queued(conn, entry_id):
+    return conn.execute("SELECT 1 FROM sync_outbox WHERE id = ?", (entry_id,)).fetchone() is not None
+
+def _flush_worker():
+    """Thread de fundo: envia a fila enquanto houver escritas novas"""
+    global _flush_thread, _flush_requested
+    while True:
+        with _flush_thread_lock:
+            if not _flush_requested:
+                _flush_thread = None
+                return
+            _flush_requested = False
+        try:
+            flushed = flush_outbox()
+        except Exception as e:
+            logger.warning("Envio da fila falhou: %s", e)
+            flushed = {"id_map": {}, "error": str(e)}
+        if flushed["id_map"]:
+            # Ids locais trocados pelos definitivos: as sessões recarregam as transações
+            from transactions_db import mark_data_changed
+            mark_data_changed()
+        if flushed["error"]:
+            # Sem conexão: a fila é reenviada na próxima sincronização
+            with _flush_thread_lock:
+                _flush_thread = None
+                _flush_requested = False
+            return
+
+def request_flush():
+    """
+    Agenda o envio da fila em uma thread de fundo e retorna na hora.
+
+    Escritas feitas enquanto a thread envia são incluídas no mesmo ciclo.
+    """
+    global _flush_thread, _flush_requested
+    with _flush_thread_lock:
+        _flush_requested = True
+        if _flush_thread is not None:
+            return
+        _flush_thread = threading.Thread(target=_flush_worker, name="local-replica-flush", daemon=True)
+        _flush_thread.start()
+
+def _resolve_id(transaction_id):
+    """Id definitivo de uma transação que ainda pode estar com o id local"""
+    return _id_aliases.get(transaction_id, transaction_id)
+
+def pending_writes():
+    """Quantidade de escritas locais ainda não enviadas ao Supabase"""
+    with _connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]
+
+# ---------------------------------------------------------------------
+# Sincronização
+# ---------------------------------------------------------------------
+
+def sync(full=False):
+    """
+    Envia a fila de escritas e depois copia as novidades do Supabase.
+
+    Args:
+        full (bool): Faz a leitura completa das tabelas (reconcilia exclusões)
+
+    Returns:
+        dict: {"pushed", "pending", "pulled": {tabela: linhas}, "error"}
+    """
+    global _last_sync, _last_full_sync
+    with _sync_lock:
+        report = {"pushed": 0, "pending": 0, "pulled": {}, "error": None}
+        try:
+            flushed = flush_outbox()
+            report["pushed"] = flushed["pushed"]
+            report["pending"] = flushed["pending"]
+            for table in REPLICA_TABLES:
+                report["pulled"][table] = pull_table(table, full=full)
+        except Exception as e:
+            # Sem conexão: as leituras continuam usando a réplica
+            report["error"] = str(e)
+            logger.warning("Sincronização com o Supabase falhou: %s", e)
+            _last_sync = time.monotonic()
+            return report
+        now = time.monotonic()
+        _last_sync = now
+        if full:
+            _last_full_sync = now
+        if report["pulled"].get("categories") or full:
+            from categories import invalidate_category_index
+            invalidate_category_index()
+        if report["pulled"].get("transactions") or full:
+            from transactions_db import mark_data_changed
+            mark_data_changed()
+        logger.info("Réplica sincronizada: %s", report["pulled"])
+        return report
+
+def sync_if_due():
+    """
+    Sincroniza se o intervalo mínimo já passou.
+
+    Enquanto a réplica não tem uma primeira cópia a sincronização é feita na
+    hora; depois disso roda em uma thread de fundo, para que as leituras
+    nunca esperem pela rede.
+
+    Returns:
+        dict | None: Relatório de sync() quando executada na hora
+    """
+    global _last_sync, _last_full_sync, _sync_thread
+    now = time.monotonic()
+    if _last_sync and now - _last_sync < SYNC_INTERVAL_SECONDS:
+        return None
+    ready = all(is_ready(table) for table in REPLICA_TABLES)
+    if not _last_full_sync:
+        # Ao iniciar o processo, uma réplica já preenchida faz só o pull incremental
+        full = not ready
+        if ready:
+            _last_full_sync = now
+    else:
+        full = now - _last_full_sync >= FULL_SYNC_INTERVAL_SECONDS
+    if not ready:
+        return sync(full=full)
+
+    with _sync_lock:
+        if _sync_thread is not None and _sync_thread.is_alive():
+            return None
+        # Marca antes de iniciar: com o Supabase fora do ar, tenta de novo só no próximo intervalo
+        _last_sync = now
+        _sync_thread = threading.Thread(target=sync, kwargs={"full": full},
+                                        name="local-replica-sync", daemon=True)
+        _sync_thread.start()
+    return None
+
+# ---------------------------------------------------------------------
+# Leituras e escritas locais
+# ---------------------------------------------------------------------
+
+def get_categories():
+    """Categorias da réplica, ordenadas por nome"""
+    with _connect() as conn:
+        return [dict(row) for row in conn.execute("SELECT * FROM categories ORDER BY name")]
+
+def get_transaction(transaction_id):
+    """Transação da réplica pelo id (None se não existir)"""
+    with _connect() as conn:
+        rows = _rows_by_ids(conn, "transactions", [_resolve_id(transaction_id)])
+    return rows[0] if rows else None
+
+def add_transaction(transaction):
+    """
+    Grava uma transação na réplica e a coloca na fila de envio.
+
+    Args:
+        transaction (dict): Colunas da transação (sem id)
+
+    Returns:
+        list: [transação gravada], com o id local (negativo) até o envio
+    """
+    with _local_lock, _connect() as conn, conn:
+        min_id = conn.execute("SELECT MIN(id) FROM transactions").fetchone()[0] or 0
+        # Ids já trocados não voltam a ser usados, para que _id_aliases continue válido
+        temp_id = min(min_id, 0, *_id_aliases) - 1
+        row = dict(transaction, id=temp_id)
+        _upsert_rows(conn, "transactions", [row])
+        # A chave fica gravada na fila, então todo reenvio usa a mesma
+        _enqueue(conn, "transactions", "insert", temp_id,
+                 dict(transaction, client_id=str(uuid.uuid4())))
+    request_flush()
+    return [row]
+
+def update_transaction(transaction_id, data):
+    """
+    Altera uma transação na réplica e coloca a alteração na fila de envio.
+
+    Returns:
+        tuple: (transação antes, [transação depois]) ou (None, []) se não existir
+    """
+    with _local_lock, _connect() as conn:
+        transaction_id = _resolve_id(transaction_id)
+        old = (_rows_by_ids(conn, "transactions", [transaction_id]) or [None])[0]
+        if old is None:
+            return None, []
+        new = dict(old, **data)
+        with conn:
+            columns = [c for c in data if c in old]
+            conn.execute(f"UPDATE transactions SET {', '.join(c + ' = ?' for c in columns)} "
+                         "WHERE id = ?", [data[c] for c in columns] + [transaction_id])
+            _enqueue(conn, "transactions", "update", transaction_id, data)
+    request_flush()
+    return old, [new]
+
+def delete_transaction(transaction_id):
+    """
+    Remove uma transação da réplica e coloca a exclusão na fila de envio.
+
+    Uma transação que ainda não chegou ao Supabase é só retirada da fila.
+
+    Returns:
+        list: [transação removida] ou [] se não existir
+    """
+    with _local_lock, _connect() as conn:
+        transaction_id = _resolve_id(transaction_id)
+        old = _rows_by_ids(conn, "transactions", [transaction_id])
+        with conn:
+            conn.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+            if transaction_id < 0:
+                # Se a inserção já estiver sendo enviada, flush_outbox enfileira a exclusão
+                conn.execute("DELETE FROM sync_outbox WHERE table_name = 'transactions' AND row_id = ?",
+                             (transaction_id,))
+            elif old:
+                _enqueue(conn, "transactions", "delete", transaction_id, {})
+    request_flush()
+    return old
+
+def bulk_update_transactions(data, ids=None, categories=None, types=None):
+    """
+    Aplica a mesma alteração a várias transações da réplica e enfileira o envio.
+
+    Returns:
+        list: Estado anterior das transações alteradas
+    """
+    if ids:
+        ids = [_resolve_id(i) for i in ids]
+    clauses = []
+    params = []
+    for column, values in (("id", ids), ("category", categories), ("type", types)):
+        if values:
+            values = list(values)
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    if not clauses or not data:
+        return []
+
+    with _local_lock, _connect() as conn:
+        previous = [dict(row) for row in conn.execute(
+            f"SELECT * FROM transactions WHERE {' AND '.join(clauses)}", params)]
+        affected = [t["id"] for t in previous]
+        columns = list(data)
+        with conn:
+            for start in range(0, len(affected), 500):
+                chunk = affected[start:start + 500]
+                conn.execute(f"UPDATE transactions SET {', '.join(c + ' = ?' for c in columns)} "
+                             f"WHERE id IN ({', '.join('?' for _ in chunk)})",
+                             [data[c] for c in columns] + chunk)
+            # Transações ainda não enviadas recebem a alteração quando o id for definitivo
+            for temp_id in (i for i in affected if i < 0):
+                _enqueue(conn, "transactions", "update", temp_id, data)
+            remote = [t for t in previous if t["id"] > 0]
+            if remote:
+                _enqueue(conn, "transactions", "bulk_update", None,
+                         {"data": data, "ids": [t["id"] for t in remote]})
+    request_flush()
+    return previous
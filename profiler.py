@@ -0,0 +1,302 @@
+"""
+Módulo responsável pela medição do tempo de renderização das páginas.
+
+Cada página e cada etapa cara (busca de dados, agregação, montagem de
+gráficos, aplicação do tema) é marcada com o decorador profiled ou com o
+gerenciador de contexto section. Durante uma execução da página são
+registrados, por seção, o tempo de parede, as idas ao backend (requisições
+ao Supabase) e as linhas transferidas. Os números de uma seção incluem os
+das seções abertas dentro dela.
+
+Ao final de cada página o resultado vai para o painel de depuração da
+barra lateral (show_debug_panel) e para um log JSON rotativo, uma linha
+por execução.
+
+Desligado por padrão; com o profiler desligado os decoradores só fazem
+uma verificação de flag por chamada.
+
+Configuração:
+    FINANCAS_PROFILE (ou PROFILE em st.secrets): 1/true liga a medição
+    FINANCAS_PROFILE_LOG: arquivo do log JSON (padrão profile_log.jsonl)
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import streamlit as st
+
+DEFAULT_LOG_PATH = "profile_log.jsonl"
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUP_COUNT = 3
+
+# Execuções recentes mantidas em memória para o painel (por processo)
+RECENT_RENDERS = 20
+
+_SESSION_KEY = "_profiler_last_render"
+
+_enabled = None
+_state = threading.local()
+_recent = deque(maxlen=RECENT_RENDERS)
+_recent_lock = threading.Lock()
+_log_lock = threading.Lock()
+_profile_logger = None
+
+# ---------------------------------------------------------------------
+# Configuração
+# ---------------------------------------------------------------------
+
+def _flag(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "sim", "on")
+
+def is_enabled():
+    """Indica se a medição está ligada (lido uma vez por processo)"""
+    global _enabled
+    if _enabled is None:
+        enabled = _flag(os.environ.get("FINANCAS_PROFILE", ""))
+        if not enabled:
+            try:
+                enabled = _flag(st.secrets.get("PROFILE", ""))
+            except Exception:
+                # Sem secrets.toml
+                enabled = False
+        _enabled = enabled
+    return _enabled
+
+def set_enabled(enabled):
+    """
+    Liga ou desliga a medição, ignorando a configuração.
+
+    Args:
+        enabled (bool | None): None volta a ler a configuração
+    """
+    global _enabled
+    _enabled = None if enabled is None else bool(enabled)
+
+# ---------------------------------------------------------------------
+# Medição
+# ---------------------------------------------------------------------
+
+class _Section:
+    """Seção aberta: acumula idas ao backend e linhas até ser fechada"""
+    __slots__ = ("name", "depth", "start", "round_trips", "rows")
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.start = time.perf_counter()
+        self.round_trips = 0
+        self.rows = 0
+
+def _stack():
+    stack = getattr(_state, "stack", None)
+    if stack is None:
+        stack = _state.stack = []
+    return stack
+
+def _close(section, stack):
+    """Soma a seção fechada na execução corrente; a mais externa finaliza a execução"""
+    elapsed = time.perf_counter() - section.start
+    render = _state.render
+    totals = render["sections"][section.name]
+    totals["calls"] += 1
+    totals["seconds"] += elapsed
+    totals["round_trips"] += section.round_trips
+    totals["rows"] += section.rows
+
+    if not stack:
+        render["seconds"] = elapsed
+        render["round_trips"] = section.round_trips
+        render["rows"] = section.rows
+        _state.render = None
+        _finish_render(render)
+
+class section:
+    """
+    Gerenciador de contexto que mede um trecho como uma seção nomeada.
+
+    Uma seção de página inicia uma execução; quando ela fecha, a execução
+    é publicada no painel e no log. Seções comuns abertas fora de uma
+    página (consultas durante init_db, por exemplo) não são medidas.
+
+    Args:
+        name (str): Nome da seção (ex.: "dashboard.calculate_summary")
+        page (bool): Se a seção é uma página desenhada
+    """
+    __slots__ = ("name", "page", "_section")
+
+    def __init__(self, name, page=False):
+        self.name = name
+        self.page = page
+        self._section = None
+
+    def __enter__(self):
+        if not is_enabled():
+            return self
+        stack = _stack()
+        if not stack:
+            if not self.page:
+                return self
+            _state.render = {
+                "page": self.name,
+                "at": datetime.now().isoformat(timespec="seconds"),
+                "sections": {}
+            }
+        self._section = _Section(self.name, len(stack))
+        stack.append(self._section)
+        # Registrada na abertura para que o painel siga a ordem de execução
+        totals = _state.render["sections"].setdefault(self.name, {
+            "depth": self._section.depth, "calls": 0, "seconds": 0.0, "round_trips": 0, "rows": 0
+        })
+        totals["depth"] = min(totals["depth"], self._section.depth)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._section is None:
+            return False
+        stack = _stack()
+        # Seções fechadas fora de ordem (exceção em um gerador, por exemplo)
+        while stack and stack[-1] is not self._section:
+            stack.pop()
+        if stack:
+            stack.pop()
+        _close(self._section, stack)
+        self._section = None
+        return False
+
+def profiled(name=None, page=False):
+    """
+    Decorador que mede cada chamada da função como uma seção.
+
+    Args:
+        name (str, optional): Nome da seção; padrão "<módulo>.<função>"
+        page (bool): Se a função desenha uma página (inicia uma execução)
+
+    Returns:
+        callable: Decorador
+    """
+    def decorator(func):
+        section_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            with section(section_name, page):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_round_trip(rows=0):
+    """
+    Registra uma ida ao backend em todas as seções abertas.
+
+    Args:
+        rows (int): Linhas transferidas na resposta
+    """
+    stack = getattr(_state, "stack", None)
+    if not stack:
+        return
+    for open_section in stack:
+        open_section.round_trips += 1
+        open_section.rows += rows
+
+# ---------------------------------------------------------------------
+# Publicação: sessão, memória e log JSON
+# ---------------------------------------------------------------------
+
+def _get_profile_logger():
+    """Logger dedicado que grava uma linha JSON por execução, com rotação"""
+    global _profile_logger
+    with _log_lock:
+        if _profile_logger is None:
+            logger = logging.getLogger("financas.profile")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            path = os.environ.get("FINANCAS_PROFILE_LOG", DEFAULT_LOG_PATH)
+            try:
+                handler = RotatingFileHandler(
+                    path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            except OSError as e:
+                logging.getLogger("financas").warning("Log de desempenho indisponível em %s: %s", path, e)
+            _profile_logger = logger
+        return _profile_logger
+
+def _finish_render(render):
+    """Guarda a execução na sessão e na memória e grava a linha no log"""
+    render["sections"] = [
+        {"name": section_name, **totals}
+        for section_name, totals in render["sections"].items()
+    ]
+    for totals in render["sections"]:
+        totals["seconds"] = round(totals["seconds"], 6)
+    render["seconds"] = round(render["seconds"], 6)
+
+    with _recent_lock:
+        _recent.append(render)
+    try:
+        st.session_state[_SESSION_KEY] = render
+    except Exception:
+        # Fora de uma sessão do Streamlit (scripts, benchmark)
+        pass
+    _get_profile_logger().info(json.dumps(render, ensure_ascii=False))
+
+def last_render():
+    """Última execução medida nesta sessão (ou no processo, fora do Streamlit)"""
+    try:
+        render = st.session_state.get(_SESSION_KEY)
+    except Exception:
+        render = None
+    if render is None:
+        with _recent_lock:
+            render = _recent[-1] if _recent else None
+    return render
+
+def recent_renders():
+    """Execuções recentes do processo, da mais antiga para a mais nova"""
+    with _recent_lock:
+        return list(_recent)
+
+# ---------------------------------------------------------------------
+# Painel de depuração
+# ---------------------------------------------------------------------
+
+def show_debug_panel():
+    """Mostra na barra lateral o tempo por seção da última página desenhada"""
+    if not is_enabled():
+        return
+    render = last_render()
+    with st.sidebar:
+        with st.expander("⏱️ Desempenho", expanded=False):
+            if render is None:
+                st.caption("Nenhuma página medida ainda.")
+                return
+            st.caption(
+                f"{render['page']}: {render['seconds'] * 1000:.0f} ms, "
+                f"{render['round_trips']} requisições, {render['rows']} linhas"
+            )
+            st.dataframe(
+                [
+                    {
+                        "Seção": "  " * s["depth"] + s["name"],
+                        "Chamadas": s["calls"],
+                        "ms": round(s["seconds"] * 1000, 1),
+                        "Requisições": s["round_trips"],
+                        "Linhas": s["rows"]
+                    }
+                    for s in render["sections"]
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            same_page = [r["seconds"] * 1000 for r in recent_renders() if r["page"] == render["page"]]
+            if len(same_page) > 1:
+                st.caption("Últimas execuções: " + ", ".join(f"{ms:.0f} ms" for ms in same_page[-5:]))
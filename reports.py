@@ -7,10 +7,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from transactions_db import view_transactions
+import aggregations
 from transactions_analysis import get_balance, get_monthly_summary
 from theme_manager import init_theme_manager, theme_config_section, get_theme_colors, apply_theme_to_plotly_chart
-from supabase_db import init_supabase
+from profiler import profiled
 
+@profiled(page=True)
 def show_reports():
     """Mostra os relatórios financeiros"""
     st.title("📊 Relatórios")
@@ -21,26 +23,14 @@ def show_reports():
     # Mostrar configuração de tema
     theme_config_section()
     
-    # Obter transações diretamente do Supabase
-    supabase = init_supabase()
-    if not supabase:
-        st.error("Erro ao conectar ao banco de dados.")
-        return
-        
-    response = supabase.table("transactions").select("*").execute()
-    transactions = response.data
+    # Obter transações do snapshot compartilhado
+    transactions = view_transactions()
     
     if not transactions:
         st.warning("Nenhuma transação encontrada para gerar relatórios.")
         return
     
-    # Converter para DataFrame
-    df = pd.DataFrame(transactions)
-    
-    # Converter campos de data
-    df['date'] = pd.to_datetime(df['date'])
-    df['due_date'] = pd.to_datetime(df['due_date'])
-    df['created_at'] = pd.to_datetime(df['created_at'])
+    df = prepare_report_frame(transactions)
     
     # Tabs para diferentes relatórios
     tab1, tab2, tab3 = st.tabs(["📈 Visão Geral", "💰 Fluxo de Caixa", "📊 Categorias"])
@@ -54,6 +44,27 @@ def show_reports():
     with tab3:
         show_category_analysis(df)
 
+@profiled()
+def prepare_report_frame(transactions):
+    """
+    Converte as transações no DataFrame usado pelos relatórios.
+    
+    Args:
+        transactions (list): Lista de transações
+        
+    Returns:
+        pd.DataFrame: Tipo/status/valor normalizados e colunas de data convertidas
+    """
+    # Converter para DataFrame com tipo/status/valor normalizados
+    df = aggregations.normalize_transactions(transactions)
+    
+    # Converter campos de data
+    df['date'] = pd.to_datetime(df['date'])
+    df['due_date'] = pd.to_datetime(df['due_date'])
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    return df
+
+@profiled()
 def show_overview(df):
     """Mostra visão geral das finanças"""
     st.subheader("Visão Geral")
@@ -61,31 +72,17 @@ def show_overview(df):
     # Métricas principais
     theme_colors = get_theme_colors()
     
-    # Calcular saldos usando a mesma lógica do dashboard
-    # Filtrar apenas transações pagas
-    df_paid = df[df['status'].str.lower().isin(['pago', 'paid'])]
+    # Calcular saldos usando a mesma lógica do dashboard (apenas transações pagas)
+    balance = aggregations.calculate_balance(df)
+    saldo_conta = balance["saldo_conta"]
+    total_investido = balance["total_investido"]
+    patrimonio_total = balance["patrimonio_total"]
     
-    # Inicializar valores
-    saldo_conta = 0
-    total_investido = 0
-    
-    # Processar cada transação usando a mesma lógica do dashboard
-    for _, transaction in df_paid.iterrows():
-        # Obter o tipo e valor da transação
-        tipo = str(transaction.get('type', '')).lower()
-        valor = float(transaction.get('amount', 0))
-        
-        # Calcular saldo em conta
-        if tipo in ['receita', 'income', 'revenue']:
-            saldo_conta += valor
-        elif tipo in ['despesa', 'expense', 'expenses']:
-            saldo_conta -= valor
-        elif tipo in ['investimento', 'investment']:
-            saldo_conta -= valor
-            total_investido += valor
-    
-    # Calcular patrimônio total
-    patrimonio_total = saldo_conta + total_investido
+    # Totais e quantidades por tipo (todos os status)
+    por_tipo = aggregations.totals_by_type(df)
+    receitas = por_tipo[aggregations.TIPO_RECEITA]
+    despesas = por_tipo[aggregations.TIPO_DESPESA]
+    investimentos = por_tipo[aggregations.TIPO_INVESTIMENTO]
     
     col1, col2, col3 = st.columns(3)
     
@@ -103,9 +100,9 @@ def show_overview(df):
     
     # Criar DataFrame para o gráfico
     df_type = pd.DataFrame([
-        {"Tipo": "Receitas", "Valor": df[df['type'].str.lower().isin(['receita', 'income', 'revenue'])]['amount'].astype(float).sum()},
-        {"Tipo": "Despesas", "Valor": df[df['type'].str.lower().isin(['despesa', 'expense', 'expenses'])]['amount'].astype(float).sum()},
-        {"Tipo": "Investimentos", "Valor": df[df['type'].str.lower().isin(['investimento', 'investment'])]['amount'].astype(float).sum()}
+        {"Tipo": "Receitas", "Valor": receitas["total"]},
+        {"Tipo": "Despesas", "Valor": despesas["total"]},
+        {"Tipo": "Investimentos", "Valor": investimentos["total"]}
     ])
     
     # Cores para cada tipo
@@ -132,37 +129,36 @@ def show_overview(df):
     # Tabela com resumo
     st.subheader("Resumo por Tipo")
     
-    # Contar transações por tipo
-    receitas_count = df[df['type'].str.lower().isin(['receita', 'income', 'revenue'])].shape[0]
-    despesas_count = df[df['type'].str.lower().isin(['despesa', 'expense', 'expenses'])].shape[0]
-    investimentos_count = df[df['type'].str.lower().isin(['investimento', 'investment'])].shape[0]
-    
     # Calcular médias
-    receitas_mean = df[df['type'].str.lower().isin(['receita', 'income', 'revenue'])]['amount'].astype(float).sum() / receitas_count if receitas_count > 0 else 0
-    despesas_mean = df[df['type'].str.lower().isin(['despesa', 'expense', 'expenses'])]['amount'].astype(float).sum() / despesas_count if despesas_count > 0 else 0
-    investimentos_mean = df[df['type'].str.lower().isin(['investimento', 'investment'])]['amount'].astype(float).sum() / investimentos_count if investimentos_count > 0 else 0
+    def media(totais):
+        return totais["total"] / totais["count"] if totais["count"] > 0 else 0
     
     summary_df = pd.DataFrame({
         'Tipo': ['Receitas', 'Despesas', 'Investimentos'],
-        'Valor Total': [f"R$ {df[df['type'].str.lower().isin(['receita', 'income', 'revenue'])]['amount'].astype(float).sum():,.2f}", f"R$ {df[df['type'].str.lower().isin(['despesa', 'expense', 'expenses'])]['amount'].astype(float).sum():,.2f}", f"R$ {df[df['type'].str.lower().isin(['investimento', 'investment'])]['amount'].astype(float).sum():,.2f}"],
-        'Quantidade': [receitas_count, despesas_count, investimentos_count],
-        'Média': [f"R$ {receitas_mean:,.2f}", f"R$ {despesas_mean:,.2f}", f"R$ {investimentos_mean:,.2f}"]
+        'Valor Total': [f"R$ {t['total']:,.2f}" for t in (receitas, despesas, investimentos)],
+        'Quantidade': [t["count"] for t in (receitas, despesas, investimentos)],
+        'Média': [f"R$ {media(t):,.2f}" for t in (receitas, despesas, investimentos)]
     })
     
     st.dataframe(summary_df, use_container_width=True)
 
-def show_cash_flow(df):
-    """Mostra análise do fluxo de caixa"""
-    st.subheader("Fluxo de Caixa")
-    
-    # Seletor de período
-    period = st.selectbox(
-        "Período",
-        ["Últimos 30 dias", "Este mês", "Mês anterior", "Últimos 3 meses", "Todo período"]
-    )
-    
+CASH_FLOW_PERIODS = ["Últimos 30 dias", "Este mês", "Mês anterior", "Últimos 3 meses", "Todo período"]
+
+@profiled()
+def cash_flow_data(df, period, today=None):
+    """
+    Filtra o período do fluxo de caixa e soma os valores por dia e tipo.
+    
+    Args:
+        df (pd.DataFrame): Saída de prepare_report_frame
+        period (str): Um dos CASH_FLOW_PERIODS
+        today (pd.Timestamp, optional): Data de referência; padrão é agora
+        
+    Returns:
+        tuple: (transações do período, totais diários com date, tipo, amount e type)
+    """
     # Filtrar dados pelo período selecionado
-    today = pd.Timestamp.now()
+    today = today if today is not None else pd.Timestamp.now()
     df_filtered = df.copy()
     
     if period == "Últimos 30 dias":
@@ -178,30 +174,28 @@ def show_cash_flow(df):
     elif period == "Últimos 3 meses":
         df_filtered = df[df['date'] >= (today - pd.Timedelta(days=90))]
     
-    # Preparar dados para o gráfico
-    # Agrupar por data e tipo, considerando variações nos nomes dos tipos
-    df_daily = pd.DataFrame()
-    
-    # Processar receitas
-    receitas = df_filtered[df_filtered['type'].str.lower().isin(['receita', 'income', 'revenue'])]
-    if not receitas.empty:
-        receitas_daily = receitas.groupby('date')['amount'].sum().reset_index()
-        receitas_daily['type'] = 'Receita'
-        df_daily = pd.concat([df_daily, receitas_daily])
-    
-    # Processar despesas
-    despesas = df_filtered[df_filtered['type'].str.lower().isin(['despesa', 'expense', 'expenses'])]
-    if not despesas.empty:
-        despesas_daily = despesas.groupby('date')['amount'].sum().reset_index()
-        despesas_daily['type'] = 'Despesa'
-        df_daily = pd.concat([df_daily, despesas_daily])
-    
-    # Processar investimentos
-    investimentos = df_filtered[df_filtered['type'].str.lower().isin(['investimento', 'investment'])]
-    if not investimentos.empty:
-        investimentos_daily = investimentos.groupby('date')['amount'].sum().reset_index()
-        investimentos_daily['type'] = 'Investimento'
-        df_daily = pd.concat([df_daily, investimentos_daily])
+    # Agrupar por data e tipo normalizado em um único groupby
+    tipo_labels = {
+        aggregations.TIPO_RECEITA: 'Receita',
+        aggregations.TIPO_DESPESA: 'Despesa',
+        aggregations.TIPO_INVESTIMENTO: 'Investimento'
+    }
+    df_known = df_filtered[df_filtered['tipo'].isin(list(tipo_labels))]
+    df_daily = (df_known.groupby(['date', 'tipo'], observed=True)['valor'].sum()
+                        .reset_index()
+                        .rename(columns={'valor': 'amount'}))
+    df_daily['type'] = df_daily['tipo'].astype(str).map(tipo_labels)
+    return df_filtered, df_daily
+
+@profiled()
+def show_cash_flow(df):
+    """Mostra análise do fluxo de caixa"""
+    st.subheader("Fluxo de Caixa")
+    
+    # Seletor de período
+    period = st.selectbox("Período", CASH_FLOW_PERIODS)
+    
+    df_filtered, df_daily = cash_flow_data(df, period)
     
     if df_daily.empty:
         st.info(f"Não há transações para o período selecionado: {period}")
@@ -241,9 +235,10 @@ def show_cash_flow(df):
     col1, col2, col3 = st.columns(3)
     
     # Calcular totais
-    receitas_total = df_filtered[df_filtered['type'].str.lower().isin(['receita', 'income', 'revenue'])]['amount'].astype(float).sum()
-    despesas_total = df_filtered[df_filtered['type'].str.lower().isin(['despesa', 'expense', 'expenses'])]['amount'].astype(float).sum()
-    investimentos_total = df_filtered[df_filtered['type'].str.lower().isin(['investimento', 'investment'])]['amount'].astype(float).sum()
+    por_tipo = aggregations.totals_by_type(df_filtered)
+    receitas_total = por_tipo[aggregations.TIPO_RECEITA]["total"]
+    despesas_total = por_tipo[aggregations.TIPO_DESPESA]["total"]
+    investimentos_total = por_tipo[aggregations.TIPO_INVESTIMENTO]["total"]
     
     with col1:
         st.metric("Total Receitas", f"R$ {receitas_total:,.2f}")
@@ -254,6 +249,7 @@ def show_cash_flow(df):
     with col3:
         st.metric("Total Investimentos", f"R$ {investimentos_total:,.2f}")
 
+@profiled()
 def show_category_analysis(df):
     """Mostra análise por categorias"""
     st.subheader("Análise por Categorias")
@@ -264,22 +260,15 @@ def show_category_analysis(df):
         ["Despesa", "Receita", "Investimento"]
     )
     
-    # Mapear seleção para possíveis variações nos dados
-    type_map = {
-        "Despesa": ['despesa', 'expense', 'expenses'],
-        "Receita": ['receita', 'income', 'revenue'],
-        "Investimento": ['investimento', 'investment']
-    }
-    
-    # Filtrar dados
-    df_filtered = df[df['type'].str.lower().isin(type_map[type_filter])]
+    # Filtrar dados pelo tipo normalizado
+    df_filtered = df[df['tipo'] == type_filter.lower()]
     
     if df_filtered.empty:
         st.info(f"Não há transações do tipo {type_filter} para análise.")
         return
     
     # Agrupar por categoria
-    df_cat = df_filtered.groupby('category')['amount'].agg(['sum', 'count']).reset_index()
+    df_cat = df_filtered.groupby('category')['valor'].agg(['sum', 'count']).reset_index()
     df_cat.columns = ['Categoria', 'Total', 'Quantidade']
     df_cat = df_cat.sort_values('Total', ascending=True)
     
@@ -0,0 +1,823 @@
+"""
+Módulo responsável pelo acesso aos dados por meio de repositórios.
+
+Cada entidade (transações, categorias, metas e configurações) tem uma
+interface de repositório com implementações para Supabase, SQLite e memória.
+O backend é escolhido uma única vez por processo (get_repositories) e todo o
+restante do aplicativo usa apenas as interfaces; assim a mesma lógica de
+transactions_db, categories, goals_db e settings roda contra o Supabase, o
+financas.db local ou um repositório em memória (benchmarks e execuções offline).
+
+Escolha do backend:
+
+* FINANCAS_BACKEND=supabase|sqlite|memory, se definida;
+* senão "supabase" quando as credenciais estão em st.secrets, "sqlite" caso contrário.
+
+Com o Supabase e a réplica local ligada (db.use_local_replica), transações e
+categorias passam pela réplica (local_replica.py). As configurações são
+preferências da máquina e ficam no SQLite mesmo com o Supabase, a menos que
+FINANCAS_SETTINGS_BACKEND=supabase.
+
+Convenção das escritas: como no PostgREST, add/update/delete retornam a lista
+das linhas gravadas ([] se nada foi gravado).
+"""
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import datetime
+import aggregations
+import db
+import local_replica
+import supabase_db
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+BACKENDS = ("supabase", "sqlite", "memory")
+
+# ---------------------------------------------------------------------
+# Interfaces
+# ---------------------------------------------------------------------
+
+class TransactionsRepo(ABC):
+    """Transações e agregados mensais (monthly_aggregates)"""
+
+    @abstractmethod
+    def list(self, start_date=None, end_date=None, types=None, statuses=None,
+             categories=None, categorias_tipo=None):
+        """
+        Transações que atendem aos filtros, da mais recente para a mais antiga.
+
+        Os filtros de lista comparam valores exatos (as grafias alternativas
+        já vêm expandidas por transactions_db).
+
+        Args:
+            start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+            end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+            types, statuses, categories, categorias_tipo (list, optional):
+                Valores aceitos para as colunas correspondentes
+
+        Returns:
+            list: Transações como dicionários
+        """
+
+    def iter(self, start_date=None, end_date=None, page_size=None):
+        """Percorre as transações do período sem montar a lista inteira"""
+        yield from self.list(start_date=start_date, end_date=end_date)
+
+    @abstractmethod
+    def get(self, transaction_id):
+        """Transação pelo id (None se não existir)"""
+
+    @abstractmethod
+    def add(self, transaction):
+        """Grava uma transação (sem id); retorna [transação gravada]"""
+
+    @abstractmethod
+    def insert_many(self, transactions):
+        """Insere várias transações (sem id) de uma vez; retorna a quantidade"""
+
+    @abstractmethod
+    def upsert_many(self, transactions):
+        """Grava várias transações substituindo as de mesmo id; retorna a quantidade"""
+
+    @abstractmethod
+    def update(self, transaction_id, data):
+        """
+        Altera colunas de uma transação.
+
+        Returns:
+            tuple: (transação antes ou None, [transação depois])
+        """
+
+    @abstractmethod
+    def delete(self, transaction_id):
+        """Remove uma transação; retorna [transação removida]"""
+
+    def delete_many(self, ids):
+        """Remove várias transações pelo id; retorna a quantidade removida"""
+        return sum(len(self.delete(transaction_id)) for transaction_id in ids)
+
+    def existing_fitids(self, fitids):
+        """FITIDs (extratos OFX) dentre os informados que já estão gravados"""
+        wanted = set(fitids)
+        return {t["fitid"] for t in self.iter() if t.get("fitid") in wanted}
+
+    @abstractmethod
+    def bulk_update(self, data, ids=None, categories=None, types=None):
+        """
+        Aplica a mesma alteração a várias transações.
+
+        Returns:
+            tuple: (quantidade alterada, estado anterior das transações ou
+                None se o backend não o conhece)
+        """
+
+    @abstractmethod
+    def get_monthly_aggregates(self, start_month=None, end_month=None, user_id=None):
+        """Linhas de monthly_aggregates do período (None se indisponíveis)"""
+
+    @abstractmethod
+    def apply_aggregate_deltas(self, deltas):
+        """Soma linhas de delta (aggregations.aggregate_deltas) a monthly_aggregates"""
+
+    @abstractmethod
+    def rebuild_aggregates(self):
+        """Recalcula monthly_aggregates a partir das transações; retorna a quantidade de linhas"""
+
+    @abstractmethod
+    def aggregates_status(self):
+        """Marcador persistente de monthly_aggregates: "built", "stale" ou None (nunca reconstruída)"""
+
+    @abstractmethod
+    def mark_aggregates_stale(self):
+        """Marca monthly_aggregates como desatualizada até a próxima reconstrução"""
+
+class CategoriesRepo(ABC):
+    """Categorias (ativas e inativas)"""
+
+    @abstractmethod
+    def list(self):
+        """Todas as categorias, ordenadas por nome"""
+
+    @abstractmethod
+    def add(self, category):
+        """Grava uma categoria (name, type, categoria_tipo, active); retorna [categoria]"""
+
+    @abstractmethod
+    def update(self, category_id, data):
+        """Altera colunas de uma categoria; retorna [categoria alterada]"""
+
+class GoalsRepo(ABC):
+    """Metas financeiras"""
+
+    @abstractmethod
+    def list(self):
+        """Todas as metas, das mais recentes para as mais antigas"""
+
+    @abstractmethod
+    def get(self, goal_id):
+        """Meta pelo id (None se não existir)"""
+
+    @abstractmethod
+    def add(self, goal):
+        """Grava uma meta; retorna [meta gravada]"""
+
+    @abstractmethod
+    def update(self, goal_id, data):
+        """Altera colunas de uma meta; retorna [meta alterada]"""
+
+    @abstractmethod
+    def delete(self, goal_id):
+        """Remove uma meta; retorna [meta removida]"""
+
+class SettingsRepo(ABC):
+    """Configurações do aplicativo (nome -> valor)"""
+
+    @abstractmethod
+    def get_all(self):
+        """Todas as configurações como dicionário"""
+
+    @abstractmethod
+    def set(self, name, value):
+        """Grava uma configuração (cria se não existir)"""
+
+    def initialize(self, defaults):
+        """Grava os valores padrão se ainda não houver nenhuma configuração"""
+        if not self.get_all():
+            for name, value in defaults.items():
+                self.set(name, value)
+
+# ---------------------------------------------------------------------
+# Supabase
+# ---------------------------------------------------------------------
+
+class SupabaseTransactionsRepo(TransactionsRepo):
+    def list(self, start_date=None, end_date=None, types=None, statuses=None,
+             categories=None, categorias_tipo=None):
+        return list(supabase_db.iter_transactions(
+            start_date=start_date, end_date=end_date, types=types, statuses=statuses,
+            categories=categories, categorias_tipo=categorias_tipo))
+
+    def iter(self, start_date=None, end_date=None, page_size=None):
+        kwargs = {"start_date": start_date, "end_date": end_date}
+        if page_size:
+            kwargs["page_size"] = page_size
+        yield from supabase_db.iter_transactions(**kwargs)
+
+    def get(self, transaction_id):
+        return supabase_db.get_transaction(transaction_id)
+
+    def add(self, transaction):
+        if not supabase_db.init_supabase():
+            return []
+        return supabase_db.insert_transactions([transaction]) or []
+
+    def insert_many(self, transactions):
+        if not transactions:
+            return 0
+        supabase_db.insert_transactions(transactions)
+        return len(transactions)
+
+    def upsert_many(self, transactions):
+        return supabase_db.upsert_transactions(transactions)
+
+    def update(self, transaction_id, data):
+        old = supabase_db.get_transaction(transaction_id)
+        return old, supabase_db.update_transaction(transaction_id, data) or []
+
+    def delete(self, transaction_id):
+        return supabase_db.delete_transaction(transaction_id) or []
+
+    def delete_many(self, ids):
+        return supabase_db.delete_transactions(ids)
+
+    def existing_fitids(self, fitids):
+        return supabase_db.find_fitids(fitids)
+
+    def bulk_update(self, data, ids=None, categories=None, types=None):
+        # Lê o estado anterior (como o SQLite) para que os agregados recebam deltas exatos
+        previous, updated = supabase_db.bulk_update_transactions(data, ids, categories, types)
+        return len(updated), previous
+
+    def get_monthly_aggregates(self, start_month=None, end_month=None, user_id=None):
+        return supabase_db.get_monthly_aggregates(start_month, end_month, user_id)
+
+    def apply_aggregate_deltas(self, deltas):
+        supabase_db.apply_monthly_aggregate_deltas(deltas)
+
+    def rebuild_aggregates(self):
+        rows = aggregations.build_monthly_aggregates_chunked(supabase_db.iter_transactions())
+        supabase_db.replace_monthly_aggregates(rows)
+        return len(rows)
+
+    def aggregates_status(self):
+        return supabase_db.get_aggregates_status()
+
+    def mark_aggregates_stale(self):
+        supabase_db.set_aggregates_status("stale")
+
+class SupabaseCategoriesRepo(CategoriesRepo):
+    def list(self):
+        return supabase_db.get_categories()
+
+    def add(self, category):
+        return supabase_db.add_category(
+            name=category["name"],
+            category_type=category["type"],
+            categoria_tipo=category.get("categoria_tipo", "outros"),
+            active=category.get("active", True)
+        ) or []
+
+    def update(self, category_id, data):
+        return supabase_db.update_category(category_id, data) or []
+
+class SupabaseGoalsRepo(GoalsRepo):
+    def _table(self):
+        supabase = supabase_db.init_supabase()
+        if not supabase:
+            raise ConnectionError("Supabase indisponível")
+        return supabase.table("goals")
+
+    def list(self):
+        return supabase_db.execute_query(self._table().select("*").order("created_at", desc=True), "goals.select").data
+
+    def get(self, goal_id):
+        rows = supabase_db.execute_query(self._table().select("*").eq("id", goal_id).limit(1), "goals.select").data
+        return rows[0] if rows else None
+
+    def add(self, goal):
+        return supabase_db.execute_query(self._table().insert(goal), "goals.insert").data or []
+
+    def update(self, goal_id, data):
+        return supabase_db.execute_query(self._table().update(data).eq("id", goal_id), "goals.update").data or []
+
+    def delete(self, goal_id):
+        return supabase_db.execute_query(self._table().delete().eq("id", goal_id), "goals.delete").data or []
+
+class SupabaseSettingsRepo(SettingsRepo):
+    def get_all(self):
+        return supabase_db.get_settings()
+
+    def set(self, name, value):
+        return supabase_db.update_setting(name, value)
+
+# ---------------------------------------------------------------------
+# Réplica local do Supabase
+# ---------------------------------------------------------------------
+# Leituras no SQLite assim que a réplica está sincronizada (até lá, direto no
+# Supabase); escritas gravadas localmente e enviadas pela fila de local_replica.
+# Os agregados do Supabase são atualizados no envio da fila, então os deltas
+# aqui vão só para a tabela local.
+
+class ReplicaTransactionsRepo(SupabaseTransactionsRepo):
+    def _local_ready(self):
+        local_replica.sync_if_due()
+        return local_replica.is_ready("transactions")
+
+    def list(self, **filters):
+        if self._local_ready():
+            return db.query_transactions(**filters)
+        return super().list(**filters)
+
+    def get(self, transaction_id):
+        return local_replica.get_transaction(transaction_id)
+
+    def add(self, transaction):
+        return local_replica.add_transaction(transaction)
+
+    def update(self, transaction_id, data):
+        return local_replica.update_transaction(transaction_id, data)
+
+    def delete(self, transaction_id):
+        return local_replica.delete_transaction(transaction_id)
+
+    def delete_many(self, ids):
+        # Uma a uma, para que cada remoção entre na fila de envio
+        return TransactionsRepo.delete_many(self, ids)
+
+    def existing_fitids(self, fitids):
+        if self._local_ready():
+            return db.find_fitids(fitids)
+        return super().existing_fitids(fitids)
+
+    def bulk_update(self, data, ids=None, categories=None, types=None):
+        # A réplica conhece o estado anterior, então os deltas são sempre exatos
+        previous = local_replica.bulk_update_transactions(data, ids, categories, types)
+        return len(previous), previous
+
+    def get_monthly_aggregates(self, start_month=None, end_month=None, user_id=None):
+        if self._local_ready():
+            return db.get_monthly_aggregates(start_month, end_month, user_id)
+        return super().get_monthly_aggregates(start_month, end_month, user_id)
+
+    def apply_aggregate_deltas(self, deltas):
+        db.apply_monthly_aggregate_deltas(deltas)
+
+    def rebuild_aggregates(self):
+        return db.rebuild_monthly_aggregates()
+
+    def aggregates_status(self):
+        return db.get_aggregates_status()
+
+    def mark_aggregates_stale(self):
+        db.mark_aggregates_stale()
+
+class ReplicaCategoriesRepo(SupabaseCategoriesRepo):
+    def list(self):
+        if local_replica.is_ready("categories"):
+            return local_replica.get_categories()
+        return super().list()
+
+# ---------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------
+
+def _sqlite_rows(sql, params=()):
+    """Executa uma consulta no SQLite e retorna as linhas como dicionários"""
+    with db.sqlite_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql, params)]
+
+def _sqlite_columns(table):
+    """Colunas de uma tabela do SQLite"""
+    with db.sqlite_connection() as conn:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _sqlite_insert(table, row):
+    """Insere uma linha (apenas colunas existentes) e retorna [linha gravada]"""
+    existing = set(_sqlite_columns(table))
+    columns = [c for c in row if c in existing and c != "id"]
+    with db.sqlite_connection() as conn, conn:
+        cursor = conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [row[c] for c in columns])
+        row_id = cursor.lastrowid
+    return _sqlite_rows(f"SELECT * FROM {table} WHERE id = ?", (row_id,))
+
+def _sqlite_update(table, row_id, data):
+    """Altera colunas de uma linha; retorna (linha antes ou None, [linha depois])"""
+    old = _sqlite_rows(f"SELECT * FROM {table} WHERE id = ?", (row_id,))
+    if not old:
+        return None, []
+    columns = [c for c in data if c in old[0] and c != "id"]
+    if columns:
+        with db.sqlite_connection() as conn, conn:
+            conn.execute(f"UPDATE {table} SET {', '.join(c + ' = ?' for c in columns)} WHERE id = ?",
+                         [data[c] for c in columns] + [row_id])
+    return old[0], _sqlite_rows(f"SELECT * FROM {table} WHERE id = ?", (row_id,))
+
+def _sqlite_delete(table, row_id):
+    """Remove uma linha; retorna [linha removida]"""
+    old = _sqlite_rows(f"SELECT * FROM {table} WHERE id = ?", (row_id,))
+    if old:
+        with db.sqlite_connection() as conn, conn:
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+    return old
+
+class SQLiteTransactionsRepo(TransactionsRepo):
+    def list(self, **filters):
+        return db.query_transactions(**filters)
+
+    def get(self, transaction_id):
+        rows = _sqlite_rows(f"SELECT {', '.join(db.TRANSACTION_COLUMNS)} FROM transactions "
+                            "WHERE id = ?", (transaction_id,))
+        return rows[0] if rows else None
+
+    def add(self, transaction):
+        return _sqlite_insert("transactions", transaction)
+
+    def insert_many(self, transactions):
+        return db.insert_transactions(transactions)
+
+    def upsert_many(self, transactions):
+        return db.upsert_transactions(transactions)
+
+    def update(self, transaction_id, data):
+        return _sqlite_update("transactions", transaction_id, data)
+
+    def delete(self, transaction_id):
+        return _sqlite_delete("transactions", transaction_id)
+
+    def delete_many(self, ids):
+        ids = list(ids)
+        with db.sqlite_connection() as conn, conn:
+            cursor = conn.executemany("DELETE FROM transactions WHERE id = ?", [(i,) for i in ids])
+        return cursor.rowcount
+
+    def existing_fitids(self, fitids):
+        return db.find_fitids(fitids)
+
+    def bulk_update(self, data, ids=None, categories=None, types=None):
+        # Lê o estado anterior para que os agregados recebam deltas exatos e
+        # restringe o UPDATE às linhas lidas
+        clauses = []
+        params = []
+        for column, values in (("id", ids), ("category", categories), ("type", types)):
+            if values:
+                values = list(values)
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        if not clauses or (ids is not None and not list(ids)):
+            return 0, []
+        previous = _sqlite_rows(f"SELECT * FROM transactions WHERE {' AND '.join(clauses)}", params)
+        if not previous:
+            return 0, []
+        count = db.bulk_update_transactions(data, ids=[t["id"] for t in previous])
+        return count, previous
+
+    def get_monthly_aggregates(self, start_month=None, end_month=None, user_id=None):
+        return db.get_monthly_aggregates(start_month, end_month, user_id)
+
+    def apply_aggregate_deltas(self, deltas):
+        db.apply_monthly_aggregate_deltas(deltas)
+
+    def rebuild_aggregates(self):
+        return db.rebuild_monthly_aggregates()
+
+    def aggregates_status(self):
+        return db.get_aggregates_status()
+
+    def mark_aggregates_stale(self):
+        db.mark_aggregates_stale()
+
+class SQLiteCategoriesRepo(CategoriesRepo):
+    def list(self):
+        return _sqlite_rows("SELECT * FROM categories ORDER BY name")
+
+    def add(self, category):
+        return _sqlite_insert("categories", dict({"categoria_tipo": "outros", "active": True}, **category))
+
+    def update(self, category_id, data):
+        return _sqlite_update("categories", category_id, data)[1]
+
+class SQLiteGoalsRepo(GoalsRepo):
+    def list(self):
+        return _sqlite_rows("SELECT * FROM goals ORDER BY created_at DESC, id DESC")
+
+    def get(self, goal_id):
+        rows = _sqlite_rows("SELECT * FROM goals WHERE id = ?", (goal_id,))
+        return rows[0] if rows else None
+
+    def add(self, goal):
+        return _sqlite_insert("goals", goal)
+
+    def update(self, goal_id, data):
+        return _sqlite_update("goals", goal_id, data)[1]
+
+    def delete(self, goal_id):
+        return _sqlite_delete("goals", goal_id)
+
+class SQLiteSettingsRepo(SettingsRepo):
+    """Valores gravados como JSON na coluna value"""
+
+    def _ensure_table(self, conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS settings
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         name TEXT NOT NULL,
+                         value TEXT NOT NULL)''')
+
+    def get_all(self):
+        with db.sqlite_connection() as conn:
+            rows = conn.execute('SELECT name, value FROM settings').fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def set(self, name, value):
+        with db.sqlite_connection() as conn, conn:
+            # Atualizar configuração existente; inserir se ainda não existir
+            c = conn.execute('UPDATE settings SET value = ? WHERE name = ?',
+                             (json.dumps(value), name))
+            if c.rowcount == 0:
+                conn.execute('INSERT INTO settings (name, value) VALUES (?, ?)',
+                             (name, json.dumps(value)))
+        return True
+
+    def initialize(self, defaults):
+        with db.sqlite_connection() as conn, conn:
+            self._ensure_table(conn)
+            if conn.execute('SELECT COUNT(*) FROM settings').fetchone()[0] == 0:
+                conn.executemany('INSERT INTO settings (name, value) VALUES (?, ?)',
+                                 [(k, json.dumps(v)) for k, v in defaults.items()])
+
+# ---------------------------------------------------------------------
+# Memória
+# ---------------------------------------------------------------------
+# Substitutos sem banco para benchmarks e execuções offline. Os dados vivem
+# apenas no processo; as leituras retornam cópias para que o chamador possa
+# alterar os dicionários sem afetar o repositório.
+
+class _InMemoryTable:
+    """Linhas indexadas por id com ids sequenciais, protegidas por um lock"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.rows = {}
+        self.next_id = 1
+
+    def insert(self, row):
+        with self.lock:
+            row = dict(row)
+            if row.get("id") is None:
+                row["id"] = self.next_id
+            self.next_id = max(self.next_id, row["id"] + 1)
+            self.rows[row["id"]] = row
+            return dict(row)
+
+    def update(self, row_id, data):
+        with self.lock:
+            old = self.rows.get(row_id)
+            if old is None:
+                return None, []
+            new = dict(old, **{k: v for k, v in data.items() if k != "id"})
+            self.rows[row_id] = new
+            return dict(old), [dict(new)]
+
+    def delete(self, row_id):
+        with self.lock:
+            old = self.rows.pop(row_id, None)
+            return [old] if old is not None else []
+
+class InMemoryTransactionsRepo(TransactionsRepo):
+    def __init__(self, transactions=None):
+        self._table = _InMemoryTable()
+        self._aggregates = []
+        # Sem transações a tabela vazia já está correta
+        self._aggregates_status = "built"
+        if transactions:
+            self.upsert_many(transactions)
+            self.rebuild_aggregates()
+
+    def list(self, start_date=None, end_date=None, types=None, statuses=None,
+             categories=None, categorias_tipo=None):
+        filters = [(column, set(values)) for column, values in
+                   (("type", types), ("status", statuses), ("category", categories),
+                    ("categoria_tipo", categorias_tipo)) if values]
+        with self._table.lock:
+            rows = list(self._table.rows.values())
+        result = []
+        for t in rows:
+            date = t.get("date") or ""
+            if start_date and date < start_date:
+                continue
+            if end_date and date >= end_date:
+                continue
+            if any(t.get(column) not in values for column, values in filters):
+                continue
+            result.append(dict(t))
+        result.sort(key=lambda t: (t.get("date") or "", t["id"]), reverse=True)
+        return result
+
+    def get(self, transaction_id):
+        row = self._table.rows.get(transaction_id)
+        return dict(row) if row is not None else None
+
+    def add(self, transaction):
+        row = dict.fromkeys(db.TRANSACTION_COLUMNS)
+        row.update(transaction, id=None)
+        row["created_at"] = row["created_at"] or datetime.now().isoformat()
+        return [self._table.insert(row)]
+
+    def insert_many(self, transactions):
+        for transaction in transactions:
+            self.add(transaction)
+        return len(transactions)
+
+    def upsert_many(self, transactions):
+        for transaction in transactions:
+            row = dict.fromkeys(db.TRANSACTION_COLUMNS)
+            row.update(transaction)
+            self._table.insert(row)
+        return len(transactions)
+
+    def update(self, transaction_id, data):
+        return self._table.update(transaction_id, data)
+
+    def delete(self, transaction_id):
+        return self._table.delete(transaction_id)
+
+    def bulk_update(self, data, ids=None, categories=None, types=None):
+        if ids is None and not categories:
+            raise ValueError("Informe ids ou categorias para a atualização em lote")
+        id_set = set(ids) if ids is not None else None
+        previous = []
+        with self._table.lock:
+            for row_id, row in list(self._table.rows.items()):
+                if id_set is not None and row_id not in id_set:
+                    continue
+                if categories and row.get("category") not in categories:
+                    continue
+                if types and row.get("type") not in types:
+                    continue
+                old, _ = self._table.update(row_id, data)
+                previous.append(old)
+        return len(previous), previous
+
+    def get_monthly_aggregates(self, start_month=None, end_month=None, user_id=None):
+        if self._aggregates_status != "built":
+            return None
+        rows = [dict(r) for r in self._aggregates
+                if (not start_month or r["month"] >= start_month)
+                and (not end_month or r["month"] <= end_month)
+                and (user_id is None or r["user_id"] == user_id)]
+        rows.sort(key=lambda r: r["month"])
+        return rows
+
+    def apply_aggregate_deltas(self, deltas):
+        if not deltas:
+            return
+        with self._table.lock:
+            merged = aggregations.merge_aggregate_rows(self._aggregates, deltas)
+            self._aggregates = [r for r in merged if r["transaction_count"] > 0]
+
+    def rebuild_aggregates(self):
+        rows = aggregations.build_monthly_aggregates(self.list())
+        with self._table.lock:
+            self._aggregates = rows
+            self._aggregates_status = "built"
+        return len(rows)
+
+    def aggregates_status(self):
+        return self._aggregates_status
+
+    def mark_aggregates_stale(self):
+        self._aggregates_status = "stale"
+
+class InMemoryCategoriesRepo(CategoriesRepo):
+    def __init__(self, categories=None):
+        self._table = _InMemoryTable()
+        for category in categories or []:
+            self._table.insert(category)
+
+    def list(self):
+        with self._table.lock:
+            rows = [dict(r) for r in self._table.rows.values()]
+        return sorted(rows, key=lambda r: r.get("name") or "")
+
+    def add(self, category):
+        return [self._table.insert(dict({"categoria_tipo": "outros", "active": True}, **category))]
+
+    def update(self, category_id, data):
+        return self._table.update(category_id, data)[1]
+
+class InMemoryGoalsRepo(GoalsRepo):
+    def __init__(self, goals=None):
+        self._table = _InMemoryTable()
+        for goal in goals or []:
+            self._table.insert(goal)
+
+    def list(self):
+        with self._table.lock:
+            rows = [dict(r) for r in self._table.rows.values()]
+        return sorted(rows, key=lambda r: (r.get("created_at") or "", r["id"]), reverse=True)
+
+    def get(self, goal_id):
+        row = self._table.rows.get(goal_id)
+        return dict(row) if row is not None else None
+
+    def add(self, goal):
+        return [self._table.insert(dict(goal, id=None))]
+
+    def update(self, goal_id, data):
+        return self._table.update(goal_id, data)[1]
+
+    def delete(self, goal_id):
+        return self._table.delete(goal_id)
+
+class InMemorySettingsRepo(SettingsRepo):
+    def __init__(self, settings=None):
+        self._settings = dict(settings or {})
+
+    def get_all(self):
+        return dict(self._settings)
+
+    def set(self, name, value):
+        self._settings[name] = value
+        return True
+
+# ---------------------------------------------------------------------
+# Seleção do backend
+# ---------------------------------------------------------------------
+
+Repositories = namedtuple("Repositories", ["backend", "transactions", "categories", "goals", "settings"])
+
+_repositories = None
+_repositories_lock = threading.Lock()
+
+def _configured_backend():
+    """Backend definido por FINANCAS_BACKEND ou, na falta dela, pelas credenciais"""
+    backend = os.environ.get("FINANCAS_BACKEND", "").strip().lower()
+    if not backend:
+        return "supabase" if db.use_supabase() else "sqlite"
+    if backend not in BACKENDS:
+        raise ValueError(f"FINANCAS_BACKEND inválido: {backend} (use {', '.join(BACKENDS)})")
+    return backend
+
+def create_repositories(backend):
+    """
+    Monta os repositórios de um backend.
+
+    Args:
+        backend (str): "supabase", "sqlite" ou "memory"
+
+    Returns:
+        Repositories: backend, transactions, categories, goals e settings
+    """
+    if backend == "memory":
+        return Repositories(backend, InMemoryTransactionsRepo(), InMemoryCategoriesRepo(),
+                            InMemoryGoalsRepo(), InMemorySettingsRepo())
+    if backend == "sqlite":
+        return Repositories(backend, SQLiteTransactionsRepo(), SQLiteCategoriesRepo(),
+                            SQLiteGoalsRepo(), SQLiteSettingsRepo())
+    if backend != "supabase":
+        raise ValueError(f"Backend desconhecido: {backend}")
+
+    if db.use_local_replica():
+        transactions, categories = ReplicaTransactionsRepo(), ReplicaCategoriesRepo()
+    else:
+        transactions, categories = SupabaseTransactionsRepo(), SupabaseCategoriesRepo()
+    if os.environ.get("FINANCAS_SETTINGS_BACKEND", "").strip().lower() == "supabase":
+        settings = SupabaseSettingsRepo()
+    else:
+        settings = SQLiteSettingsRepo()
+    return Repositories(backend, transactions, categories, SupabaseGoalsRepo(), settings)
+
+def get_repositories():
+    """
+    Repositórios do processo, criados na primeira chamada.
+
+    Returns:
+        Repositories: backend, transactions, categories, goals e settings
+    """
+    global _repositories
+    repos = _repositories
+    if repos is None:
+        with _repositories_lock:
+            if _repositories is None:
+                _repositories = create_repositories(_configured_backend())
+                logger.info("Backend de dados: %s", _repositories.backend)
+            repos = _repositories
+    return repos
+
+def set_repositories(repos):
+    """
+    Substitui os repositórios do processo (benchmarks e execuções offline).
+
+    Args:
+        repos (Repositories | str): Repositórios prontos ou nome de um backend
+
+    Returns:
+        Repositories: Repositórios ativos
+    """
+    global _repositories
+    if isinstance(repos, str):
+        repos = create_repositories(repos)
+    with _repositories_lock:
+        _repositories = repos
+    return repos
+
+def get_backend():
+    """Nome do backend ativo ("supabase", "sqlite" ou "memory")"""
+    return get_repositories().backend
@@ -1,11 +1,34 @@
+import importlib
 import streamlit as st
-from datetime import datetime
-from db import init_db, get_transactions
-from dashboard import show_dashboard
-from finance_assistant import show_finance_assistant
-from budget_tool import show_budget_tool
-from reports import show_reports
-from goals import show_goals
+from db import init_db
+import profiler
+
+# Registro de páginas: rótulo do menu -> (módulo, função).
+# O módulo da página só é importado quando ela é selecionada, evitando
+# carregar plotly, OpenAI etc. no início da aplicação. Depois da primeira
+# importação o módulo fica em sys.modules e as próximas execuções são imediatas.
+PAGES = {
+    "📊 Dashboard": ("dashboard", "show_dashboard"),
+    "💸 Transações": ("ui", "show_transactions_page"),
+    "📈 Orçamento": ("budget_tool", "show_budget_tool"),
+    "📑 Relatórios": ("reports", "show_reports"),
+    "🎯 Metas": ("goals", "show_goals"),
+    "🤖 Assistente": ("finance_assistant", "show_finance_assistant")
+}
+
+def load_page(label):
+    """
+    Importa o módulo da página e retorna a função que a desenha.
+    
+    Args:
+        label (str): Rótulo da página em PAGES
+        
+    Returns:
+        callable: Função da página
+    """
+    module_name, function_name = PAGES[label]
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)
 
 def main():
     # Configuração inicial da página
@@ -111,23 +134,15 @@ def main():
         # Menu de navegação
         menu = st.radio(
             "Navegação",
-            ["📊 Dashboard", "💸 Transações", "📈 Orçamento", "📑 Relatórios", "🎯 Metas", "🤖 Assistente"]
+            list(PAGES)
         )
     
     # Conteúdo baseado na seleção do menu
-    if "Dashboard" in menu:
-        show_dashboard()
-    elif "Transações" in menu:
-        from ui import show_transactions_page
-        show_transactions_page()
-    elif "Orçamento" in menu:
-        show_budget_tool()
-    elif "Relatórios" in menu:
-        show_reports()
-    elif "Metas" in menu:
-        show_goals()
-    elif "Assistente" in menu:
-        show_finance_assistant()
+    show_page = load_page(menu)
+    show_page()
+    
+    # Tempo por seção da página (apenas com FINANCAS_PROFILE ligado)
+    profiler.show_debug_panel()
     
     # Rodapé
     st.markdown("---")
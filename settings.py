@@ -1,78 +1,31 @@
-import sqlite3
-import json
 import streamlit as st
+from repositories import get_repositories
 from theme_manager import init_theme_manager, theme_config_section
 
+# Configurações padrão
+DEFAULT_SETTINGS = {
+    "currency": "BRL",
+    "date_format": "%d/%m/%Y",
+    "show_notifications": True
+}
+
+def _settings_repo():
+    return get_repositories().settings
+
 def init_settings():
-    """Inicializa a tabela de configurações no banco de dados"""
-    from db import DB_PATH
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Criar tabela de configurações se não existir
-    c.execute('''CREATE TABLE IF NOT EXISTS settings
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT NOT NULL,
-                  value TEXT NOT NULL)''')
-    
-    # Configurações padrão
-    default_settings = {
-        "currency": "BRL",
-        "date_format": "%d/%m/%Y",
-        "show_notifications": True
-    }
-    
-    # Verificar se já existem configurações
-    c.execute('SELECT COUNT(*) FROM settings')
-    count = c.fetchone()[0]
-    
-    # Se não existem configurações, adiciona as padrão
-    if count == 0:
-        for key, value in default_settings.items():
-            c.execute('INSERT INTO settings (name, value) VALUES (?, ?)', 
-                      (key, json.dumps(value)))
-    
-    conn.commit()
-    conn.close()
+    """Inicializa as configurações com os valores padrão (se ainda não houver nenhuma)"""
+    _settings_repo().initialize(DEFAULT_SETTINGS)
 
 def get_settings():
     """Retorna todas as configurações como um dicionário"""
-    from db import DB_PATH
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute('SELECT name, value FROM settings')
-    settings = {name: json.loads(value) for name, value in c.fetchall()}
-    
-    conn.close()
-    return settings
+    return _settings_repo().get_all()
 
 def update_setting(name, value):
-    """Atualiza uma configuração específica"""
-    from db import DB_PATH
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Verificar se a configuração existe
-    c.execute('SELECT COUNT(*) FROM settings WHERE name = ?', (name,))
-    count = c.fetchone()[0]
-    
-    if count > 0:
-        # Atualizar configuração existente
-        c.execute('UPDATE settings SET value = ? WHERE name = ?', 
-                  (json.dumps(value), name))
-    else:
-        # Inserir nova configuração
-        c.execute('INSERT INTO settings (name, value) VALUES (?, ?)', 
-                  (name, json.dumps(value)))
-    
-    conn.commit()
-    conn.close()
+    """Atualiza uma configuração específica (cria se ainda não existir)"""
+    _settings_repo().set(name, value)
 
 def show_settings_page():
     """Interface de usuário para configurações"""
-    from db import DB_PATH
-    
     st.title("Configurações do Aplicativo")
     
     # Inicializar o gerenciador de tema
@@ -1,21 +1,154 @@
+import json
 import os
+import threading
+import time
+import weakref
 import streamlit as st
 from supabase import create_client
 from datetime import datetime
-import pandas as pd
-import json
+from app_logging import get_logger, debug_enabled
+import profiler
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------
+# Registro de clientes Supabase
+# ---------------------------------------------------------------------
+# Um único cliente por processo, compartilhado por todas as sessões do
+# Streamlit. O cliente mantém um pool de conexões HTTP keep-alive, evitando
+# pagar TLS e handshake a cada chamada. Os parâmetros podem ser ajustados em
+# st.secrets (SUPABASE_POOL_SIZE, SUPABASE_HEALTH_CHECK_INTERVAL).
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_HEALTH_CHECK_INTERVAL = 300  # segundos
+KEEPALIVE_EXPIRY = 60  # segundos
+
+_client_registry = {}
+_client_registry_lock = threading.Lock()
+
+def _get_secret(name, default=None):
+    """Lê um valor de st.secrets, retornando o padrão se não existir"""
+    try:
+        return st.secrets[name]
+    except Exception:
+        return default
+
+def _build_client(url, key, pool_size):
+    """Cria um cliente Supabase com pool de conexões keep-alive"""
+    try:
+        import httpx
+        from supabase import ClientOptions
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            ),
+            timeout=120
+        )
+        client = create_client(url, key, ClientOptions(httpx_client=http_client))
+    except (ImportError, TypeError):
+        # Versões antigas do supabase-py não aceitam httpx_client
+        return create_client(url, key)
+    # As conexões são fechadas quando ninguém mais usa o cliente: um cliente
+    # retirado do registro pode estar no meio de uma requisição em outra thread
+    weakref.finalize(client, http_client.close)
+    return client
+
+def _new_entry():
+    """Cria um cliente Supabase novo e a entrada do cache que o acompanha"""
+    url = st.secrets["SUPABASE_URL"]
+    key = st.secrets["SUPABASE_KEY"]
+    pool_size = int(_get_secret("SUPABASE_POOL_SIZE", DEFAULT_POOL_SIZE))
+    return {"client": _build_client(url, key, pool_size), "checked_at": time.monotonic(), "checking": False}
+
+def _is_healthy(client):
+    """Verifica se o cliente ainda consegue falar com o Supabase"""
+    try:
+        execute_query(client.table("transactions").select("id").limit(1), "transactions.select")
+        return True
+    except Exception as e:
+        logger.warning("Health check do Supabase falhou: %s", e)
+        return False
+
+def get_supabase_client(name="default"):
+    """
+    Retorna o cliente Supabase compartilhado do processo, criando-o se preciso.
+    
+    A cada SUPABASE_HEALTH_CHECK_INTERVAL segundos o cliente é verificado com
+    uma consulta leve; se falhar, é substituído por um novo. A verificação é
+    feita fora do lock do registro (só uma thread verifica; as demais seguem
+    com o cliente atual) e o cliente antigo não é fechado à força: suas
+    conexões são liberadas quando a última thread que o usa termina.
+    
+    Args:
+        name (str): Nome do cliente no registro
+        
+    Returns:
+        supabase.Client: Cliente compartilhado
+    """
+    health_interval = float(_get_secret("SUPABASE_HEALTH_CHECK_INTERVAL", DEFAULT_HEALTH_CHECK_INTERVAL))
+    with _client_registry_lock:
+        entry = _client_registry.get(name)
+        if entry is None:
+            entry = _client_registry[name] = _new_entry()
+            return entry["client"]
+        if entry["checking"] or time.monotonic() - entry["checked_at"] <= health_interval:
+            return entry["client"]
+        entry["checking"] = True
+    
+    replacement = None
+    try:
+        if not _is_healthy(entry["client"]):
+            replacement = _new_entry()
+    finally:
+        with _client_registry_lock:
+            entry["checking"] = False
+            entry["checked_at"] = time.monotonic()
+            if replacement is not None and _client_registry.get(name) is entry:
+                _client_registry[name] = replacement
+            current = _client_registry.get(name, entry)
+    return current["client"]
+
+def reset_supabase_clients():
+    """
+    Descarta todos os clientes do registro (ex.: após trocar credenciais).
+    
+    Requisições em andamento terminam com o cliente antigo; as próximas
+    chamadas a get_supabase_client criam um novo.
+    """
+    with _client_registry_lock:
+        _client_registry.clear()
 
 # Inicializar cliente Supabase
 def init_supabase():
-    """Inicializa e retorna o cliente Supabase"""
+    """Retorna o cliente Supabase compartilhado do processo"""
     try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_KEY"]
-        return create_client(url, key)
+        return get_supabase_client()
     except Exception as e:
         st.error(f"Erro ao conectar com Supabase: {str(e)}")
         return None
 
+def execute_query(query, label):
+    """
+    Executa uma requisição ao Supabase registrando-a no profiler.
+    
+    Cada chamada conta como uma ida ao backend na seção aberta, com o
+    número de linhas da resposta.
+    
+    Args:
+        query: Requisição montada (supabase.table(...).select(...) etc.)
+        label (str): Tabela e operação, ex.: "transactions.select"
+        
+    Returns:
+        Resposta do PostgREST
+    """
+    with profiler.section(f"supabase.{label}"):
+        response = query.execute()
+        data = response.data
+        profiler.record_round_trip(len(data) if isinstance(data, list) else 0)
+    return response
+
 # Inicializar tabelas no Supabase
 def init_supabase_tables():
     """Cria as tabelas necessárias no Supabase, se não existirem"""
@@ -27,24 +160,111 @@ def init_supabase_tables():
     # Este método é apenas para verificar a conexão
     try:
         # Verificar se podemos acessar a tabela de transactions
-        supabase.table("transactions").select("id").limit(1).execute()
+        execute_query(supabase.table("transactions").select("id").limit(1), "transactions.select")
         return True
     except Exception as e:
         st.error(f"Erro ao verificar tabelas no Supabase: {str(e)}")
         return False
 
 # Funções para transações
-def get_transactions():
-    """Obtém todas as transações do Supabase"""
+
+# O PostgREST do Supabase limita cada resposta a 1000 linhas por padrão
+# (configuração "Max Rows" do projeto); páginas maiores seriam truncadas.
+DEFAULT_PAGE_SIZE = 1000
+SUPABASE_MAX_ROWS = 1000
+
+def iter_transactions(page_size=DEFAULT_PAGE_SIZE, start_date=None, end_date=None,
+                      types=None, statuses=None, categories=None, categorias_tipo=None):
+    """
+    Percorre as transações do Supabase página a página, da mais recente para a mais antiga.
+    
+    Cada página é buscada com .range(); apenas uma página fica em memória
+    por vez, então o consumo de memória não cresce com o histórico. Os filtros
+    são aplicados no servidor (.gte/.lt/.in_).
+    
+    Args:
+        page_size (int): Quantidade de linhas por requisição (máx. SUPABASE_MAX_ROWS)
+        start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+        end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+        types (list, optional): Valores aceitos para a coluna type
+        statuses (list, optional): Valores aceitos para a coluna status
+        categories (list, optional): Valores aceitos para a coluna category
+        categorias_tipo (list, optional): Valores aceitos para a coluna categoria_tipo
+        
+    Yields:
+        dict: Uma transação por vez
+    """
     supabase = init_supabase()
     if not supabase:
-        return []
-    print("Buscando transações do Supabase...")
-    response = supabase.table("transactions").select("*").order("date", desc=True).limit(100).execute()
-    print(f"Total de transações encontradas no Supabase: {len(response.data)}")
-    if response.data:
-        print(f"IDs das transações: {[t.get('id') for t in response.data]}")
-    return response.data
+        return
+    
+    page_size = max(1, min(int(page_size), SUPABASE_MAX_ROWS))
+    offset = 0
+    while True:
+        query = supabase.table("transactions").select("*")
+        if start_date:
+            query = query.gte("date", start_date)
+        if end_date:
+            query = query.lt("date", end_date)
+        if types:
+            query = query.in_("type", list(types))
+        if statuses:
+            query = query.in_("status", list(statuses))
+        if categories:
+            query = query.in_("category", list(categories))
+        if categorias_tipo:
+            query = query.in_("categoria_tipo", list(categorias_tipo))
+        # id como desempate garante ordem estável entre páginas
+        response = execute_query(query.order("date", desc=True)
+                                      .order("id", desc=True)
+                                      .range(offset, offset + page_size - 1),
+                                 "transactions.select")
+        rows = response.data or []
+        yield from rows
+        if len(rows) < page_size:
+            break
+        offset += page_size
+
+def iter_table_pages(table, after_id=0, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Percorre uma tabela em ordem de id a partir de uma marca d'água.
+    
+    Usa paginação por chave (id > último id visto), então cada página custa
+    o mesmo independente de quantas linhas já foram lidas.
+    
+    Args:
+        table (str): Nome da tabela
+        after_id (int): Retorna apenas linhas com id maior que este
+        page_size (int): Linhas por requisição (máx. SUPABASE_MAX_ROWS)
+        
+    Yields:
+        list: Uma página de linhas (dicts), em ordem crescente de id
+    """
+    supabase = init_supabase()
+    if not supabase:
+        raise ConnectionError("Supabase indisponível")
+    
+    page_size = max(1, min(int(page_size), SUPABASE_MAX_ROWS))
+    while True:
+        response = execute_query(supabase.table(table).select("*")
+                                         .gt("id", after_id)
+                                         .order("id")
+                                         .limit(page_size),
+                                 f"{table}.select")
+        rows = response.data or []
+        if rows:
+            yield rows
+            after_id = rows[-1]["id"]
+        if len(rows) < page_size:
+            break
+
+def get_transactions(page_size=DEFAULT_PAGE_SIZE, start_date=None, end_date=None):
+    """Obtém todas as transações do Supabase (paginando a consulta)"""
+    transactions = list(iter_transactions(page_size=page_size, start_date=start_date, end_date=end_date))
+    logger.debug("Total de transações encontradas no Supabase: %d", len(transactions))
+    if transactions and debug_enabled(logger):
+        logger.debug("IDs das transações: %s", [t.get('id') for t in transactions])
+    return transactions
 
 def add_transaction(user_id, description, amount, category, date, due_date, 
                    trans_type, status, recurring, priority, quinzena, 
@@ -73,27 +293,379 @@ def add_transaction(user_id, description, amount, category, date, due_date,
         "created_at": datetime.now().isoformat()
     }
     
-    response = supabase.table("transactions").insert(transaction_data).execute()
+    response = execute_query(supabase.table("transactions").insert(transaction_data), "transactions.insert")
     return response.data
 
+def insert_transactions(transactions):
+    """
+    Insere várias transações no Supabase com um único insert de várias linhas.
+    
+    Args:
+        transactions (list): Dicionários de transação (sem id)
+        
+    Returns:
+        list: Linhas inseridas
+    """
+    supabase = init_supabase()
+    if not supabase:
+        raise ConnectionError("Supabase indisponível")
+    
+    response = execute_query(supabase.table("transactions").insert(transactions), "transactions.insert")
+    return response.data
+
+def insert_transaction_once(transaction, client_id):
+    """
+    Insere uma transação identificada por uma chave gerada no cliente.
+    
+    Repetir a chamada com o mesmo client_id (reenvio da fila após uma falha
+    entre a escrita e a confirmação) não cria outra linha: o upsert ignora
+    a duplicata e a linha existente é devolvida.
+    
+    Args:
+        transaction (dict): Colunas da transação (sem id)
+        client_id (str): Chave única (UUID) da inserção
+        
+    Returns:
+        tuple: (linha gravada, True se foi inserida agora)
+    """
+    supabase = init_supabase()
+    if not supabase:
+        raise ConnectionError("Supabase indisponível")
+    
+    row = dict(transaction, client_id=client_id)
+    response = execute_query(supabase.table("transactions").upsert(
+        row, on_conflict="client_id", ignore_duplicates=True), "transactions.upsert")
+    if response.data:
+        return response.data[0], True
+    
+    response = execute_query(supabase.table("transactions").select("*")
+                             .eq("client_id", client_id).limit(1), "transactions.select")
+    if not response.data:
+        raise RuntimeError(f"Transação {client_id} não encontrada após o upsert")
+    return response.data[0], False
+
+def upsert_transactions(transactions):
+    """
+    Grava várias transações no Supabase, substituindo as que já têm o mesmo id.
+    
+    Args:
+        transactions (list): Dicionários de transação; os sem id são inseridos
+        
+    Returns:
+        int: Quantidade de linhas gravadas
+    """
+    supabase = init_supabase()
+    if not supabase:
+        raise ConnectionError("Supabase indisponível")
+    
+    # O PostgREST exige as mesmas colunas em todas as linhas de uma requisição
+    with_id = [t for t in transactions if t.get("id") is not None]
+    without_id = [{k: v for k, v in t.items() if k != "id"}
+                  for t in transactions if t.get("id") is None]
+    if with_id:
+        execute_query(supabase.table("transactions").upsert(with_id, on_conflict="id"), "transactions.upsert")
+    if without_id:
+        execute_query(supabase.table("transactions").insert(without_id), "transactions.insert")
+    return len(with_id) + len(without_id)
+
 def update_transaction(transaction_id, data):
     """Atualiza uma transação existente no Supabase"""
     supabase = init_supabase()
     if not supabase:
         return False
     
-    response = supabase.table("transactions").update(data).eq("id", transaction_id).execute()
+    response = execute_query(supabase.table("transactions").update(data).eq("id", transaction_id), "transactions.update")
     return response.data
 
+# Limite de IDs por filtro in_ (mantém a URL da requisição em tamanho seguro)
+IN_FILTER_BATCH_SIZE = 200
+
+def bulk_update_transactions(data, ids=None, categories=None, types=None):
+    """
+    Aplica a mesma alteração a várias transações com poucas requisições.
+    
+    Como no SQLite, as transações afetadas são lidas antes (filtro por ids
+    e/ou categorias com cláusulas in_) e o update é restrito aos ids lidos,
+    para que os agregados recebam deltas exatos. Listas de IDs longas são
+    divididas em blocos de IN_FILTER_BATCH_SIZE.
+    
+    Args:
+        data (dict): Colunas a alterar
+        ids (list, optional): IDs das transações
+        categories (list, optional): Categorias das transações
+        types (list, optional): Restringe aos tipos informados
+        
+    Returns:
+        tuple: (estado anterior das transações alteradas, linhas alteradas)
+    """
+    supabase = init_supabase()
+    if not supabase:
+        raise ConnectionError("Supabase indisponível")
+    if ids is None and not categories:
+        raise ValueError("Informe ids ou categorias para a atualização em lote")
+    
+    id_batches = [None] if ids is None else [
+        ids[i:i + IN_FILTER_BATCH_SIZE] for i in range(0, len(ids), IN_FILTER_BATCH_SIZE)
+    ]
+    previous = []
+    for id_batch in id_batches:
+        offset = 0
+        while True:
+            query = supabase.table("transactions").select("*")
+            if id_batch is not None:
+                query = query.in_("id", list(id_batch))
+            if categories:
+                query = query.in_("category", list(categories))
+            if types:
+                query = query.in_("type", list(types))
+            response = execute_query(query.order("id").range(offset, offset + SUPABASE_MAX_ROWS - 1),
+                                     "transactions.select")
+            rows = response.data or []
+            previous.extend(rows)
+            if len(rows) < SUPABASE_MAX_ROWS:
+                break
+            offset += SUPABASE_MAX_ROWS
+    
+    affected = [t["id"] for t in previous]
+    updated = []
+    for i in range(0, len(affected), IN_FILTER_BATCH_SIZE):
+        query = supabase.table("transactions").update(data).in_("id", affected[i:i + IN_FILTER_BATCH_SIZE])
+        response = execute_query(query, "transactions.update")
+        updated.extend(response.data or [])
+    return previous, updated
+
 def delete_transaction(transaction_id):
     """Remove uma transação do Supabase"""
     supabase = init_supabase()
     if not supabase:
         return False
     
-    response = supabase.table("transactions").delete().eq("id", transaction_id).execute()
+    response = execute_query(supabase.table("transactions").delete().eq("id", transaction_id), "transactions.delete")
     return response.data
 
+def delete_transactions(ids):
+    """
+    Remove várias transações pelo id, em blocos de IN_FILTER_BATCH_SIZE.
+    
+    Args:
+        ids (list): Ids das transações
+        
+    Returns:
+        int: Quantidade de transações removidas
+    """
+    supabase = init_supabase()
+    if not supabase:
+        raise ConnectionError("Supabase indisponível")
+    
+    ids = list(ids)
+    deleted = 0
+    for i in range(0, len(ids), IN_FILTER_BATCH_SIZE):
+        response = execute_query(
+            supabase.table("transactions").delete().in_("id", ids[i:i + IN_FILTER_BATCH_SIZE]),
+            "transactions.delete")
+        deleted += len(response.data or [])
+    return deleted
+
+def get_transaction(transaction_id):
+    """Obtém uma única transação pelo ID (None se não existir)"""
+    supabase = init_supabase()
+    if not supabase:
+        return None
+    
+    response = execute_query(supabase.table("transactions").select("*").eq("id", transaction_id).limit(1), "transactions.select")
+    return response.data[0] if response.data else None
+
+def find_fitids(fitids):
+    """
+    Retorna quais dos FITIDs informados já estão gravados no Supabase.
+    
+    Args:
+        fitids (iterable): Identificadores de transações de extratos OFX
+        
+    Returns:
+        set: FITIDs já importados
+    """
+    supabase = init_supabase()
+    if not supabase:
+        raise ConnectionError("Supabase indisponível")
+    
+    fitids = list(fitids)
+    found = set()
+    for i in range(0, len(fitids), IN_FILTER_BATCH_SIZE):
+        response = execute_query(
+            supabase.table("transactions").select("fitid").in_("fitid", fitids[i:i + IN_FILTER_BATCH_SIZE]),
+            "transactions.select")
+        found.update(row["fitid"] for row in response.data or [])
+    return found
+
+# Funções para agregados mensais
+
+def get_aggregates_status():
+    """
+    Estado de monthly_aggregates (tabela monthly_aggregates_state).
+    
+    Returns:
+        str | None: "built", "stale" ou None se a tabela nunca foi reconstruída
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return None
+    response = execute_query(supabase.table("monthly_aggregates_state").select("status").eq("id", 1),
+                             "monthly_aggregates_state.select")
+    rows = response.data or []
+    return rows[0]["status"] if rows else None
+
+def set_aggregates_status(status):
+    """
+    Grava o estado de monthly_aggregates ("built" ou "stale").
+    
+    Args:
+        status (str): Novo estado
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return False
+    execute_query(supabase.table("monthly_aggregates_state").upsert(
+                      {"id": 1, "status": status, "updated_at": datetime.now().isoformat()},
+                      on_conflict="id"),
+                  "monthly_aggregates_state.upsert")
+    return True
+
+def apply_monthly_aggregate_deltas(deltas):
+    """
+    Soma deltas às linhas de monthly_aggregates.
+    
+    Todos os deltas vão em uma única chamada à função
+    apply_monthly_aggregate_deltas (ver supabase_schema.sql), que faz o
+    incremento no banco, de modo que escritas concorrentes não se
+    sobrescrevem e o lote é aplicado de forma atômica.
+    
+    Args:
+        deltas (list): Saída de aggregations.aggregate_deltas
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return False
+    if not deltas:
+        return True
+    
+    payload = [
+        {
+            "user_id": delta["user_id"],
+            "month": delta["month"],
+            "type": delta["type"],
+            "categoria_tipo": delta["categoria_tipo"],
+            "total_amount": delta["total_amount"],
+            "paid_amount": delta["paid_amount"],
+            "transaction_count": delta["transaction_count"]
+        }
+        for delta in deltas
+    ]
+    execute_query(supabase.rpc("apply_monthly_aggregate_deltas", {"p_deltas": payload}),
+                  "monthly_aggregates.rpc")
+    return True
+
+def get_monthly_aggregates(start_month=None, end_month=None, user_id=None):
+    """
+    Lê as linhas de monthly_aggregates do Supabase.
+    
+    Args:
+        start_month (str, optional): Período inicial inclusivo (YYYY-MM)
+        end_month (str, optional): Período final inclusivo (YYYY-MM)
+        user_id (int, optional): Restringe a um usuário
+        
+    Returns:
+        list | None: Linhas da tabela, ou None se não foi possível consultar
+            ou se a tabela não está reconstruída (marcador diferente de "built")
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return None
+    if get_aggregates_status() != "built":
+        return None
+    
+    # Paginado como iter_transactions: o PostgREST corta a resposta em SUPABASE_MAX_ROWS
+    rows = []
+    offset = 0
+    while True:
+        query = supabase.table("monthly_aggregates").select("*")
+        if start_month:
+            query = query.gte("month", start_month)
+        if end_month:
+            query = query.lte("month", end_month)
+        if user_id is not None:
+            query = query.eq("user_id", user_id)
+        # A chave primária completa como desempate garante ordem estável entre páginas
+        response = execute_query(query.order("month")
+                                      .order("user_id")
+                                      .order("type")
+                                      .order("categoria_tipo")
+                                      .range(offset, offset + SUPABASE_MAX_ROWS - 1),
+                                 "monthly_aggregates.select")
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < SUPABASE_MAX_ROWS:
+            break
+        offset += SUPABASE_MAX_ROWS
+    return rows
+
+def replace_monthly_aggregates(rows):
+    """
+    Substitui todo o conteúdo de monthly_aggregates (backfill/reconstrução).
+    
+    As linhas novas são gravadas com upserts em blocos de SUPABASE_MAX_ROWS
+    (a tabela nunca fica vazia no meio da troca); as chaves que deixaram de
+    existir são zeradas pelo mesmo upsert e removidas por um único delete
+    no final. O marcador fica "stale" durante a troca e só passa a "built"
+    depois do delete, então uma falha no meio deixa a tabela fora de uso
+    até a próxima reconstrução.
+    
+    Args:
+        rows (list): Saída de aggregations.build_monthly_aggregates
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return False
+    
+    set_aggregates_status("stale")
+    
+    # Chaves atuais, paginadas como get_monthly_aggregates
+    key_columns = ("user_id", "month", "type", "categoria_tipo")
+    existing = set()
+    offset = 0
+    while True:
+        response = execute_query(supabase.table("monthly_aggregates")
+                                         .select(",".join(key_columns))
+                                         .order("month").order("user_id")
+                                         .order("type").order("categoria_tipo")
+                                         .range(offset, offset + SUPABASE_MAX_ROWS - 1),
+                                 "monthly_aggregates.select")
+        page = response.data or []
+        existing.update(tuple(row[c] for c in key_columns) for row in page)
+        if len(page) < SUPABASE_MAX_ROWS:
+            break
+        offset += SUPABASE_MAX_ROWS
+    
+    new_keys = {tuple(row[c] for c in key_columns) for row in rows}
+    obsolete = [
+        dict(zip(key_columns, key), total_amount=0, paid_amount=0, transaction_count=0)
+        for key in sorted(existing - new_keys)
+    ]
+    payload = [
+        {c: row[c] for c in key_columns + ("total_amount", "paid_amount", "transaction_count")}
+        for row in rows
+    ] + obsolete
+    for i in range(0, len(payload), SUPABASE_MAX_ROWS):
+        execute_query(supabase.table("monthly_aggregates").upsert(
+                          payload[i:i + SUPABASE_MAX_ROWS], on_conflict=",".join(key_columns)),
+                      "monthly_aggregates.upsert")
+    if obsolete:
+        execute_query(supabase.table("monthly_aggregates").delete().lte("transaction_count", 0),
+                      "monthly_aggregates.delete")
+    
+    set_aggregates_status("built")
+    return True
+
 # Funções para categorias
 def get_categories():
     """Obtém todas as categorias do Supabase"""
@@ -101,7 +673,7 @@ def get_categories():
     if not supabase:
         return []
     
-    response = supabase.table("categories").select("*").order("name").execute()
+    response = execute_query(supabase.table("categories").select("*").order("name"), "categories.select")
     return response.data
 
 def add_category(name, category_type, categoria_tipo, active=True):
@@ -117,7 +689,7 @@ def add_category(name, category_type, categoria_tipo, active=True):
         "active": active
     }
     
-    response = supabase.table("categories").insert(category_data).execute()
+    response = execute_query(supabase.table("categories").insert(category_data), "categories.insert")
     return response.data
 
 def update_category(category_id, data):
@@ -126,7 +698,7 @@ def update_category(category_id, data):
     if not supabase:
         return False
     
-    response = supabase.table("categories").update(data).eq("id", category_id).execute()
+    response = execute_query(supabase.table("categories").update(data).eq("id", category_id), "categories.update")
     return response.data
 
 # Funções para metas
@@ -136,7 +708,7 @@ def get_goals():
     if not supabase:
         return []
     
-    response = supabase.table("goals").select("*").execute()
+    response = execute_query(supabase.table("goals").select("*"), "goals.select")
     return response.data
 
 def add_goal(user_id, description, target_amount, current_amount, deadline, category):
@@ -155,7 +727,7 @@ def add_goal(user_id, description, target_amount, current_amount, deadline, cate
         "created_at": datetime.now().isoformat()
     }
     
-    response = supabase.table("goals").insert(goal_data).execute()
+    response = execute_query(supabase.table("goals").insert(goal_data), "goals.insert")
     return response.data
 
 def update_goal(goal_id, data):
@@ -164,7 +736,7 @@ def update_goal(goal_id, data):
     if not supabase:
         return False
     
-    response = supabase.table("goals").update(data).eq("id", goal_id).execute()
+    response = execute_query(supabase.table("goals").update(data).eq("id", goal_id), "goals.update")
     return response.data
 
 def delete_goal(goal_id):
@@ -173,7 +745,7 @@ def delete_goal(goal_id):
     if not supabase:
         return False
     
-    response = supabase.table("goals").delete().eq("id", goal_id).execute()
+    response = execute_query(supabase.table("goals").delete().eq("id", goal_id), "goals.delete")
     return response.data
 
 # Funções para configurações
@@ -183,7 +755,7 @@ def get_settings():
     if not supabase:
         return {}
     
-    response = supabase.table("settings").select("*").execute()
+    response = execute_query(supabase.table("settings").select("*"), "settings.select")
     
     # Converter para dicionário name:value
     settings = {}
@@ -199,82 +771,183 @@ def update_setting(name, value):
         return False
     
     # Verificar se a configuração já existe
-    response = supabase.table("settings").select("id").eq("name", name).execute()
+    response = execute_query(supabase.table("settings").select("id").eq("name", name), "settings.select")
     
     if response.data:
         # Atualizar configuração existente
         setting_id = response.data[0]["id"]
-        supabase.table("settings").update({"value": value}).eq("id", setting_id).execute()
+        execute_query(supabase.table("settings").update({"value": value}).eq("id", setting_id), "settings.update")
     else:
         # Criar nova configuração
-        supabase.table("settings").insert({"name": name, "value": value}).execute()
+        execute_query(supabase.table("settings").insert({"name": name, "value": value}), "settings.insert")
     
     return True
 
-# Função para migrar dados do SQLite para Supabase
-def migrate_data_from_sqlite(sqlite_db_path="financas.db"):
-    """Migra dados do SQLite local para o Supabase"""
-    import sqlite3
+# ---------------------------------------------------------------------
+# Migração SQLite -> Supabase
+# ---------------------------------------------------------------------
+# Cada tabela é lida com um cursor em ordem de id e enviada em lotes com
+# upsert (on_conflict=id), então reenviar um lote é inofensivo. Depois de
+# cada lote o maior id enviado (high-water mark) é gravado em
+# MIGRATION_STATE_FILE; toda execução recomeça desse ponto, de modo que
+# uma execução interrompida continua de onde parou e linhas criadas no
+# SQLite depois de uma migração concluída também são enviadas. A memória
+# usada é limitada ao tamanho do lote.
+#
+# A reconstrução de monthly_aggregates é uma etapa própria no mesmo arquivo
+# (AGGREGATES_STAGE): ela volta a ficar pendente sempre que transactions
+# tem linhas acima do high-water mark e só é marcada como concluída depois de gravada,
+# então uma interrupção entre as duas etapas é retomada na próxima execução.
+#
+# Como os ids são enviados explicitamente, após a migração a sequência de
+# identidade de cada tabela deve ser ajustada no Supabase, por exemplo:
+#   SELECT setval(pg_get_serial_sequence('transactions', 'id'), MAX(id)) FROM transactions;
+
+MIGRATION_TABLES = ["categories", "transactions", "goals", "settings"]
+DEFAULT_MIGRATION_BATCH_SIZE = 500
+MIGRATION_STATE_FILE = os.path.join("backup", "migration_state.json")
+AGGREGATES_STAGE = "monthly_aggregates"
+
+# Colunas booleanas (o SQLite guarda 0/1)
+_BOOLEAN_COLUMNS = {
+    "transactions": ["recurring", "fixed_expense"],
+    "categories": ["active"]
+}
+
+def load_migration_state(sqlite_db_path, state_file=MIGRATION_STATE_FILE):
+    """Lê o high-water mark de cada tabela para o banco informado"""
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f).get(os.path.abspath(sqlite_db_path), {})
+
+def _save_migration_state(sqlite_db_path, tables_state, state_file=MIGRATION_STATE_FILE):
+    """Grava o estado da migração de forma atômica (arquivo temporário + replace)"""
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    state[os.path.abspath(sqlite_db_path)] = tables_state
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, state_file)
+
+def _migrate_table(conn, supabase, table, table_state, batch_size, save_state, progress_callback):
+    """Envia uma tabela em lotes a partir do high-water mark; retorna o relatório da tabela"""
+    last_id = table_state.get("last_id", 0)
+    report = {"rows": 0, "batches": 0, "resumed_from": last_id, "seconds": 0.0, "rows_per_second": 0.0}
+    boolean_columns = _BOOLEAN_COLUMNS.get(table, [])
+    start = time.perf_counter()
     
-    try:
-        # Conectar ao SQLite
-        conn = sqlite3.connect(sqlite_db_path)
-        conn.row_factory = sqlite3.Row
-        
-        # Obter dados do SQLite
-        transactions = []
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM transactions")
-        for row in cursor.fetchall():
-            transactions.append(dict(row))
-        
-        categories = []
-        cursor.execute("SELECT * FROM categories")
-        for row in cursor.fetchall():
-            categories.append(dict(row))
-        
-        goals = []
-        cursor.execute("SELECT * FROM goals")
-        for row in cursor.fetchall():
-            goals.append(dict(row))
-        
-        settings = []
-        cursor.execute("SELECT * FROM settings")
-        for row in cursor.fetchall():
-            settings.append(dict(row))
-        
-        conn.close()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id", (last_id,))
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batch = [dict(row) for row in rows]
+        for record in batch:
+            for column in boolean_columns:
+                if column in record and record[column] is not None:
+                    record[column] = bool(record[column])
+        execute_query(supabase.table(table).upsert(batch, on_conflict="id"), f"{table}.upsert")
         
-        # Enviar dados para o Supabase
-        supabase = init_supabase()
-        if not supabase:
-            return False
+        table_state["last_id"] = batch[-1]["id"]
+        table_state["rows"] = table_state.get("rows", 0) + len(batch)
+        save_state()
         
-        # Inserir categorias
-        if categories:
-            supabase.table("categories").insert(categories).execute()
+        report["rows"] += len(batch)
+        report["batches"] += 1
+        report["seconds"] = time.perf_counter() - start
+        report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+        if progress_callback:
+            progress_callback(table, dict(report))
+    
+    table_state["done"] = True
+    save_state()
+    report["seconds"] = time.perf_counter() - start
+    report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+def _rebuild_aggregates_stage(stage_state, save_state):
+    """Reconstrói monthly_aggregates lendo as transações já migradas, página a página"""
+    from aggregations import build_monthly_aggregates_chunked
+    start = time.perf_counter()
+    rows = build_monthly_aggregates_chunked(iter_transactions())
+    replace_monthly_aggregates(rows)
+    stage_state["done"] = True
+    stage_state["rows"] = len(rows)
+    save_state()
+    return {"rows": len(rows), "seconds": time.perf_counter() - start}
+
+def migrate_data_from_sqlite(sqlite_db_path="financas.db", batch_size=DEFAULT_MIGRATION_BATCH_SIZE,
+                             tables=None, restart=False, state_file=MIGRATION_STATE_FILE,
+                             progress_callback=None):
+    """
+    Migra dados do SQLite local para o Supabase em lotes, com retomada.
+    
+    Args:
+        sqlite_db_path (str): Caminho do banco SQLite
+        batch_size (int): Linhas por upsert
+        tables (list, optional): Tabelas a migrar (padrão: MIGRATION_TABLES)
+        restart (bool): Ignora o estado salvo e migra tudo desde o início
+        state_file (str): Arquivo com o high-water mark de cada tabela
+        progress_callback (callable, optional): Recebe (tabela, relatório parcial) após cada lote
         
-        # Inserir transações
-        if transactions:
-            # Ajustar formato dos dados se necessário
-            for transaction in transactions:
-                # Converter campos booleanos (SQLite armazena como 0/1)
-                for field in ["recurring", "fixed_expense"]:
-                    if field in transaction:
-                        transaction[field] = bool(transaction[field])
+    Returns:
+        dict | bool: Relatório por tabela (linhas, lotes, segundos, linhas/s)
+            e da etapa AGGREGATES_STAGE, ou False em caso de erro
+    """
+    import sqlite3
+    
+    supabase = init_supabase()
+    if not supabase:
+        return False
+    
+    tables = tables or MIGRATION_TABLES
+    unknown = [table for table in tables if table not in MIGRATION_TABLES]
+    if unknown:
+        raise ValueError(f"Tabelas desconhecidas: {', '.join(unknown)}")
+    
+    tables_state = {} if restart else load_migration_state(sqlite_db_path, state_file)
+    
+    def save_state():
+        _save_migration_state(sqlite_db_path, tables_state, state_file)
+    
+    report = {}
+    conn = sqlite3.connect(sqlite_db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        for table in tables:
+            table_state = tables_state.setdefault(table, {})
+            if table == "transactions" and conn.execute(
+                    "SELECT 1 FROM transactions WHERE id > ? LIMIT 1",
+                    (table_state.get("last_id", 0),)).fetchone():
+                # Transações novas invalidam os agregados: a etapa volta a ficar pendente
+                tables_state[AGGREGATES_STAGE] = {"done": False}
+                save_state()
+            # Sempre a partir do high-water mark, mesmo que a tabela já tenha
+            # sido concluída antes ("done" é só informativo)
+            report[table] = _migrate_table(conn, supabase, table, table_state,
+                                           batch_size, save_state, progress_callback)
+            logger.info("Migração de %s: %d linhas em %.1fs (%.0f linhas/s)", table,
+                        report[table]["rows"], report[table]["seconds"],
+                        report[table]["rows_per_second"])
             
-            supabase.table("transactions").insert(transactions).execute()
-        
-        # Inserir metas
-        if goals:
-            supabase.table("goals").insert(goals).execute()
-        
-        # Inserir configurações
-        if settings:
-            supabase.table("settings").insert(settings).execute()
-        
-        return True
+            if table == "transactions":
+                stage_state = tables_state.setdefault(AGGREGATES_STAGE, {})
+                if stage_state.get("done"):
+                    report[AGGREGATES_STAGE] = {"rows": 0, "skipped": True}
+                else:
+                    report[AGGREGATES_STAGE] = _rebuild_aggregates_stage(stage_state, save_state)
+                    logger.info("Agregados mensais reconstruídos: %d linhas",
+                                report[AGGREGATES_STAGE]["rows"])
+        return report
     
     except Exception as e:
-        st.error(f"Erro durante a migração: {str(e)}")
+        st.error(f"Erro durante a migração (execute novamente para retomar): {str(e)}")
         return False
+    finally:
+        conn.close()
@@ -6,6 +6,9 @@ DROP TABLE IF EXISTS settings CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
 DROP TABLE IF EXISTS reminders CASCADE;
 DROP TABLE IF EXISTS user_settings CASCADE;
+DROP TABLE IF EXISTS monthly_aggregates CASCADE;
+DROP TABLE IF EXISTS monthly_aggregates_state CASCADE;
+DROP TABLE IF EXISTS schema_version CASCADE;
 
 -- Tabela de transações
 CREATE TABLE transactions (
@@ -25,6 +28,11 @@ CREATE TABLE transactions (
     current_installment INTEGER DEFAULT 1,
     fixed_expense BOOLEAN DEFAULT FALSE,
     categoria_tipo TEXT DEFAULT 'outros',
+    -- Chave gerada pelo cliente nas inserções da réplica local (local_replica.py):
+    -- o reenvio de uma inserção da fila não duplica a transação
+    client_id UUID UNIQUE,
+    -- Identificador da transação no extrato OFX (evita importar o mesmo extrato duas vezes)
+    fitid TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -84,10 +92,95 @@ CREATE TABLE user_settings (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Agregados mensais materializados (mantidos pela aplicação a cada escrita)
+-- type e categoria_tipo são gravados normalizados:
+--   type: receita, despesa, investimento, outro
+--   categoria_tipo: necessidade, desejo, investimento, poupanca, outros
+CREATE TABLE monthly_aggregates (
+    user_id BIGINT NOT NULL DEFAULT 1,
+    month TEXT NOT NULL,
+    type TEXT NOT NULL,
+    categoria_tipo TEXT NOT NULL,
+    total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    paid_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month, type, categoria_tipo)
+);
+
+-- Marcador persistente (uma única linha) do estado de monthly_aggregates,
+-- compartilhado por todos os processos: 'built' depois de uma reconstrução
+-- completa, 'stale' quando um delta não pôde ser aplicado. Sem a linha
+-- (tabela nunca reconstruída) a aplicação não usa os agregados.
+CREATE TABLE IF NOT EXISTS monthly_aggregates_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    status TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Soma um lote de deltas a monthly_aggregates de forma atômica, em uma única chamada.
+-- p_deltas é um array JSON de objetos com user_id, month, type, categoria_tipo,
+-- total_amount, paid_amount e transaction_count. Deltas da mesma chave são
+-- somados antes (ON CONFLICT não pode alterar a mesma linha duas vezes) e as
+-- linhas são gravadas em ordem de chave para evitar deadlocks entre escritas.
+CREATE OR REPLACE FUNCTION apply_monthly_aggregate_deltas(p_deltas JSONB) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO monthly_aggregates AS m
+        (user_id, month, type, categoria_tipo, total_amount, paid_amount, transaction_count)
+    SELECT COALESCE(d.user_id, 1), d.month, d.type, d.categoria_tipo,
+           SUM(d.total_amount), SUM(d.paid_amount), SUM(d.transaction_count)
+    FROM jsonb_to_recordset(p_deltas) AS d(
+        user_id BIGINT, month TEXT, type TEXT, categoria_tipo TEXT,
+        total_amount DECIMAL, paid_amount DECIMAL, transaction_count INTEGER
+    )
+    GROUP BY 1, 2, 3, 4
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT (user_id, month, type, categoria_tipo) DO UPDATE SET
+        total_amount = m.total_amount + EXCLUDED.total_amount,
+        paid_amount = m.paid_amount + EXCLUDED.paid_amount,
+        transaction_count = m.transaction_count + EXCLUDED.transaction_count;
+
+    DELETE FROM monthly_aggregates AS m
+    USING jsonb_to_recordset(p_deltas) AS d(
+        user_id BIGINT, month TEXT, type TEXT, categoria_tipo TEXT
+    )
+    WHERE m.user_id = COALESCE(d.user_id, 1) AND m.month = d.month AND m.type = d.type
+      AND m.categoria_tipo = d.categoria_tipo AND m.transaction_count <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- monthly_aggregates começa vazia e sem marcador, assim como transactions.
+-- A aplicação reconstrói a tabela na inicialização (db.init_db) enquanto o
+-- marcador não for 'built'. Depois de carregar transações por fora
+-- (restauração de backup ou importação direta no banco), chame
+-- transactions_db.rebuild_monthly_aggregates(); a migração do SQLite já
+-- executa esse passo ao final.
+
 -- Índices para melhorar performance
-CREATE INDEX idx_transactions_user_id ON transactions(user_id);
-CREATE INDEX idx_transactions_date ON transactions(date);
-CREATE INDEX idx_transactions_category ON transactions(category);
+-- Transações: mesmos índices da migração 4 do SQLite (db.TRANSACTION_INDEXES).
+-- (user_id, date) também atende os filtros só por user_id. Com IF NOT EXISTS
+-- este bloco pode ser executado sozinho em um banco já existente.
+DROP INDEX IF EXISTS idx_transactions_user_id;
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_type_status_date ON transactions(user_id, type, status, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category);
+CREATE INDEX IF NOT EXISTS idx_transactions_due_date_status ON transactions(due_date, status);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+CREATE INDEX IF NOT EXISTS idx_transactions_fitid ON transactions(fitid);
 CREATE INDEX idx_goals_title ON goals(title);
 CREATE INDEX idx_reminders_user_id ON reminders(user_id);
 CREATE INDEX idx_reminders_transaction_id ON reminders(transaction_id);
+
+-- Controle de versão do esquema (mesma numeração de db.MIGRATIONS)
+CREATE TABLE schema_version (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- A versão 3 (réplica local) só existe no SQLite
+INSERT INTO schema_version (version, description) VALUES
+    (1, 'estrutura inicial'),
+    (2, 'agregados mensais'),
+    (4, 'índices de transações'),
+    (6, 'fitid das transações importadas'),
+    (7, 'estado dos agregados mensais');
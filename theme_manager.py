@@ -1,5 +1,6 @@
 import streamlit as st
 import plotly.graph_objects as go
+from profiler import profiled
 
 
 def init_theme_manager():
@@ -91,6 +92,7 @@ def get_theme_colors():
         }
 
 
+@profiled()
 def apply_theme_to_plotly_chart(fig):
     """
     Aplica o tema atual a um gráfico Plotly existente.
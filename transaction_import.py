@@ -0,0 +1,416 @@
+"""
+Módulo responsável pela importação em lote de extratos bancários.
+
+Os arquivos (CSV, OFX, XLSX/XLS) são lidos em blocos; cada bloco é
+normalizado de forma vetorizada, as categorias são resolvidas pelo índice em
+memória de categories.py e as transações são gravadas em lotes, com um único
+insert de várias linhas por lote.
+
+Transações de extratos OFX guardam o FITID (coluna fitid, prefixado pela
+conta); ao importar o mesmo extrato de novo, as já gravadas são ignoradas.
+"""
+import csv
+import io
+import re
+import time
+from datetime import datetime
+import pandas as pd
+import aggregations
+from app_logging import get_logger
+from categories import get_categoria_tipo
+from repositories import get_repositories
+from transactions_db import invalidate_transactions_cache, apply_aggregate_rows
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000   # linhas lidas do arquivo por vez
+DEFAULT_BATCH_SIZE = 500    # linhas por insert
+DEFAULT_CATEGORY = "Outros"
+
+SUPPORTED_FORMATS = ["csv", "ofx", "xlsx", "xls"]
+
+# Nomes de coluna aceitos para cada campo (comparados sem acento e em minúsculas)
+COLUMN_ALIASES = {
+    "date": ["data", "date", "dt", "data lancamento", "data movimento", "data da transacao"],
+    "description": ["descricao", "description", "historico", "memo", "lancamento", "nome", "name"],
+    "amount": ["valor", "amount", "value", "valor (r$)", "quantia"],
+    "category": ["categoria", "category"],
+    "type": ["tipo", "type"],
+    "status": ["status", "situacao"],
+    "due_date": ["vencimento", "due_date", "data vencimento"]
+}
+
+# Tipos gravados em português: ui.py e transactions_analysis.py comparam type
+# com esses valores exatos
+INCOME, EXPENSE, INVESTMENT = "Receita", "Despesa", "Investimento"
+
+_TYPE_MAP = {
+    "receita": INCOME, "income": INCOME, "credito": INCOME, "credit": INCOME, "c": INCOME,
+    "despesa": EXPENSE, "expense": EXPENSE, "debito": EXPENSE, "debit": EXPENSE, "d": EXPENSE,
+    "investimento": INVESTMENT, "investment": INVESTMENT
+}
+
+_ACCENTS = str.maketrans("áàâãäéèêëíìîïóòôõöúùûüç", "aaaaaeeeeiiiiooooouuuuc")
+
+def _plain(text):
+    """Texto em minúsculas, sem acentos e sem espaços nas pontas"""
+    return str(text).strip().lower().translate(_ACCENTS)
+
+def detect_format(filename):
+    """
+    Identifica o formato pelo nome do arquivo.
+
+    Returns:
+        str: csv, ofx, xlsx ou xls
+
+    Raises:
+        ValueError: Se a extensão não for suportada
+    """
+    extension = str(filename).rsplit(".", 1)[-1].lower()
+    if extension not in SUPPORTED_FORMATS:
+        raise ValueError(f"Formato não suportado: {extension}. Use {', '.join(SUPPORTED_FORMATS)}.")
+    return extension
+
+def _as_text_stream(source):
+    """Converte caminho, bytes ou arquivo binário em um fluxo de texto"""
+    if isinstance(source, str):
+        return open(source, "r", encoding="utf-8-sig", errors="replace")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding="utf-8-sig", errors="replace")
+
+# ---------------------------------------------------------------------
+# Leitores (geram DataFrames de até chunk_size linhas)
+# ---------------------------------------------------------------------
+
+def iter_csv_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lê um CSV em blocos, detectando o separador (',' ';' ou tab)"""
+    stream = _as_text_stream(source)
+    sample = stream.read(4096)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t").delimiter
+    except csv.Error:
+        delimiter = ","
+    stream.seek(0)
+    yield from pd.read_csv(stream, sep=delimiter, dtype=str, chunksize=chunk_size,
+                           skipinitialspace=True)
+
+def iter_excel_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, file_format="xlsx"):
+    """Lê a primeira planilha de um XLSX (openpyxl, modo somente leitura) ou XLS (xlrd) em blocos"""
+    if file_format == "xls":
+        # xlrd não tem leitura incremental; a planilha é lida inteira e entregue em blocos
+        df = pd.read_excel(source, engine="xlrd", dtype=str)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"col_{i}" for i, c in enumerate(header)]
+        chunk = []
+        for row in rows:
+            if not any(value is not None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+_OFX_STMTTRN = re.compile(r"<(/?)STMTTRN>", re.IGNORECASE)
+_OFX_READ_SIZE = 64 * 1024
+
+def _iter_ofx_segments(stream):
+    """
+    Divide o OFX nas tags <STMTTRN> e </STMTTRN>, sem depender das quebras
+    de linha (extratos XML costumam vir em uma única linha).
+
+    Gera (dentro de uma transação?, texto do trecho).
+    """
+    buffer = ""
+    inside = False
+    while True:
+        data = stream.read(_OFX_READ_SIZE)
+        buffer += data
+        # Uma tag cortada no fim do bloco fica no buffer até a próxima leitura
+        while True:
+            match = _OFX_STMTTRN.search(buffer)
+            if match is None:
+                break
+            yield inside, buffer[:match.start()]
+            inside = not match.group(1)
+            buffer = buffer[match.end():]
+        if not data:
+            # Uma transação sem </STMTTRN> (arquivo truncado) é descartada
+            if buffer and not inside:
+                yield inside, buffer
+            return
+
+def iter_ofx_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Lê as transações (<STMTTRN>) de um arquivo OFX, SGML ou XML, em blocos.
+
+    Campos usados: DTPOSTED, TRNAMT, NAME/MEMO, TRNTYPE e FITID. O FITID só é
+    único dentro de uma conta, então é prefixado pelo ACCTID do extrato.
+    """
+    stream = _as_text_stream(source)
+    chunk = []
+    account = None
+    for inside, text in _iter_ofx_segments(stream):
+        tags = {}
+        for tag, value in _OFX_TAG.findall(text):
+            if value.strip():
+                tags[tag.upper()] = value.strip()
+        if not inside:
+            account = tags.get("ACCTID", account)
+            continue
+        fitid = tags.get("FITID")
+        chunk.append({
+            "date": tags.get("DTPOSTED", "")[:8],
+            "amount": tags.get("TRNAMT"),
+            "description": tags.get("MEMO") or tags.get("NAME") or "",
+            "ofx_type": tags.get("TRNTYPE"),
+            "fitid": f"{account}:{fitid}" if fitid and account else fitid
+        })
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk)
+
+def iter_chunks(source, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Escolhe o leitor adequado ao formato"""
+    if file_format == "csv":
+        return iter_csv_chunks(source, chunk_size)
+    if file_format == "ofx":
+        return iter_ofx_chunks(source, chunk_size)
+    return iter_excel_chunks(source, chunk_size, file_format)
+
+# ---------------------------------------------------------------------
+# Normalização
+# ---------------------------------------------------------------------
+
+def map_columns(columns):
+    """
+    Associa as colunas do arquivo aos campos de transação.
+
+    Returns:
+        dict: {campo: coluna do arquivo}
+    """
+    plain = {_plain(c): c for c in columns}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in [field] + aliases:
+            if alias in plain:
+                mapping[field] = plain[alias]
+                break
+    return mapping
+
+def _parse_amounts(series):
+    """Converte valores em texto (1.234,56 / 1,234.56 / 1.234 / -50) para float"""
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(series, errors="coerce")
+    text = series.astype(str).str.strip().str.replace(r"[R$\s]", "", regex=True)
+    # Vírgula como separador decimal quando ela aparece depois do último ponto;
+    # sem vírgula, pontos seguidos de exatamente 3 dígitos separam milhares (R$ 1.234)
+    brazilian = ((text.str.rfind(",") > text.str.rfind("."))
+                 | text.str.fullmatch(r"[-+]?[1-9]\d{0,2}(\.\d{3})+"))
+    text = text.where(~brazilian, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    text = text.where(brazilian, text.str.replace(",", "", regex=False))
+    return pd.to_numeric(text, errors="coerce")
+
+def _parse_dates(series):
+    """Converte datas (YYYY-MM-DD, DD/MM/YYYY, YYYYMMDD ou datetime) para YYYY-MM-DD"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime("%Y-%m-%d")
+    text = series.astype(str).str.strip()
+    iso = pd.to_datetime(text, format="%Y-%m-%d", errors="coerce")
+    compact = pd.to_datetime(text.str[:8], format="%Y%m%d", errors="coerce")
+    other = pd.to_datetime(text, dayfirst=True, errors="coerce", format="mixed")
+    return iso.fillna(compact).fillna(other).dt.strftime("%Y-%m-%d")
+
+def normalize_chunk(df, default_status="pago", default_category=DEFAULT_CATEGORY, user_id=1):
+    """
+    Converte um bloco lido do arquivo em transações prontas para gravação.
+
+    Sem coluna de tipo, o sinal do valor define receita (positivo) ou
+    despesa (negativo); o valor gravado é sempre positivo.
+
+    Args:
+        df (DataFrame): Bloco lido do arquivo
+        default_status (str): Status das transações importadas
+        default_category (str): Categoria usada quando o arquivo não informa
+        user_id (int): Usuário dono das transações
+
+    Returns:
+        tuple: (lista de transações válidas, quantidade de linhas descartadas)
+    """
+    columns = map_columns(df.columns)
+    if "date" not in columns or "amount" not in columns:
+        raise ValueError("O arquivo precisa ter colunas de data e valor.")
+
+    amounts = _parse_amounts(df[columns["amount"]])
+    dates = _parse_dates(df[columns["date"]])
+    valid = amounts.notna() & dates.notna() & (amounts != 0)
+
+    if "type" in columns:
+        types = df[columns["type"]].map(lambda v: _TYPE_MAP.get(_plain(v)) if pd.notna(v) else None)
+        types = types.fillna(amounts.map(lambda v: INCOME if v > 0 else EXPENSE))
+    elif "ofx_type" in df.columns:
+        types = df["ofx_type"].map(lambda v: _TYPE_MAP.get(_plain(v)) if pd.notna(v) else None)
+        types = types.fillna(amounts.map(lambda v: INCOME if v > 0 else EXPENSE))
+    else:
+        types = amounts.map(lambda v: INCOME if v > 0 else EXPENSE)
+
+    if "description" in columns:
+        descriptions = df[columns["description"]].fillna("").astype(str).str.strip()
+    else:
+        descriptions = pd.Series("Importado", index=df.index)
+    descriptions = descriptions.where(descriptions != "", "Importado")
+
+    if "category" in columns:
+        categories = df[columns["category"]].fillna(default_category).astype(str).str.strip()
+    else:
+        categories = pd.Series(default_category, index=df.index)
+
+    statuses = (df[columns["status"]].fillna(default_status).astype(str).str.strip().str.lower()
+                if "status" in columns else pd.Series(default_status, index=df.index))
+    due_dates = _parse_dates(df[columns["due_date"]]) if "due_date" in columns else None
+
+    # Resolver categoria_tipo uma vez por categoria distinta (consulta ao índice em memória)
+    tipo_por_categoria = {name: get_categoria_tipo(name, "outros") for name in categories[valid].unique()}
+
+    out = pd.DataFrame({
+        "description": descriptions,
+        "amount": amounts.abs().round(2),
+        "category": categories,
+        "date": dates,
+        "due_date": due_dates if due_dates is not None else None,
+        "type": types,
+        "status": statuses
+    })[valid]
+    out = out.astype(object).where(out.notna(), None)
+    out.insert(0, "user_id", user_id)
+    out["recurring"] = False
+    out["priority"] = 2
+    out["quinzena"] = out["date"].str[8:10].astype(int).le(15).map({True: 1, False: 2})
+    out["installments"] = 1
+    out["current_installment"] = 1
+    out["fixed_expense"] = False
+    out["categoria_tipo"] = out["category"].map(tipo_por_categoria).fillna("outros")
+    if "fitid" in df.columns:
+        # Só extratos OFX trazem FITID; nos demais formatos a coluna não é enviada
+        out["fitid"] = df["fitid"][valid].astype(object).where(df["fitid"][valid].notna(), None)
+    out["created_at"] = datetime.now().isoformat()
+    transactions = out.to_dict("records")
+    for t in transactions:
+        t["amount"] = float(t["amount"])
+        t["quinzena"] = int(t["quinzena"])
+    return transactions, int((~valid).sum())
+
+# ---------------------------------------------------------------------
+# Importação
+# ---------------------------------------------------------------------
+
+def _insert_batch(batch):
+    """Grava um lote com um único insert de várias linhas no banco ativo"""
+    get_repositories().transactions.insert_many(batch)
+
+def _drop_imported(transactions, seen_fitids):
+    """
+    Remove as transações cujo FITID já foi gravado ou já apareceu no arquivo.
+
+    Args:
+        transactions (list): Transações normalizadas de um bloco
+        seen_fitids (set): FITIDs já vistos nesta importação (atualizado aqui)
+
+    Returns:
+        tuple: (transações novas, quantidade de duplicadas)
+    """
+    fitids = {t["fitid"] for t in transactions if t.get("fitid")} - seen_fitids
+    existing = get_repositories().transactions.existing_fitids(fitids) if fitids else set()
+    fresh = []
+    for t in transactions:
+        fitid = t.get("fitid")
+        if fitid and (fitid in existing or fitid in seen_fitids):
+            continue
+        if fitid:
+            seen_fitids.add(fitid)
+        fresh.append(t)
+    return fresh, len(transactions) - len(fresh)
+
+def import_transactions(source, filename=None, file_format=None, batch_size=DEFAULT_BATCH_SIZE,
+                        chunk_size=DEFAULT_CHUNK_SIZE, default_status="pago",
+                        default_category=DEFAULT_CATEGORY, dry_run=False, progress_callback=None):
+    """
+    Importa um extrato bancário em lotes.
+
+    Args:
+        source: Caminho, bytes ou arquivo (ex.: st.file_uploader)
+        filename (str, optional): Nome do arquivo, usado para detectar o formato
+        file_format (str, optional): csv, ofx, xlsx ou xls (sobrepõe filename)
+        batch_size (int): Linhas por insert
+        chunk_size (int): Linhas lidas do arquivo por vez
+        default_status (str): Status das transações importadas
+        default_category (str): Categoria quando o arquivo não informa
+        dry_run (bool): Apenas lê e valida, sem gravar
+        progress_callback (callable, optional): Recebe o relatório parcial após cada lote
+
+    Returns:
+        dict: Relatório com linhas lidas, importadas, descartadas, duplicadas
+            (FITID já importado), lotes, segundos e linhas por segundo
+    """
+    file_format = file_format or detect_format(filename or getattr(source, "name", source))
+    report = {"rows_read": 0, "rows_imported": 0, "rows_skipped": 0, "rows_duplicate": 0,
+              "batches": 0, "seconds": 0.0, "rows_per_second": 0.0, "dry_run": dry_run}
+    months = set()
+    seen_fitids = set()
+    start = time.perf_counter()
+
+    def flush(batch):
+        if not dry_run:
+            _insert_batch(batch)
+            apply_aggregate_rows(aggregations.build_monthly_aggregates(batch))
+        months.update(t["date"][:7] for t in batch)
+        report["rows_imported"] += len(batch)
+        report["batches"] += 1
+        report["seconds"] = time.perf_counter() - start
+        report["rows_per_second"] = report["rows_imported"] / report["seconds"] if report["seconds"] else 0.0
+        if progress_callback:
+            progress_callback(dict(report))
+
+    try:
+        pending = []
+        for chunk in iter_chunks(source, file_format, chunk_size):
+            report["rows_read"] += len(chunk)
+            transactions, skipped = normalize_chunk(chunk, default_status, default_category)
+            report["rows_skipped"] += skipped
+            transactions, duplicates = _drop_imported(transactions, seen_fitids)
+            report["rows_duplicate"] += duplicates
+            pending.extend(transactions)
+            while len(pending) >= batch_size:
+                flush(pending[:batch_size])
+                pending = pending[batch_size:]
+        if pending:
+            flush(pending)
+    finally:
+        if report["rows_imported"] and not dry_run:
+            invalidate_transactions_cache(months)
+
+    report["seconds"] = time.perf_counter() - start
+    report["rows_per_second"] = report["rows_imported"] / report["seconds"] if report["seconds"] else 0.0
+    logger.info("Importação concluída: %d linhas em %d lotes (%.1f linhas/s, %d descartadas, "
+                "%d já importadas)", report["rows_imported"], report["batches"],
+                report["rows_per_second"], report["rows_skipped"], report["rows_duplicate"])
+    return report
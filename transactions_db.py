@@ -1,22 +1,268 @@
 """
 Módulo responsável pelas operações de banco de dados relacionadas a transações.
-Utiliza Supabase como fonte de dados primária.
+O acesso ao banco passa pelos repositórios do backend ativo (repositories.py).
 """
-import sqlite3
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from categories import get_categories
-from db import DB_PATH
-from supabase_db import (
-    init_supabase, 
-    add_transaction as supabase_add_transaction,
-    get_transactions as supabase_get_transactions,
-    update_transaction as supabase_update_transaction,
-    delete_transaction as supabase_delete_transaction,
-    get_goals as supabase_get_goals,
-    add_goal as supabase_add_goal,
-    update_goal as supabase_update_goal,
-    delete_goal as supabase_delete_goal
-)
+import streamlit as st
+import aggregations
+from app_logging import get_logger
+from profiler import profiled
+from categories import get_categoria_tipo
+from repositories import get_repositories
+from goals_db import mark_goals_changed
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------
+# Snapshot de transações
+# ---------------------------------------------------------------------
+# Cada sessão do Streamlit guarda um snapshot das transações em
+# st.session_state. O snapshot expira após SNAPSHOT_TTL_SECONDS ou quando a
+# versão global dos dados muda (qualquer escrita incrementa a versão), de modo
+# que uma renderização de página faz no máximo uma consulta ao banco.
+
+SNAPSHOT_TTL_SECONDS = 60
+_SNAPSHOT_KEY = "_transactions_snapshot"
+
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+# Registro das últimas escritas: (versão, meses afetados ou None se desconhecido).
+# Permite que consolidações mensais recalculem apenas os meses tocados.
+_WRITE_LOG_SIZE = 256
+_write_log = deque(maxlen=_WRITE_LOG_SIZE)
+
+def get_data_version():
+    """Retorna a versão atual dos dados de transações (incrementada a cada escrita)"""
+    return _data_version
+
+def invalidate_transactions_cache(months=None):
+    """
+    Invalida o snapshot de transações de todas as sessões.
+    
+    Args:
+        months (set, optional): Períodos YYYY-MM afetados pela escrita; None
+            indica que qualquer mês pode ter mudado
+    """
+    mark_data_changed(months)
+    st.session_state.pop(_SNAPSHOT_KEY, None)
+    st.session_state.pop(_QUERY_CACHE_KEY, None)
+    st.session_state.pop(_AGGREGATES_KEY, None)
+
+def mark_data_changed(months=None):
+    """
+    Incrementa a versão global dos dados sem tocar na sessão atual.
+    
+    Pode ser chamada fora de uma execução do Streamlit (ex.: pela
+    sincronização da réplica local em segundo plano); os snapshots das
+    sessões expiram ao perceber a nova versão.
+    
+    Args:
+        months (set, optional): Períodos YYYY-MM afetados; None se desconhecidos
+    """
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+        _write_log.append((_data_version, set(months) if months is not None else None))
+
+def touched_months_since(version):
+    """
+    Retorna os meses alterados depois de uma versão dos dados.
+    
+    Args:
+        version (int): Versão de referência
+        
+    Returns:
+        set | None: Períodos YYYY-MM alterados, ou None se não for possível
+            saber (escrita sem meses conhecidos ou histórico já descartado)
+    """
+    with _data_version_lock:
+        if version is None or version > _data_version:
+            return None
+        if version == _data_version:
+            return set()
+        entries = [entry for entry in _write_log if entry[0] > version]
+        if len(entries) != _data_version - version:
+            return None
+        months = set()
+        for _, entry_months in entries:
+            if entry_months is None:
+                return None
+            months |= entry_months
+        return months
+
+def _month_of(date):
+    """Extrai o período YYYY-MM de uma data ISO"""
+    return str(date)[:7] if date else None
+
+def _cached_transaction(transaction_id):
+    """Procura uma transação no snapshot da sessão (sem consultar o banco)"""
+    snapshot = st.session_state.get(_SNAPSHOT_KEY)
+    if not snapshot:
+        return None
+    for transaction in snapshot["transactions"]:
+        if transaction.get("id") == transaction_id:
+            return transaction
+    return None
+
+def _touched_months(transaction_id, new_date=None):
+    """Meses afetados ao alterar/remover uma transação (None se desconhecido)"""
+    old = _cached_transaction(transaction_id)
+    if old is None:
+        return None
+    months = {_month_of(old.get("date"))}
+    if new_date:
+        months.add(_month_of(new_date))
+    months.discard(None)
+    return months
+
+def _get_snapshot():
+    """Retorna o snapshot da sessão se ainda for válido, senão None"""
+    snapshot = st.session_state.get(_SNAPSHOT_KEY)
+    if not snapshot:
+        return None
+    if snapshot["version"] != _data_version:
+        return None
+    if time.monotonic() - snapshot["loaded_at"] > SNAPSHOT_TTL_SECONDS:
+        return None
+    return snapshot
+
+def get_snapshot_token():
+    """
+    Identifica o snapshot válido da sessão, carregando-o se necessário.
+    
+    Muda quando os dados são escritos (nova versão) ou quando o snapshot é
+    recarregado após o TTL, então serve de chave para cálculos derivados dele.
+    
+    Returns:
+        tuple: (versão dos dados, instante da carga)
+    """
+    snapshot = _get_snapshot()
+    if snapshot is None:
+        snapshot = _load_snapshot()
+    return snapshot["version"], snapshot["loaded_at"]
+
+def _repo():
+    """Repositório de transações do backend ativo"""
+    return get_repositories().transactions
+
+def _load_snapshot():
+    """Busca as transações no banco e grava um novo snapshot na sessão"""
+    version = _data_version
+    transactions = _repo().list() or []
+    snapshot = {
+        "version": version,
+        "loaded_at": time.monotonic(),
+        "transactions": transactions
+    }
+    st.session_state[_SNAPSHOT_KEY] = snapshot
+    return snapshot
+
+# ---------------------------------------------------------------------
+# Agregados mensais
+# ---------------------------------------------------------------------
+# Cada escrita aplica em monthly_aggregates o delta entre a transação antes
+# e depois da alteração. Se a aplicação falhar, os agregados ficam marcados
+# como desatualizados no próprio banco (monthly_aggregates_state), de modo
+# que todos os processos voltam a usar as transações até que
+# rebuild_monthly_aggregates() seja executado; db.init_db reconstrói a
+# tabela quando o marcador não é "built". _aggregates_stale só é usado se
+# nem o marcador pôde ser gravado (banco fora do ar durante a escrita).
+
+_AGGREGATES_KEY = "_monthly_aggregates"
+_aggregates_stale = False
+
+def _mark_aggregates_stale():
+    """Marca os agregados como desatualizados no banco (ou no processo, se o banco falhar)"""
+    global _aggregates_stale
+    try:
+        _repo().mark_aggregates_stale()
+    except Exception as e:
+        _aggregates_stale = True
+        logger.warning("Não foi possível gravar o marcador de agregados desatualizados: %s", e)
+
+def _first_row(result):
+    """Primeira linha retornada por uma escrita no Supabase (ou None)"""
+    if isinstance(result, list) and result:
+        return result[0]
+    return None
+
+def _apply_aggregate_deltas(old=None, new=None):
+    """Aplica em monthly_aggregates o efeito de uma escrita de transação"""
+    apply_aggregate_rows(aggregations.aggregate_deltas(old, new))
+
+def apply_aggregate_rows(deltas):
+    """
+    Soma linhas de delta a monthly_aggregates no banco ativo.
+    
+    Usado também por escritas em lote, que consolidam o lote inteiro com
+    aggregations.build_monthly_aggregates antes de chamar esta função.
+    
+    Args:
+        deltas (list): Linhas com as colunas de chave e os incrementos
+    """
+    if not deltas:
+        return
+    try:
+        _repo().apply_aggregate_deltas(deltas)
+    except Exception as e:
+        _mark_aggregates_stale()
+        logger.error("Erro ao atualizar agregados mensais: %s", e)
+
+@profiled()
+def get_monthly_aggregates(start_month=None, end_month=None, user_id=None):
+    """
+    Retorna as linhas de monthly_aggregates do período (YYYY-MM, inclusivo).
+    
+    O resultado fica em cache na sessão até a próxima escrita ou até
+    SNAPSHOT_TTL_SECONDS, como o snapshot das transações.
+    
+    Args:
+        start_month (str, optional): Período inicial (YYYY-MM)
+        end_month (str, optional): Período final (YYYY-MM)
+        user_id (int, optional): Restringe a um usuário
+        
+    Returns:
+        list | None: Linhas agregadas, ou None se os agregados não estão
+            disponíveis (tabela ausente ou desatualizada)
+    """
+    if _aggregates_stale:
+        return None
+    cache = st.session_state.setdefault(_AGGREGATES_KEY, {})
+    cache_key = (start_month, end_month, user_id)
+    cached = cache.get(cache_key)
+    if (cached and cached["version"] == _data_version
+            and time.monotonic() - cached["loaded_at"] <= SNAPSHOT_TTL_SECONDS):
+        return list(cached["rows"])
+    
+    version = _data_version
+    try:
+        rows = _repo().get_monthly_aggregates(start_month, end_month, user_id)
+    except Exception as e:
+        logger.warning("Agregados mensais indisponíveis: %s", e)
+        return None
+    if rows is None:
+        return None
+    for key in [k for k, v in cache.items() if v["version"] != version]:
+        del cache[key]
+    cache[cache_key] = {"version": version, "loaded_at": time.monotonic(), "rows": rows}
+    return list(rows)
+
+def rebuild_monthly_aggregates():
+    """
+    Recalcula monthly_aggregates a partir de todas as transações.
+    
+    Returns:
+        int: Quantidade de linhas agregadas gravadas
+    """
+    global _aggregates_stale
+    count = _repo().rebuild_aggregates()
+    _aggregates_stale = False
+    invalidate_transactions_cache()
+    return count
 
 def add_transaction(description, amount, category, date, type_trans, 
                    due_date=None, status="pago", recurring=False, 
@@ -54,47 +300,208 @@ def add_transaction(description, amount, category, date, type_trans,
     
     # Se categoria_tipo não foi fornecido, determinar com base na categoria
     if not categoria_tipo:
-        # Buscar categorias
-        categories = get_categories()
-        categoria_map = {cat["name"]: cat["categoria_tipo"].lower() for cat in categories if "name" in cat and "categoria_tipo" in cat}
-        # Usar o tipo da categoria ou "outros" se não encontrado
-        categoria_tipo = categoria_map.get(category, "outros")
+        # Consulta O(1) no índice de categorias; "outros" se não encontrada
+        categoria_tipo = get_categoria_tipo(category, "outros")
     else:
         # Normalizar categoria_tipo para minúsculas
         categoria_tipo = str(categoria_tipo).lower()
     
-    print(f"Adicionando transação: {description} | Categoria: {category} | Tipo Categoria: {categoria_tipo}")
-    
-    # Adicionar transação ao Supabase
-    result = supabase_add_transaction(
-        user_id=user_id, 
-        description=description, 
-        amount=amount, 
-        category=category, 
-        date=date, 
-        due_date=due_date, 
-        trans_type=type_to_use, 
-        status=status, 
-        recurring=recurring, 
-        priority=priority, 
-        quinzena=quinzena, 
-        installments=installments, 
-        current_installment=current_installment, 
-        fixed_expense=fixed_expense, 
-        categoria_tipo=categoria_tipo
-    )
+    logger.info("Adicionando transação: %s | Categoria: %s | Tipo Categoria: %s",
+                description, category, categoria_tipo)
+    
+    # Com a réplica local a transação é gravada no SQLite e enviada pela fila
+    result = _repo().add({
+        "user_id": user_id, "description": description, "amount": amount,
+        "category": category, "date": date, "due_date": due_date,
+        "type": type_to_use, "status": status, "recurring": recurring,
+        "priority": priority, "quinzena": quinzena, "installments": installments,
+        "current_installment": current_installment, "fixed_expense": fixed_expense,
+        "categoria_tipo": categoria_tipo, "created_at": datetime.now().isoformat()
+    })
+    _apply_aggregate_deltas(new=_first_row(result))
+    month = _month_of(date)
+    invalidate_transactions_cache({month} if month else None)
     
     return result
 
-def view_transactions():
-    """Retorna todas as transações do banco de dados como uma lista de dicionários"""
-    # Obter transações diretamente do Supabase
-    transactions = supabase_get_transactions()
-    return transactions
+@profiled()
+def view_transactions(force_refresh=False):
+    """
+    Retorna todas as transações como uma lista de dicionários.
+    
+    As transações vêm do snapshot da sessão; o banco só é consultado quando o
+    snapshot expirou, foi invalidado por uma escrita ou force_refresh=True.
+    
+    Args:
+        force_refresh (bool): Ignora o snapshot e busca novamente no banco
+        
+    Returns:
+        list: Lista de transações
+    """
+    snapshot = None if force_refresh else _get_snapshot()
+    if snapshot is None:
+        snapshot = _load_snapshot()
+    # Cópia rasa para que o chamador possa reordenar/filtrar a lista sem afetar o snapshot
+    return list(snapshot["transactions"])
+
+def iter_transactions(start_date=None, end_date=None, page_size=None):
+    """
+    Percorre as transações direto do banco, página a página, sem passar pelo snapshot.
+    
+    Útil para processamentos longos (exportações, backups) em que não se quer
+    manter o histórico inteiro em memória.
+    
+    Args:
+        start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+        end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+        page_size (int, optional): Linhas por página
+        
+    Yields:
+        dict: Uma transação por vez
+    """
+    yield from _repo().iter(start_date=start_date, end_date=end_date, page_size=page_size)
+
+# ---------------------------------------------------------------------
+# Consultas filtradas
+# ---------------------------------------------------------------------
+# O histórico mistura tipos/status em português e inglês e com caixas
+# diferentes; os filtros são expandidos para todas as grafias conhecidas
+# antes de virarem cláusulas IN no banco.
+
+TYPE_ALIASES = {
+    "receita": ["Income", "income", "Receita", "receita", "revenue", "Revenue"],
+    "despesa": ["Expense", "expense", "Despesa", "despesa", "expenses", "Expenses"],
+    "investimento": ["Investment", "investment", "Investimento", "investimento"]
+}
+
+STATUS_ALIASES = {
+    "pago": ["pago", "Pago", "paid", "Paid"],
+    "pendente": ["pendente", "Pendente", "pending", "Pending"]
+}
+
+CATEGORIA_TIPO_ALIASES = {
+    "necessidade": ["necessidade", "necessidades", "Necessidade", "Necessidades"],
+    "desejo": ["desejo", "desejos", "Desejo", "Desejos"],
+    "poupanca": ["poupanca", "Poupanca", "poupança", "Poupança"],
+    "investimento": ["investimento", "Investimento"],
+    "outros": ["outros", "Outros"]
+}
+
+_QUERY_CACHE_KEY = "_transactions_queries"
+
+def _expand_aliases(values, aliases):
+    """Expande os valores de um filtro para todas as grafias equivalentes"""
+    if not values:
+        return None
+    if isinstance(values, str):
+        values = [values]
+    expanded = []
+    for value in values:
+        value_lower = str(value).lower()
+        group = None
+        for canonical, variants in aliases.items():
+            if value_lower == canonical or value_lower in (v.lower() for v in variants):
+                group = variants
+                break
+        for variant in (group or [value]):
+            if variant not in expanded:
+                expanded.append(variant)
+    return expanded
+
+def filter_transaction_list(transactions, start_date=None, end_date=None, types=None,
+                            statuses=None, categories=None, categorias_tipo=None):
+    """
+    Aplica os mesmos filtros de query_transactions a uma lista já carregada.
+    
+    As datas são comparadas como strings ISO (YYYY-MM-DD), exatamente como
+    nas cláusulas do banco: start_date inclusiva, end_date exclusiva.
+    """
+    type_set = {v.lower() for v in _expand_aliases(types, TYPE_ALIASES) or []}
+    status_set = {v.lower() for v in _expand_aliases(statuses, STATUS_ALIASES) or []}
+    tipo_set = {v.lower() for v in _expand_aliases(categorias_tipo, CATEGORIA_TIPO_ALIASES) or []}
+    category_set = set(categories) if categories else None
+    
+    filtered = []
+    for t in transactions:
+        date = t.get('date') or ''
+        if start_date and date < start_date:
+            continue
+        if end_date and date >= end_date:
+            continue
+        if type_set and str(t.get('type', '')).lower() not in type_set:
+            continue
+        if status_set and str(t.get('status', '')).lower() not in status_set:
+            continue
+        if category_set is not None and t.get('category') not in category_set:
+            continue
+        if tipo_set and str(t.get('categoria_tipo', '')).lower() not in tipo_set:
+            continue
+        filtered.append(t)
+    return filtered
+
+@profiled()
+def query_transactions(start_date=None, end_date=None, types=None, statuses=None,
+                       categories=None, categorias_tipo=None):
+    """
+    Retorna as transações que atendem aos filtros informados.
+    
+    Se a sessão já tem um snapshot válido, o filtro é feito sobre ele sem
+    nenhuma consulta extra. Caso contrário os filtros são enviados ao banco
+    (.gte/.lt/.in_ no Supabase, WHERE no SQLite) e só as linhas necessárias
+    trafegam; o resultado fica em cache até a próxima escrita ou o fim do TTL.
+    
+    Args:
+        start_date (str, optional): Data inicial inclusiva (YYYY-MM-DD)
+        end_date (str, optional): Data final exclusiva (YYYY-MM-DD)
+        types (list, optional): Tipos (Receita/Despesa/Investimento ou Income/Expense/Investment)
+        statuses (list, optional): Status (pago/pendente)
+        categories (list, optional): Nomes de categoria
+        categorias_tipo (list, optional): Tipos de categoria (necessidade/desejo/poupanca/outros)
+        
+    Returns:
+        list: Lista de transações
+    """
+    snapshot = _get_snapshot()
+    if snapshot is not None:
+        return filter_transaction_list(snapshot["transactions"], start_date, end_date, types,
+                                       statuses, categories, categorias_tipo)
+    
+    filters = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "types": _expand_aliases(types, TYPE_ALIASES),
+        "statuses": _expand_aliases(statuses, STATUS_ALIASES),
+        "categories": list(categories) if categories else None,
+        "categorias_tipo": _expand_aliases(categorias_tipo, CATEGORIA_TIPO_ALIASES)
+    }
+    cache_key = tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in filters.items())
+    cache = st.session_state.setdefault(_QUERY_CACHE_KEY, {})
+    cached = cache.get(cache_key)
+    if (cached and cached["version"] == _data_version
+            and time.monotonic() - cached["loaded_at"] <= SNAPSHOT_TTL_SECONDS):
+        return list(cached["transactions"])
+    
+    version = _data_version
+    transactions = _repo().list(**filters)
+    # Descartar resultados de versões anteriores antes de guardar o novo
+    for key in [k for k, v in cache.items() if v["version"] != version]:
+        del cache[key]
+    cache[cache_key] = {"version": version, "loaded_at": time.monotonic(), "transactions": transactions}
+    return list(transactions)
 
 def delete_transaction(transaction_id):
     """Deleta uma transação do banco de dados"""
-    return supabase_delete_transaction(transaction_id)
+    months = _touched_months(transaction_id)
+    result = _repo().delete(transaction_id)
+    deleted = _first_row(result)
+    _apply_aggregate_deltas(old=deleted)
+    if deleted is not None:
+        months = {_month_of(deleted.get("date"))} - {None}
+    invalidate_transactions_cache(months)
+    return result
+
+# Colunas que alteram monthly_aggregates
+_AGGREGATE_FIELDS = {"user_id", "amount", "date", "type", "status", "categoria_tipo"}
 
 def update_transaction(transaction_id, description=None, amount=None, category=None, 
                       date=None, type_trans=None, due_date=None, status=None, 
@@ -150,12 +557,61 @@ def update_transaction(transaction_id, description=None, amount=None, category=N
     if categoria_tipo is not None:
         data["categoria_tipo"] = categoria_tipo
     
-    # Atualizar transação no Supabase apenas se houver dados para atualizar
+    # Atualizar transação apenas se houver dados para atualizar
     if data:
-        return supabase_update_transaction(transaction_id, data)
+        old, result = _repo().update(transaction_id, data)
+        updated = _first_row(result)
+        if old is not None and updated is not None:
+            _apply_aggregate_deltas(old=old, new=updated)
+            months = {_month_of(old.get("date")), _month_of(updated.get("date"))} - {None}
+        else:
+            # Sem o estado anterior e o novo não há como calcular o delta
+            if _AGGREGATE_FIELDS & set(data):
+                _mark_aggregates_stale()
+            months = _touched_months(transaction_id, data.get("date"))
+        invalidate_transactions_cache(months)
+        return result
     
     return None
 
+def bulk_update_transactions(data, ids=None, categories=None, types=None, previous=None):
+    """
+    Aplica a mesma alteração a várias transações em poucas escritas.
+    
+    No SQLite é um único UPDATE ... WHERE ... IN (...); no Supabase, um
+    select seguido de um update com filtros in_ (IDs divididos em blocos).
+    O estado anterior lido pelo repositório substitui previous.
+    
+    Args:
+        data (dict): Colunas a alterar
+        ids (list, optional): IDs das transações
+        categories (list, optional): Altera todas as transações dessas categorias
+        types (list, optional): Restringe aos tipos informados
+        previous (list, optional): Estado anterior das transações afetadas,
+            usado para atualizar monthly_aggregates com deltas
+        
+    Returns:
+        int: Quantidade de transações alteradas
+    """
+    count, repo_previous = _repo().bulk_update(data, ids, categories, types)
+    if repo_previous is not None:
+        # Estado lido pelo próprio banco: os deltas são sempre exatos
+        previous = repo_previous
+    
+    if not _AGGREGATE_FIELDS & set(data):
+        # Nada que entre nas consolidações mensais mudou
+        months = set()
+    elif previous is not None:
+        apply_aggregate_rows(aggregations.net_aggregate_deltas(
+            previous, [dict(t, **data) for t in previous]))
+        months = {_month_of(t.get("date")) for t in previous} | {_month_of(data.get("date"))}
+        months.discard(None)
+    else:
+        _mark_aggregates_stale()
+        months = None
+    invalidate_transactions_cache(months)
+    return count
+
 # Funções para gerenciar metas financeiras
 
 def create_goal(name, target_value, type_goal="Savings", current_value=0, target_date=None, notes=None):
@@ -173,16 +629,19 @@ def create_goal(name, target_value, type_goal="Savings", current_value=0, target
     Returns:
         bool: True se a meta foi criada com sucesso
     """
-    # Converter para formato esperado pelo Supabase
-    return supabase_add_goal(
-        user_id=1,
-        description=name,
-        target_amount=target_value,
-        current_amount=current_value,
-        deadline=target_date or datetime.now().strftime("%Y-%m-%d"),
-        category=type_goal
-    )
+    rows = get_repositories().goals.add({
+        "user_id": 1,
+        "description": name,
+        "target_amount": target_value,
+        "current_amount": current_value,
+        "deadline": target_date or datetime.now().strftime("%Y-%m-%d"),
+        "category": type_goal,
+        "created_at": datetime.now().isoformat()
+    })
+    mark_goals_changed()
+    return rows
 
+@profiled()
 def view_goals():
     """
     Recupera todas as metas financeiras
@@ -190,7 +649,7 @@ def view_goals():
     Returns:
         list: Lista com todas as metas
     """
-    return supabase_get_goals()
+    return get_repositories().goals.list()
 
 def update_goal_progress(goal_id, current_value=None, target_value=None, target_date=None, notes=None):
     """
@@ -218,9 +677,11 @@ def update_goal_progress(goal_id, current_value=None, target_value=None, target_
     if notes is not None:
         data["notes"] = notes
     
-    # Atualizar meta no Supabase apenas se houver dados para atualizar
+    # Atualizar meta apenas se houver dados para atualizar
     if data:
-        return supabase_update_goal(goal_id, data)
+        rows = get_repositories().goals.update(goal_id, data)
+        mark_goals_changed()
+        return rows
     
     return None
 
@@ -234,4 +695,6 @@ def delete_goal(goal_id):
     Returns:
         bool: True se a remoção foi bem-sucedida
     """
-    return supabase_delete_goal(goal_id)
+    rows = get_repositories().goals.delete(goal_id)
+    mark_goals_changed()
+    return rows
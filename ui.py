@@ -639,6 +639,54 @@ def display_goals(goals):
                 st.success(f"Meta ID {goal_to_delete} excluída!")
                 st.rerun()
 
+def create_import_form():
+    """Formulário de importação de extratos (CSV, OFX, XLSX/XLS) em lote"""
+    with st.expander("📥 Importar Extrato"):
+        uploaded_file = st.file_uploader(
+            "Arquivo do extrato",
+            type=["csv", "ofx", "xlsx", "xls"],
+            help="Colunas reconhecidas: data, descrição, valor, categoria, tipo e status. "
+                 "Sem coluna de tipo, valores negativos viram despesas e positivos, receitas."
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            status = st.selectbox("Status das transações", ["pago", "pendente"], key="import_status")
+        with col2:
+            batch_size = st.number_input("Linhas por lote", min_value=50, max_value=5000,
+                                         value=500, step=50, key="import_batch_size")
+        dry_run = st.checkbox("Apenas validar (não gravar)", key="import_dry_run")
+        
+        if uploaded_file is not None and st.button("Importar", type="primary"):
+            # Importado aqui para não carregar o leitor de planilhas sem necessidade
+            from transaction_import import import_transactions
+            progress = st.empty()
+            
+            def show_progress(report):
+                progress.info(f"{report['rows_imported']} linhas gravadas "
+                              f"({report['rows_per_second']:.0f} linhas/s)")
+            
+            try:
+                report = import_transactions(
+                    uploaded_file,
+                    filename=uploaded_file.name,
+                    batch_size=int(batch_size),
+                    default_status=status,
+                    dry_run=dry_run,
+                    progress_callback=show_progress
+                )
+            except Exception as e:
+                st.error(f"Erro ao importar extrato: {e}")
+                return
+            
+            progress.empty()
+            verbo = "validadas" if dry_run else "importadas"
+            st.success(f"{report['rows_imported']} transações {verbo} em {report['seconds']:.2f}s "
+                       f"({report['rows_per_second']:.0f} linhas/s, {report['batches']} lotes).")
+            if report["rows_skipped"]:
+                st.warning(f"{report['rows_skipped']} linhas descartadas (data ou valor inválido).")
+            if report["rows_duplicate"]:
+                st.info(f"{report['rows_duplicate']} transações ignoradas (já importadas de outro extrato).")
+
 def show_transactions_page():
     """Página de gerenciamento de transações"""
     st.title("Gerenciamento de Transações")
@@ -652,6 +700,9 @@ def show_transactions_page():
     # Formulário para adicionar transações e exibir as existentes
     create_transaction_form()
     
+    # Importação de extratos em lote
+    create_import_form()
+    
     # Buscar transações existentes
     transactions = view_transactions()
     
@@ -1,5 +1,5 @@
 import streamlit as st
-from transactions_db import view_transactions, update_transaction
+from transactions_db import view_transactions, bulk_update_transactions
 import pandas as pd
 
 def main():
@@ -33,38 +33,33 @@ def main():
         use_container_width=True
     )
     
+    # Diff vetorizado: transações cuja descrição está no mapeamento e cuja categoria difere
+    df["nova_categoria"] = df["description"].map(category_updates)
+    alteracoes = df[df["nova_categoria"].notna() & (df["nova_categoria"] != df["category"])]
+    
+    st.subheader("Alterações Previstas")
+    if alteracoes.empty:
+        st.info("Nenhuma transação precisa ser atualizada.")
+        return
+    st.dataframe(
+        alteracoes[['id', 'description', 'category', 'nova_categoria']],
+        use_container_width=True
+    )
+    
     # Botão para executar a atualização
     if st.button("Atualizar Categorias"):
         updated_count = 0
-        st.subheader("Atualizações:")
         
-        # Percorre todas as transações e atualiza as que correspondem ao mapeamento
-        for index, row in df.iterrows():
-            transaction_id = row['id']
-            description = row['description']
-            current_category = row['category']
-            
-            # Verifica se esta transação precisa ser atualizada
-            if description in category_updates:
-                new_category = category_updates[description]
-                
-                # Só atualiza se a categoria atual for diferente da desejada
-                if current_category != new_category:
-                    # Cria um dicionário com todos os campos da transação
-                    transaction_data = row.to_dict()
-                    # Atualiza a categoria
-                    transaction_data['category'] = new_category
-                    
-                    # Faz a atualização no banco de dados
-                    result = update_transaction(transaction_id, transaction_data)
-                    
-                    if result:
-                        updated_count += 1
-                        st.success(f"✅ Transação '{description}': Categoria alterada de '{current_category if current_category else 'Não definida'}' para '{new_category}'")
-                    else:
-                        st.error(f"❌ Erro ao atualizar transação '{description}'")
-                else:
-                    st.info(f"ℹ️ Transação '{description}' já está com a categoria '{new_category}'")
+        # Uma escrita por categoria de destino, enviando apenas a coluna category
+        for new_category, grupo in alteracoes.groupby("nova_categoria"):
+            try:
+                updated_count += bulk_update_transactions(
+                    {"category": new_category},
+                    ids=grupo["id"].tolist()
+                )
+                st.success(f"✅ {len(grupo)} transações movidas para '{new_category}'")
+            except Exception as e:
+                st.error(f"❌ Erro ao mover transações para '{new_category}': {e}")
         
         # Exibe um resumo das atualizações
         if updated_count > 0: